@@ -6,26 +6,155 @@ load_dotenv()
 
 class Config:
     """Configuration settings for the application."""
-    
+
     # Flask configuration
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev_key_for_development')
-    DEBUG = os.environ.get('FLASK_DEBUG', '1') == '1'
-    
+    DEBUG = os.environ.get('FLASK_DEBUG', '0') == '1'
+    JSON_SORT_KEYS = False
+
     # Database configuration
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///quick_evac.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    
+
+    # Connection pool settings (ignored for SQLite, which does not pool file connections)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '5'))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '10'))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '1800'))  # seconds
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', '10'))  # seconds
+
+    # SQLite pragmas applied to every new connection
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+        'busy_timeout': 5000,  # milliseconds
+        'foreign_keys': 'ON'
+    }
+
+    # Startup behaviour
+    CREATE_SCHEMA_ON_STARTUP = os.environ.get('CREATE_SCHEMA_ON_STARTUP', '0') == '1'
+    PRELOAD_ZONE_INDEX = os.environ.get('PRELOAD_ZONE_INDEX', '1') == '1'
+    # Workers on one host see zone changes at once through the change feed
+    # (backend/utils/change_feed.py); the TTL refresh covers other hosts
+    ZONE_INDEX_TTL = float(os.environ.get('ZONE_INDEX_TTL', '30'))  # seconds, 0 disables refresh
+    CHANGE_FEED_DIR = os.environ.get('CHANGE_FEED_DIR')  # optional, defaults to the instance folder
+    ZONE_SCHEDULER_TICK = float(os.environ.get('ZONE_SCHEDULER_TICK', '1'))  # seconds, 0 leaves transitions to the TTL refresh
+    ZONE_TRANSITION_ALERTS = os.environ.get('ZONE_TRANSITION_ALERTS', '0') == '1'  # SMS phones covered by a zone going live
+    ZONE_REGION_PRECISION = int(os.environ.get('ZONE_REGION_PRECISION', '3'))  # geohash length of automatic regions (~156 km)
+    ZONE_REGION_CACHE_ZONES = int(os.environ.get('ZONE_REGION_CACHE_ZONES', '50000'))  # zones kept in memory per worker
+    ZONE_REGION_MAX_CELLS = int(os.environ.get('ZONE_REGION_MAX_CELLS', '1024'))  # wider regions are checked for every point
+
+    # Region used to parse phone numbers that lack a country code
+    DEFAULT_PHONE_REGION = os.environ.get('DEFAULT_PHONE_REGION', 'US')
+
+    # History retention (see backend/services/retention_service.py), run by run_retention.py,
+    # not by the web workers
+    RETENTION_DEDUP_AFTER_MINUTES = int(os.environ.get('RETENTION_DEDUP_AFTER_MINUTES', '60'))
+    RETENTION_DOWNSAMPLE_AFTER_HOURS = int(os.environ.get('RETENTION_DOWNSAMPLE_AFTER_HOURS', '24'))
+    RETENTION_DOWNSAMPLE_MINUTES = int(os.environ.get('RETENTION_DOWNSAMPLE_MINUTES', '15'))
+    RETENTION_ARCHIVE_AFTER_DAYS = int(os.environ.get('RETENTION_ARCHIVE_AFTER_DAYS', '30'))
+    RETENTION_ARCHIVE_DIR = os.environ.get('RETENTION_ARCHIVE_DIR')  # defaults to <instance>/archive
+    RETENTION_CHUNK_SIZE = int(os.environ.get('RETENTION_CHUNK_SIZE', '1000'))
+    RETENTION_CHUNK_PAUSE = float(os.environ.get('RETENTION_CHUNK_PAUSE', '0.05'))  # seconds
+    RETENTION_INTERVAL = int(os.environ.get('RETENTION_INTERVAL', '3600'))  # seconds
+
+    # Live occupancy counters and heatmap (see backend/services/occupancy_service.py)
+    OCCUPANCY_WINDOW_MINUTES = int(os.environ.get('OCCUPANCY_WINDOW_MINUTES', '60'))
+    OCCUPANCY_RECONCILE_INTERVAL = int(os.environ.get('OCCUPANCY_RECONCILE_INTERVAL', '300'))  # seconds, 0 disables
+    HEATMAP_PRECISIONS = (4, 5, 6, 7)
+
+    # Spatio-temporal presence index (see backend/services/presence_index.py)
+    PRESENCE_BUCKET_MINUTES = int(os.environ.get('PRESENCE_BUCKET_MINUTES', '60'))
+    PRESENCE_PRECISION = int(os.environ.get('PRESENCE_PRECISION', '7'))  # geohash characters, 7 is about 150 x 150 m
+    PRESENCE_RETENTION_HOURS = int(os.environ.get('PRESENCE_RETENTION_HOURS', '72'))
+    PRESENCE_CATCH_UP_OVERLAP = int(os.environ.get('PRESENCE_CATCH_UP_OVERLAP', '5000'))  # ids re-read below the watermark
+
+    # Zone vector tiles (see backend/services/tile_service.py)
+    TILE_MAX_ZOOM = int(os.environ.get('TILE_MAX_ZOOM', '20'))
+    TILE_CACHE_SIZE = int(os.environ.get('TILE_CACHE_SIZE', '4096'))  # tiles kept in memory
+    TILE_CACHE_TTL = float(os.environ.get('TILE_CACHE_TTL', '30'))  # seconds, 0 keeps tiles until invalidated
+    TILE_CACHE_DIR = os.environ.get('TILE_CACHE_DIR')  # optional on-disk cache shared by workers
+
+    # Admission control for /api/location/check, per worker (see backend/services/admission_service.py).
+    # Waiting requests hold a worker thread, so the limits are derived from the thread count
+    # (same variable and default as gunicorn.conf.py): half the threads run checks, the rest
+    # queue, and ADMISSION_RESERVED_THREADS stay free for the other routes.
+    WORKER_THREADS = int(os.environ.get('GUNICORN_THREADS', '12'))
+    ADMISSION_RESERVED_THREADS = 2
+    ADMISSION_MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT', str(max(1, WORKER_THREADS // 2))))
+    ADMISSION_MAX_QUEUE = int(os.environ.get(
+        'ADMISSION_MAX_QUEUE', str(max(0, WORKER_THREADS - ADMISSION_MAX_CONCURRENT - ADMISSION_RESERVED_THREADS))
+    ))
+    ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', '2'))  # seconds
+    ADMISSION_DEGRADE_RATIO = float(os.environ.get('ADMISSION_DEGRADE_RATIO', '1.0'))  # skip geocoding/directions at this share of the limit
+    ADMISSION_REPEAT_WINDOW = float(os.environ.get('ADMISSION_REPEAT_WINDOW', '30'))  # seconds
+    ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', '5'))  # seconds, sent with shed responses
+
+    # Coalescing of concurrent Google Maps lookups (see backend/utils/singleflight.py)
+    COALESCE_PRECISION = int(os.environ.get('COALESCE_PRECISION', '4'))  # decimal places, 4 is about 11 m
+    COALESCE_LOCK_DIR = os.environ.get('COALESCE_LOCK_DIR')  # optional, collapses calls across workers
+    COALESCE_SHARED_TTL = float(os.environ.get('COALESCE_SHARED_TTL', '5'))  # seconds a worker reuses another's result
+    COALESCE_LOCK_WAIT = float(os.environ.get('COALESCE_LOCK_WAIT', '1'))  # seconds waited for another worker's call
+
+    # Local ingest log for location writes (see backend/services/ingest_log.py)
+    INGEST_LOG_DIR = os.environ.get('INGEST_LOG_DIR')  # optional, location writes go straight to the database when unset
+    INGEST_SEGMENT_BYTES = int(os.environ.get('INGEST_SEGMENT_BYTES', str(16 * 1024 * 1024)))
+    INGEST_FSYNC = os.environ.get('INGEST_FSYNC', '1') == '1'
+    INGEST_APPLY_INTERVAL = float(os.environ.get('INGEST_APPLY_INTERVAL', '0.5'))  # seconds
+    INGEST_APPLY_BATCH = int(os.environ.get('INGEST_APPLY_BATCH', '500'))
+
+    # Distance used near zone edges: 'haversine' (sphere) or 'vincenty' (WGS-84 ellipsoid).
+    # Most containment checks are settled by a flat-earth bound and never reach it.
+    DISTANCE_METHOD = os.environ.get('DISTANCE_METHOD', 'haversine')
+
+    # Worker processes used by /api/zone/simulate, capped at the CPU count. With 1 the
+    # replay runs in the request thread; more start a pool next to the web worker.
+    SIMULATION_PROCESSES = int(os.environ.get('SIMULATION_PROCESSES', '1'))
+    # Bounds keeping a simulation inside one request (below the gunicorn timeout)
+    SIMULATION_MAX_FIXES = int(os.environ.get('SIMULATION_MAX_FIXES', '2000000'))
+    SIMULATION_MAX_ZONES = int(os.environ.get('SIMULATION_MAX_ZONES', '200'))  # proposed zones per request
+    SIMULATION_TIMEOUT = float(os.environ.get('SIMULATION_TIMEOUT', '20'))  # seconds
+
+    # Sampling profiler behind /debug/profile (see backend/services/profiler_service.py)
+    PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN')  # optional admin token, profiling is disabled when unset
+    PROFILER_INTERVAL = float(os.environ.get('PROFILER_INTERVAL', '0.005'))  # seconds between samples
+    PROFILER_MAX_SECONDS = float(os.environ.get('PROFILER_MAX_SECONDS', '300'))
+    PROFILER_MAX_STACKS = int(os.environ.get('PROFILER_MAX_STACKS', '10000'))
+
     # Google Maps API configuration
     GOOGLE_MAPS_API_KEY = os.environ.get('GOOGLE_MAPS_API_KEY')
-    
+
     # Twilio configuration
     TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID')
     TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN')
     TWILIO_PHONE_NUMBER = os.environ.get('TWILIO_PHONE_NUMBER')
-    
+
+    # SMS alerts: 'full' adds emoji and turn-by-turn steps, opt into 'compact' to fit one GSM-7 segment
+    SMS_TEMPLATE_VARIANT = os.environ.get('SMS_TEMPLATE_VARIANT', 'full')
+    SMS_COST_PER_SEGMENT = float(os.environ.get('SMS_COST_PER_SEGMENT', '0.0079'))
+    SMS_SEGMENTS_PER_SECOND = float(os.environ.get('SMS_SEGMENTS_PER_SECOND', '1'))
+
     # Zone types
     ZONE_TYPES = {
         'RED': 'High Danger',
         'ORANGE': 'Medium Danger',
         'GREEN': 'Safe'
-    }
\ No newline at end of file
+    }
+
+class DevelopmentConfig(Config):
+    """Configuration for local development."""
+
+    DEBUG = os.environ.get('FLASK_DEBUG', '1') == '1'
+    CREATE_SCHEMA_ON_STARTUP = os.environ.get('CREATE_SCHEMA_ON_STARTUP', '1') == '1'
+    PRELOAD_ZONE_INDEX = os.environ.get('PRELOAD_ZONE_INDEX', '0') == '1'
+
+class ProductionConfig(Config):
+    """Configuration for production deployments behind gunicorn."""
+
+    DEBUG = False
+
+# Configuration profiles selectable through the APP_CONFIG environment variable
+config_by_name = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig
+}
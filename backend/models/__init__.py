@@ -4,5 +4,7 @@ from flask_sqlalchemy import SQLAlchemy
 db = SQLAlchemy()
 
 # Import models after db is defined to avoid circular imports
+from backend.models.address import Address
 from backend.models.zone import Zone
-from backend.models.user_location import UserLocation
\ No newline at end of file
+from backend.models.user_location import UserLocation
+from backend.models.ingest_checkpoint import IngestCheckpoint
\ No newline at end of file
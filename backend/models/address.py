@@ -0,0 +1,41 @@
+from backend.models import db
+from datetime import datetime
+from hashlib import blake2b
+
+def address_hash(text):
+    """
+    Compute the 64-bit lookup key of an address string.
+    
+    Args:
+        text (str): Formatted address
+        
+    Returns:
+        int: Signed 64-bit hash of the address text
+    """
+    digest = blake2b(text.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+class Address(db.Model):
+    """
+    Model for deduplicated address strings shared by zones and user locations.
+    
+    Attributes:
+        id (int): Primary key
+        text_hash (int): 64-bit hash of the text, used for lookups
+        text (str): Formatted address
+        created_at (datetime): When the record was created
+    """
+    
+    __tablename__ = 'addresses'
+    __table_args__ = (
+        # One row per address, so concurrent interning cannot create duplicates
+        db.Index('uq_addresses_text_hash_text', 'text_hash', 'text', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    text_hash = db.Column(db.BigInteger, nullable=False)
+    text = db.Column(db.String(255), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<Address {self.id}: {self.text}>"
@@ -0,0 +1,26 @@
+from backend.models import db
+from datetime import datetime
+
+class IngestCheckpoint(db.Model):
+    """
+    Model for the replay position of a local ingest log slot.
+    
+    The checkpoint is updated in the same transaction as the rows it covers, so
+    a crash never replays or skips a record.
+    
+    Attributes:
+        slot (str): Name of the ingest log slot
+        segment (int): Number of the segment being applied
+        offset (int): Byte offset in the segment up to which records are applied
+        updated_at (datetime): When the checkpoint last moved
+    """
+    
+    __tablename__ = 'ingest_checkpoints'
+    
+    slot = db.Column(db.String(64), primary_key=True)
+    segment = db.Column(db.Integer, nullable=False, default=0)
+    offset = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<IngestCheckpoint {self.slot} at {self.segment}:{self.offset}>"
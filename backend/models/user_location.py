@@ -7,10 +7,12 @@ class UserLocation(db.Model):
     
     Attributes:
         id (int): Primary key
-        phone_number (str): User's phone number
+        phone_number (str): User's phone number as submitted
+        phone_e164 (str): Phone number normalized to E.164
+        phone_key (int): Compact integer key of the E.164 number, for joins and lookups
         latitude (float): User's latitude
         longitude (float): User's longitude
-        address (str): User's address determined from coordinates
+        address_id (int): Foreign key to the deduplicated address determined from coordinates
         in_danger_zone (bool): Whether user is in a danger zone
         zone_id (int): Foreign key to the zone if user is in one
         created_at (datetime): When the record was created
@@ -20,15 +22,27 @@ class UserLocation(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     phone_number = db.Column(db.String(20), nullable=False)
+    phone_e164 = db.Column(db.String(16), nullable=True, index=True)
+    phone_key = db.Column(db.BigInteger, nullable=True, index=True)
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
-    address = db.Column(db.String(255), nullable=True)
+    address_id = db.Column(db.Integer, db.ForeignKey('addresses.id'), nullable=True)
     in_danger_zone = db.Column(db.Boolean, default=False)
-    zone_id = db.Column(db.Integer, db.ForeignKey('zones.id'), nullable=True)
+    # History outlives its zone; delete_zone clears references itself on databases created without ON DELETE
+    zone_id = db.Column(db.Integer, db.ForeignKey('zones.id', ondelete='SET NULL'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Relationship
-    zone = db.relationship('Zone', backref=db.backref('user_locations', lazy=True))
+    # Relationships
+    # Zone is joined so to_dict never lazy-loads it; the reverse side is a query
+    # because a zone can have a very large location history, and is never loaded
+    # to delete a zone
+    zone = db.relationship('Zone', lazy='joined', backref=db.backref('user_locations', lazy='dynamic', passive_deletes=True))
+    address_ref = db.relationship('Address', lazy='joined')
+    
+    @property
+    def address(self):
+        """str: Formatted address text, or None if unknown."""
+        return self.address_ref.text if self.address_ref else None
     
     def __repr__(self):
         return f"<UserLocation {self.phone_number} at ({self.latitude}, {self.longitude})>"
@@ -38,8 +52,10 @@ class UserLocation(db.Model):
         return {
             'id': self.id,
             'phone_number': self.phone_number,
+            'phone_e164': self.phone_e164,
             'latitude': self.latitude,
             'longitude': self.longitude,
+            'address_id': self.address_id,
             'address': self.address,
             'in_danger_zone': self.in_danger_zone,
             'zone_id': self.zone_id,
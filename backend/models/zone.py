@@ -12,8 +12,11 @@ class Zone(db.Model):
         latitude (float): Latitude of the zone center
         longitude (float): Longitude of the zone center
         radius (float): Radius of the zone in kilometers
-        address (str): Human-readable address of the zone
+        address_id (int): Foreign key to the zone's deduplicated address
         description (str): Description of the zone
+        region (str): Region key, explicit (e.g. a state) or the coarse geohash of the center
+        active_from (datetime): When the zone goes live (UTC), None for immediately
+        active_until (datetime): When the zone expires (UTC), None for never
         created_at (datetime): When the zone was created
         updated_at (datetime): When the zone was last updated
     """
@@ -26,11 +29,22 @@ class Zone(db.Model):
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
     radius = db.Column(db.Float, nullable=False)  # radius in kilometers
-    address = db.Column(db.String(255), nullable=True)
+    address_id = db.Column(db.Integer, db.ForeignKey('addresses.id'), nullable=True)
     description = db.Column(db.Text, nullable=True)
+    region = db.Column(db.String(32), nullable=True, index=True)
+    active_from = db.Column(db.DateTime, nullable=True)
+    active_until = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Relationship (joined so reading the address never issues an extra query)
+    address_ref = db.relationship('Address', lazy='joined')
+    
+    @property
+    def address(self):
+        """str: Formatted address text, or None if unknown."""
+        return self.address_ref.text if self.address_ref else None
+    
     def __repr__(self):
         return f"<Zone {self.name} ({self.type})>"
     
@@ -43,8 +57,12 @@ class Zone(db.Model):
             'latitude': self.latitude,
             'longitude': self.longitude,
             'radius': self.radius,
+            'address_id': self.address_id,
             'address': self.address,
             'description': self.description,
+            'region': self.region,
+            'active_from': self.active_from.isoformat() if self.active_from else None,
+            'active_until': self.active_until.isoformat() if self.active_until else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
\ No newline at end of file
@@ -3,10 +3,16 @@ from flask import Blueprint
 # Create blueprints
 location_bp = Blueprint('location', __name__, url_prefix='/api/location')
 zone_bp = Blueprint('zone', __name__, url_prefix='/api/zone')
+heatmap_bp = Blueprint('heatmap', __name__, url_prefix='/api/heatmap')
+sms_bp = Blueprint('sms', __name__, url_prefix='/api/sms')
+debug_bp = Blueprint('debug', __name__, url_prefix='/debug')
 
 # Import routes after blueprints are created to avoid circular imports
 from backend.routes.location_routes import *
 from backend.routes.zone_routes import *
+from backend.routes.heatmap_routes import *
+from backend.routes.sms_routes import *
+from backend.routes.debug_routes import *
 
 # List of all blueprints
-all_blueprints = [location_bp, zone_bp]
\ No newline at end of file
+all_blueprints = [location_bp, zone_bp, heatmap_bp, sms_bp, debug_bp]
\ No newline at end of file
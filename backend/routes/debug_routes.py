@@ -0,0 +1,124 @@
+from flask import request, jsonify, current_app, Response, g
+from backend.routes import debug_bp
+from backend.services.profiler_service import profiler
+
+# Header carrying the PROFILER_TOKEN admin token
+TOKEN_HEADER = 'X-Profile-Token'
+
+@debug_bp.before_app_request
+def start_request_profile():
+    """Profile the request if a profiling window covers it or it carries the admin token."""
+    token = request.headers.get(TOKEN_HEADER)
+    if not profiler.wants(request.path) and not (token and profiler.authorized(token)):
+        return
+    if request.blueprint == debug_bp.name:
+        return
+    profiler.attach(f"{request.method} {request.path}")
+    g.profiled = True
+
+@debug_bp.teardown_app_request
+def stop_request_profile(exception=None):
+    """Stop sampling the request thread."""
+    if g.pop('profiled', False):
+        profiler.detach()
+
+def _check_token():
+    """
+    Reject requests without the admin token.
+
+    Returns:
+        tuple: Error response and status, or None if the token is valid
+    """
+    if not current_app.config.get('PROFILER_TOKEN'):
+        return jsonify({'success': False, 'message': 'Profiling is not enabled'}), 404
+    if not profiler.authorized(request.headers.get(TOKEN_HEADER)):
+        return jsonify({'success': False, 'message': 'Invalid profiler token'}), 403
+    return None
+
+@debug_bp.route('/profile', methods=['POST'])
+def enable_profile():
+    """
+    Profile this worker's requests for a number of seconds.
+
+    Expected JSON payload (all optional):
+    {
+        "seconds": 30,
+        "path": "/api/location/check"
+    }
+
+    Requests whose path starts with "path" (every request if omitted) are
+    sampled until the window ends, capped at PROFILER_MAX_SECONDS.
+
+    Returns:
+        JSON response with the profiler state
+    """
+    rejected = _check_token()
+    if rejected:
+        return rejected
+
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            seconds = float(data.get('seconds', 30))
+        except (TypeError, ValueError):
+            seconds = 0
+        if seconds <= 0:
+            return jsonify({'success': False, 'message': 'seconds must be a positive number'}), 400
+
+        profiler.enable(seconds, data.get('path') or None)
+
+        return jsonify({
+            'success': True,
+            'profile': profiler.snapshot()
+        }), 200
+
+    except Exception as e:
+        current_app.logger.error(f"Error enabling profiler: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'Error enabling profiler: {str(e)}'
+        }), 500
+
+@debug_bp.route('/profile', methods=['GET'])
+def get_profile():
+    """
+    Get the stacks sampled by this worker in collapsed format.
+
+    Query parameters:
+        reset (optional): "1" to clear the samples after reading them
+        stats (optional): "1" to get the profiler state as JSON instead
+
+    Returns:
+        text/plain collapsed stacks ("frame;frame;... count" per line)
+    """
+    rejected = _check_token()
+    if rejected:
+        return rejected
+
+    if request.args.get('stats') == '1':
+        return jsonify({
+            'success': True,
+            'profile': profiler.snapshot()
+        }), 200
+
+    return Response(profiler.collapsed(reset=request.args.get('reset') == '1'), mimetype='text/plain')
+
+@debug_bp.route('/profile', methods=['DELETE'])
+def disable_profile():
+    """
+    Close the profiling window and clear the samples.
+
+    Returns:
+        JSON response with the profiler state
+    """
+    rejected = _check_token()
+    if rejected:
+        return rejected
+
+    profiler.disable()
+    profiler.collapsed(reset=True)
+
+    return jsonify({
+        'success': True,
+        'profile': profiler.snapshot()
+    }), 200
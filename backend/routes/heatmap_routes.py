@@ -0,0 +1,64 @@
+from flask import request, jsonify, current_app
+from backend.routes import heatmap_bp
+from backend.services.occupancy_service import occupancy_tracker
+from backend.utils import geohash
+
+@heatmap_bp.route('', methods=['GET'])
+def get_heatmap():
+    """
+    Get the current population heatmap inside a bounding box.
+    
+    Query parameters:
+        bbox: Bounding box as "min_lon,min_lat,max_lon,max_lat"
+        precision (optional): Geohash precision of the grid cells (default 5)
+    
+    Returns:
+        JSON object of populated geohash cells with their center and phone count
+    """
+    try:
+        try:
+            min_lon, min_lat, max_lon, max_lat = (float(v) for v in request.args['bbox'].split(','))
+            precision = int(request.args.get('precision', 5))
+        except (KeyError, ValueError):
+            return jsonify({
+                'success': False,
+                'message': 'bbox must be given as min_lon,min_lat,max_lon,max_lat'
+            }), 400
+        
+        precisions = occupancy_tracker.precisions()
+        if precision not in precisions:
+            return jsonify({
+                'success': False,
+                'message': f'Invalid precision. Must be one of: {", ".join(str(p) for p in precisions)}'
+            }), 400
+        
+        if min_lat > max_lat or min_lon > max_lon:
+            return jsonify({
+                'success': False,
+                'message': 'bbox minimums must not exceed its maximums'
+            }), 400
+        
+        counts = occupancy_tracker.heatmap(min_lat, min_lon, max_lat, max_lon, precision)
+        
+        cells = []
+        for cell, count in counts.items():
+            latitude, longitude = geohash.decode(cell)
+            cells.append({
+                'geohash': cell,
+                'latitude': latitude,
+                'longitude': longitude,
+                'count': count
+            })
+        
+        return jsonify({
+            'success': True,
+            'precision': precision,
+            'cells': cells
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting heatmap: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': 'An error occurred while building the heatmap'
+        }), 500
@@ -1,9 +1,20 @@
-from flask import request, jsonify, current_app
+from flask import request, jsonify, current_app, Response, stream_with_context
+from sqlalchemy.exc import SQLAlchemyError
 from backend.routes import location_bp
-from backend.models import db, UserLocation
+from backend.models import db, UserLocation, Zone
 from backend.services.location_service import LocationService
 from backend.services.zone_service import ZoneService
 from backend.services.sms_service import SMSService
+from backend.services.admission_service import admission_controller, AdmissionRejected
+from backend.services.ingest_log import ingest_log
+from backend.services.occupancy_service import occupancy_tracker
+from backend.services.presence_index import presence_index
+from backend.utils.phone import normalize_phone_number, phone_key
+from backend.utils.serializers import (
+    JSON_MIMETYPE, USER_LOCATION_RECORD_FIELDS, negotiate, negotiated_response,
+    serialize_user_locations, stream_json_list, stream_msgpack_list, user_location_records
+)
+from backend.utils.timestamps import parse_utc_timestamp
 
 # Initialize services
 location_service = LocationService()
@@ -23,7 +34,8 @@ def check_location():
         }
     
     Returns:
-        JSON response with location information and evacuation details if applicable
+        JSON (or MessagePack, see Accept) response with location information
+        and evacuation details if applicable
     """
     try:
         data = request.get_json()
@@ -32,82 +44,136 @@ def check_location():
         required_fields = ['phone_number', 'latitude', 'longitude']
         for field in required_fields:
             if field not in data:
-                return jsonify({
+                return negotiated_response({
                     'success': False,
                     'message': f'Missing required field: {field}'
-                }), 400
+                }, 400)
         
         phone_number = data['phone_number']
+        phone_e164 = normalize_phone_number(phone_number, current_app.config['DEFAULT_PHONE_REGION'])
+        if not phone_e164:
+            return negotiated_response({
+                'success': False,
+                'message': 'Invalid phone number'
+            }, 400)
+        
         latitude = float(data['latitude'])
         longitude = float(data['longitude'])
         
-        # Get address from coordinates
-        address = location_service.get_address_from_coordinates(latitude, longitude)
-
-        print("User location: ", latitude, longitude, address)
-        print("Address: ", address)
-        
-        # Check if user is in a danger zone
+        # Check if user is in a danger zone (in-memory, so it runs before admission)
         in_zone, zone = zone_service.is_in_zone(latitude, longitude)
         
-        # Prepare response data
-        response_data = {
-            'success': True,
-            'location': {
-                'latitude': latitude,
-                'longitude': longitude,
-                'address': address
-            },
-            'in_danger_zone': in_zone
-        }
+        key = phone_key(phone_e164)
+        priority = admission_controller.classify(key, latitude, longitude, zone.type if in_zone and zone else None)
+        
+        try:
+            with admission_controller.admit(priority):
+                # Skip geocoding and directions while the worker is saturated
+                degraded = admission_controller.should_degrade()
+                response_data = _evaluate_location(
+                    phone_number, key, latitude, longitude, in_zone, zone, degraded
+                )
+                admission_controller.mark_seen(key, latitude, longitude)
+        except AdmissionRejected as e:
+            current_app.logger.debug(f"Shed location check for {phone_number}: {e.reason}")
+            response, status = negotiated_response({
+                'success': False,
+                'message': f'Server busy, please retry ({e.reason})'
+            }, 429 if e.reason == 'repeat' else 503)
+            response.headers['Retry-After'] = str(current_app.config['ADMISSION_RETRY_AFTER'])
+            return response, status
+        
+        return negotiated_response(response_data)
         
-        if in_zone and zone:
-            # User is in a zone, add zone information to response
-            response_data['zone'] = zone.to_dict()
+    except Exception as e:
+        current_app.logger.error(f"Error checking location: {str(e)}")
+        return negotiated_response({
+            'success': False,
+            'message': 'An error occurred while processing your request'
+        }, 500)
+
+def _evaluate_location(phone_number, key, latitude, longitude, in_zone, zone, degraded):
+    """
+    Enrich, store and count an admitted location check.
+    
+    Args:
+        phone_number (str): Phone number as sent by the client
+        key (int): Integer key of the normalized phone number
+        latitude (float): Reported latitude
+        longitude (float): Reported longitude
+        in_zone (bool): Whether the point falls in a zone
+        zone (IndexedZone): Zone containing the point, if any
+        degraded (bool): Skip geocoding and directions
+        
+    Returns:
+        dict: Response data
+    """
+    # Get address from coordinates
+    address = None if degraded else location_service.get_address_from_coordinates(latitude, longitude)
+
+    current_app.logger.debug(f"User location: {latitude}, {longitude} ({address})")
+    
+    # Prepare response data
+    response_data = {
+        'success': True,
+        'location': {
+            'latitude': latitude,
+            'longitude': longitude,
+            'address': address
+        },
+        'in_danger_zone': in_zone
+    }
+    if degraded:
+        response_data['degraded'] = True
+    
+    if in_zone and zone:
+        # User is in a zone, add zone information to response
+        response_data['zone'] = zone.to_dict()
+        
+        # If it's a RED or ORANGE zone, find the nearest safe zone and get directions
+        if zone.type in ['RED', 'ORANGE']:
+            nearest_safe_zone, distance = zone_service.find_nearest_safe_zone(latitude, longitude)
             
-            # If it's a RED or ORANGE zone, find the nearest safe zone and get directions
-            if zone.type in ['RED', 'ORANGE']:
-                nearest_safe_zone, distance = zone_service.find_nearest_safe_zone(latitude, longitude)
-                
-                if nearest_safe_zone:
-                    # Get directions to the safe zone
+            if nearest_safe_zone:
+                # Get directions to the safe zone
+                directions = None
+                if not degraded:
                     directions = location_service.get_directions(
                         latitude, longitude, 
                         nearest_safe_zone.latitude, nearest_safe_zone.longitude
                     )
-                    
-                    if directions:
-                        response_data['evacuation'] = {
-                            'safe_zone': nearest_safe_zone.to_dict(),
-                            'distance': distance,
-                            'directions': directions
-                        }
-                    
-                    print("Sending SMS alert...")
-                    print("Phone number:", phone_number)
-                    print("Zone type:", zone.type)
-                    print("Current address:", address)
-                    print("Directions:", directions)
-                    
-                    # Send SMS alert based on zone type
-                    # sms_service.send_evacuation_alert(
-                    #     phone_number, 
-                    #     zone.type, 
-                    #     address, 
-                    #     directions
-                    # )
-            elif zone.type == 'GREEN':
-                print("Green zone, no evacuation needed...")
-                print("Phone number:", phone_number)
-                print("Zone type:", zone.type)
-                print("Current address:", address)
+                
+                # Under pressure the shelter is still returned, just without turn-by-turn directions
+                if directions or degraded:
+                    response_data['evacuation'] = {
+                        'safe_zone': nearest_safe_zone.to_dict(),
+                        'distance': distance,
+                        'directions': directions
+                    }
+                
+                current_app.logger.debug(
+                    f"Sending SMS alert to {phone_number} ({zone.type} zone at {address})"
+                )
+                
+                # Send SMS alert based on zone type
+                # sms_service.send_evacuation_alert(
+                #     phone_number, 
+                #     zone.type, 
+                #     address, 
+                #     directions
+                # )
+        elif zone.type == 'GREEN':
+            current_app.logger.debug(
+                f"Green zone, no evacuation needed for {phone_number} at {address}"
+            )
 
 
-                # # Send a safety notification for green zones
-                # sms_service.send_evacuation_alert(phone_number, zone.type, address)
-        
-        # Save user location to database
-        user_location = location_service.save_user_location(
+            # # Send a safety notification for green zones
+            # sms_service.send_evacuation_alert(phone_number, zone.type, address)
+    
+    # Save user location to database; the verdict is still served if that fails
+    try:
+        location_service.save_user_location(
             phone_number=phone_number,
             latitude=latitude,
             longitude=longitude,
@@ -115,12 +181,165 @@ def check_location():
             in_danger_zone=in_zone,
             zone_id=zone.id if in_zone and zone else None
         )
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error saving location of {phone_number}: {str(e)}")
+    
+    # Move the phone between zones in the live occupancy counters
+    occupancy_tracker.record(key, zone.id if in_zone and zone else None, latitude, longitude)
+    presence_index.record(key, latitude, longitude)
+    
+    return response_data
+
+def _parse_list_filters(args):
+    """
+    Parse the filters shared by the location list endpoints.
+    
+    Args:
+        args: Request query arguments
         
-        return jsonify(response_data), 200
+    Returns:
+        dict: Parsed filters
         
-    except Exception as e:
-        current_app.logger.error(f"Error checking location: {str(e)}")
+    Raises:
+        ValueError: If a filter value is invalid
+    """
+    filters = {}
+    
+    zone_type = args.get('zone_type')
+    if zone_type:
+        filters['zone_ids'] = [zone_id for zone_id, in db.session.query(Zone.id).filter(Zone.type == zone_type.upper())]
+    elif args.get('zone_id'):
+        filters['zone_ids'] = [int(args['zone_id'])]
+    
+    if args.get('in_danger_zone'):
+        filters['in_danger_zone'] = args['in_danger_zone'].lower() in ('1', 'true', 'yes')
+    
+    if args.get('limit'):
+        filters['limit'] = int(args['limit'])
+        if filters['limit'] <= 0:
+            raise ValueError('limit must be positive')
+    
+    return filters
+
+def _stream_locations(chunks):
+    """
+    Stream chunks of user location rows in the encoding the client accepts.
+    
+    Args:
+        chunks (iterable): Lists of row tuples with the columns of USER_LOCATION_FIELDS
+        
+    Returns:
+        Response: Streamed JSON or MessagePack response
+    """
+    mimetype = negotiate()
+    if mimetype == JSON_MIMETYPE:
+        body = stream_json_list('locations', chunks, serialize_user_locations)
+    else:
+        body = stream_msgpack_list(
+            'locations', chunks, user_location_records, USER_LOCATION_RECORD_FIELDS, mimetype
+        )
+    return Response(stream_with_context(body), mimetype=mimetype)
+
+@location_bp.route('/history', methods=['GET'])
+def get_location_history():
+    """
+    Stream stored user locations, newest first.
+    
+    Query parameters:
+        phone_number (optional): Only locations of this phone
+        zone_id (optional): Only locations in this zone
+        zone_type (optional): Only locations in zones of this type (RED, ORANGE, GREEN)
+        in_danger_zone (optional): Filter on the danger flag (true/false)
+        since (optional): ISO timestamp, only locations created at or after it
+        until (optional): ISO timestamp, only locations created before it
+        limit (optional): Maximum number of locations
+    
+    Returns:
+        Streamed JSON array (or MessagePack records, see Accept) of user locations
+    """
+    try:
+        filters = _parse_list_filters(request.args)
+        
+        if request.args.get('phone_number'):
+            filters['phone_e164'] = normalize_phone_number(
+                request.args['phone_number'], current_app.config['DEFAULT_PHONE_REGION']
+            )
+            if not filters['phone_e164']:
+                raise ValueError('invalid phone number')
+        
+        for field in ('since', 'until'):
+            if request.args.get(field):
+                filters[field] = parse_utc_timestamp(request.args[field])
+    except ValueError as e:
         return jsonify({
             'success': False,
-            'message': 'An error occurred while processing your request'
-        }), 500
\ No newline at end of file
+            'message': f'Invalid filter: {str(e)}'
+        }), 400
+    
+    chunks = location_service.iter_locations(**filters)
+    return _stream_locations(chunks)
+
+@location_bp.route('/report', methods=['GET'])
+def get_location_report():
+    """
+    Stream the most recent location of every phone, newest first.
+    
+    Query parameters:
+        zone_id (optional): Only phones currently in this zone
+        zone_type (optional): Only phones currently in zones of this type
+        in_danger_zone (optional): Filter on the danger flag (true/false)
+        limit (optional): Maximum number of locations
+    
+    Returns:
+        Streamed JSON array (or MessagePack records, see Accept) of user locations
+    """
+    try:
+        filters = _parse_list_filters(request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': f'Invalid filter: {str(e)}'
+        }), 400
+    
+    chunks = location_service.iter_latest_locations(**filters)
+    return _stream_locations(chunks)
+
+@location_bp.route('/admission', methods=['GET'])
+def get_admission_stats():
+    """
+    Get admission control metrics of this worker.
+    
+    Returns:
+        JSON response with admitted, queued, shed and degraded counters
+    """
+    return jsonify({
+        'success': True,
+        'admission': admission_controller.snapshot()
+    }), 200
+
+@location_bp.route('/coalescing', methods=['GET'])
+def get_coalescing_stats():
+    """
+    Get Google Maps request coalescing metrics of this worker.
+    
+    Returns:
+        JSON response with call, executed and collapsed counters
+    """
+    return jsonify({
+        'success': True,
+        'coalescing': location_service.flight.snapshot()
+    }), 200
+
+@location_bp.route('/ingest', methods=['GET'])
+def get_ingest_stats():
+    """
+    Get local ingest log metrics of this worker.
+    
+    Returns:
+        JSON response with the log position and appended, fsync and applied counters
+    """
+    return jsonify({
+        'success': True,
+        'ingest': ingest_log.snapshot()
+    }), 200
@@ -0,0 +1,137 @@
+from flask import request, jsonify, current_app
+from backend.routes import sms_bp
+from backend.services.sms_service import SMSService
+from backend.services.sms_templates import VARIANTS
+
+# Initialize the SMS service
+sms_service = SMSService()
+
+# Directions fields the alert templates read
+_DIRECTIONS_FIELDS = ('end_address', 'distance', 'duration')
+_STEP_FIELDS = ('instruction', 'distance')
+
+def _parse_recipients(value):
+    """
+    Parse the recipient count of an estimate request.
+    
+    Args:
+        value: Requested recipient count (number or numeric string)
+        
+    Returns:
+        int: Recipient count
+        
+    Raises:
+        ValueError: If the count is not a non-negative whole number
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError('recipients must be a whole number')
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError('recipients must be a whole number')
+    recipients = int(value)
+    if recipients < 0:
+        raise ValueError('recipients must not be negative')
+    return recipients
+
+def _validate_directions(directions):
+    """
+    Check that representative directions have the shape the alert templates read.
+    
+    Args:
+        directions: Requested directions
+        
+    Raises:
+        ValueError: If a field is missing or not a string
+    """
+    if not isinstance(directions, dict):
+        raise ValueError('directions must be an object')
+    for field in _DIRECTIONS_FIELDS:
+        if not isinstance(directions.get(field), str):
+            raise ValueError(f'directions.{field} must be a string')
+    steps = directions.get('steps')
+    if not isinstance(steps, list):
+        raise ValueError('directions.steps must be a list')
+    for i, step in enumerate(steps):
+        if not isinstance(step, dict):
+            raise ValueError(f'directions.steps[{i}] must be an object')
+        for field in _STEP_FIELDS:
+            if not isinstance(step.get(field), str):
+                raise ValueError(f'directions.steps[{i}].{field} must be a string')
+
+@sms_bp.route('/estimate', methods=['POST'])
+def estimate_broadcast():
+    """
+    Estimate the segments, carrier cost and send time of an alert broadcast.
+    
+    Request body:
+        {
+            "zone_type": "RED", // RED, ORANGE, or GREEN
+            "recipients": 25000,
+            "address": "1 Market St, San Francisco, CA", // optional, representative address
+            "directions": {...}, // optional, representative directions
+            "variant": "compact" // optional, full or compact
+        }
+    
+    Returns:
+        JSON estimate for the requested variant and for every other variant
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({
+                'success': False,
+                'message': 'Request body must be a JSON object'
+            }), 400
+        
+        # Validate required fields
+        required_fields = ['zone_type', 'recipients']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({
+                    'success': False,
+                    'message': f'Missing required field: {field}'
+                }), 400
+        
+        variant = data.get('variant', current_app.config['SMS_TEMPLATE_VARIANT'])
+        if variant not in VARIANTS:
+            return jsonify({
+                'success': False,
+                'message': f'Invalid variant. Must be one of: {", ".join(VARIANTS)}'
+            }), 400
+        
+        try:
+            recipients = _parse_recipients(data['recipients'])
+            if not isinstance(data['zone_type'], str):
+                raise ValueError('zone_type must be a string')
+            if data.get('address') is not None and not isinstance(data['address'], str):
+                raise ValueError('address must be a string')
+            if data.get('directions'):
+                _validate_directions(data['directions'])
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': f'Invalid estimate request: {str(e)}'
+            }), 400
+        
+        estimates = {
+            name: sms_service.estimate_broadcast(
+                recipients,
+                data['zone_type'].upper(),
+                data.get('address'),
+                data.get('directions'),
+                name
+            )
+            for name in VARIANTS
+        }
+        
+        return jsonify({
+            'success': True,
+            'estimate': estimates[variant],
+            'alternatives': {name: estimate for name, estimate in estimates.items() if name != variant}
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Error estimating broadcast: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': 'An error occurred while estimating the broadcast'
+        }), 500
@@ -1,7 +1,16 @@
-from flask import request, jsonify, current_app
+from datetime import datetime
+from flask import request, jsonify, current_app, Response
 from backend.routes import zone_bp
 from backend.models import Zone
+from backend.services.occupancy_service import occupancy_tracker
+from backend.services.presence_index import presence_index
+from backend.services.replay_service import ReplayService, SimulationLimitExceeded, proposed_zone
+from backend.services.tile_service import tile_service
+from backend.services.zone_index import zone_index
 from backend.services.zone_service import ZoneService
+from backend.utils.phone import phone_key_to_e164
+from backend.utils.serializers import JSON_MIMETYPE, ZONE_FIELDS, msgpack_list, negotiate, zone_records
+from backend.utils.timestamps import parse_utc_timestamp
 
 # Initialize the zone service
 zone_service = ZoneService()
@@ -15,11 +24,17 @@ def get_all_zones():
         type (optional): Filter zones by type (RED, ORANGE, GREEN)
     
     Returns:
-        JSON array of zones
+        JSON array of zones, or MessagePack records with Accept: application/msgpack
+        (application/vnd.quickevac.columns+msgpack for columns)
     """
     try:
         zone_type = request.args.get('type')
         
+        mimetype = negotiate()
+        if mimetype != JSON_MIMETYPE:
+            rows = zone_service.get_zone_rows(zone_type.upper() if zone_type else None)
+            return Response(msgpack_list('zones', zone_records(rows), ZONE_FIELDS, mimetype), mimetype=mimetype), 200
+        
         if zone_type:
             zones = zone_service.get_zones_by_type(zone_type.upper())
         else:
@@ -69,6 +84,28 @@ def get_zone(zone_id):
             'message': 'An error occurred while fetching the zone'
         }), 500
 
+def _parse_active_window(data):
+    """
+    Parse the optional activation window of a zone request.
+    
+    Args:
+        data (dict): Request body
+        
+    Returns:
+        dict: active_from/active_until datetimes (or None) for the fields present
+        
+    Raises:
+        ValueError: If a timestamp is invalid or the window is empty
+    """
+    window = {}
+    for field in ('active_from', 'active_until'):
+        if field in data:
+            window[field] = parse_utc_timestamp(data[field]) if data[field] else None
+    
+    if window.get('active_from') and window.get('active_until') and window['active_until'] <= window['active_from']:
+        raise ValueError('active_until must be after active_from')
+    return window
+
 @zone_bp.route('/', methods=['POST'])
 def create_zone():
     """
@@ -81,7 +118,10 @@ def create_zone():
             "latitude": 37.7749,
             "longitude": -122.4194,
             "radius": 1.5, // radius in kilometers
-            "description": "Zone description" // optional
+            "description": "Zone description", // optional
+            "active_from": "2024-01-01T18:00:00", // optional, UTC
+            "active_until": "2024-01-02T06:00:00", // optional, UTC
+            "region": "CA" // optional, defaults to the coarse geohash of the center
         }
     
     Returns:
@@ -107,6 +147,14 @@ def create_zone():
                 'message': f'Invalid zone type. Must be one of: {", ".join(valid_types)}'
             }), 400
         
+        try:
+            window = _parse_active_window(data)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': f'Invalid activation window: {str(e)}'
+            }), 400
+        
         # Create zone
         zone = zone_service.create_zone(
             name=data['name'],
@@ -114,7 +162,9 @@ def create_zone():
             latitude=float(data['latitude']),
             longitude=float(data['longitude']),
             radius=float(data['radius']),
-            description=data.get('description')
+            description=data.get('description'),
+            region=data.get('region'),
+            **window
         )
         
         return jsonify({
@@ -145,7 +195,10 @@ def update_zone(zone_id):
             "latitude": 37.7749, // optional
             "longitude": -122.4194, // optional
             "radius": 2.0, // optional
-            "description": "Updated description" // optional
+            "description": "Updated description", // optional
+            "active_from": "2024-01-01T18:00:00", // optional, UTC, null to clear
+            "active_until": "2024-01-02T06:00:00", // optional, UTC, null to clear
+            "region": "CA" // optional, null to go back to the automatic region
         }
     
     Returns:
@@ -169,6 +222,14 @@ def update_zone(zone_id):
             if field in data:
                 data[field] = float(data[field])
         
+        try:
+            data.update(_parse_active_window(data))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': f'Invalid activation window: {str(e)}'
+            }), 400
+        
         # Update zone
         updated_zone = zone_service.update_zone(zone_id, **data)
         
@@ -221,4 +282,250 @@ def delete_zone(zone_id):
         return jsonify({
             'success': False,
             'message': 'An error occurred while deleting the zone'
-        }), 500
\ No newline at end of file
+        }), 500
+
+@zone_bp.route('/<int:zone_id>/occupancy', methods=['GET'])
+def get_zone_occupancy(zone_id):
+    """
+    Get the number of people currently in a zone.
+    
+    Parameters:
+        zone_id (int): Zone ID
+    
+    Returns:
+        JSON occupancy count served from the live in-memory counters
+    """
+    try:
+        zone = zone_index.get(zone_id)
+        
+        if not zone:
+            return jsonify({
+                'success': False,
+                'message': f'Zone with ID {zone_id} not found'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'zone_id': zone.id,
+            'zone_type': zone.type,
+            'occupancy': occupancy_tracker.zone_occupancy(zone.id)
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting zone occupancy: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': 'An error occurred while fetching the zone occupancy'
+        }), 500
+
+@zone_bp.route('/<int:zone_id>/presence', methods=['GET'])
+def get_zone_presence(zone_id):
+    """
+    List every phone seen inside a zone during a time window.
+    
+    Parameters:
+        zone_id (int): Zone ID
+    
+    Query parameters:
+        since: ISO timestamp, start of the window (UTC unless it has an offset)
+        until (optional): ISO timestamp, end of the window, defaults to now
+    
+    Returns:
+        JSON list of phone numbers answered from the spatio-temporal presence index,
+        and from the stored pings for the part of the window it no longer retains
+    """
+    try:
+        zone = zone_index.get(zone_id)
+        
+        if not zone:
+            return jsonify({
+                'success': False,
+                'message': f'Zone with ID {zone_id} not found'
+            }), 404
+        
+        try:
+            since = parse_utc_timestamp(request.args['since'])
+            until = parse_utc_timestamp(request.args['until']) if request.args.get('until') else datetime.utcnow()
+            if until <= since:
+                raise ValueError('until must be after since')
+        except KeyError:
+            return jsonify({
+                'success': False,
+                'message': 'Missing required parameter: since'
+            }), 400
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': f'Invalid timestamp: {str(e)}'
+            }), 400
+        
+        result = presence_index.query(zone.latitude, zone.longitude, zone.radius, since, until)
+        phones = [phone_key_to_e164(key) for key in result.pop('phone_keys')]
+        
+        return jsonify({
+            'success': True,
+            'zone_id': zone.id,
+            'since': since.isoformat(),
+            'until': until.isoformat(),
+            'count': len(phones),
+            'phones': phones,
+            'index': result
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting zone presence: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': 'An error occurred while fetching the zone presence'
+        }), 500
+
+@zone_bp.route('/tiles/<int:z>/<int:x>/<int:y>.mvt', methods=['GET'])
+def get_zone_tile(z, x, y):
+    """
+    Get a Mapbox Vector Tile of the zones intersecting a web mercator tile.
+    
+    Parameters:
+        z (int): Zoom level
+        x (int): Tile column
+        y (int): Tile row
+    
+    Returns:
+        Vector tile with a "zones" layer (id, name, type and radius properties)
+    """
+    try:
+        if z > current_app.config['TILE_MAX_ZOOM'] or x >= (1 << z) or y >= (1 << z):
+            return jsonify({
+                'success': False,
+                'message': f'Tile {z}/{x}/{y} is out of range'
+            }), 404
+        
+        tile = tile_service.get_tile(z, x, y)
+        
+        response = Response(tile, mimetype='application/vnd.mapbox-vector-tile')
+        response.headers['Cache-Control'] = f"public, max-age={int(current_app.config['TILE_CACHE_TTL'])}"
+        return response
+        
+    except Exception as e:
+        current_app.logger.error(f"Error rendering zone tile: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': 'An error occurred while rendering the tile'
+        }), 500
+
+@zone_bp.route('/simulate', methods=['POST'])
+def simulate_zones():
+    """
+    Replay stored location history against a proposed zone set.
+    
+    Request body:
+        {
+            "zones": [ // proposed zones, same fields as zone creation
+                {"name": "New Fire Zone", "type": "RED", "latitude": 37.77, "longitude": -122.42, "radius": 2.0}
+            ],
+            "include_existing": true, // optional, also evaluate saved zones
+            "since": "2024-01-01T00:00:00", // optional
+            "until": "2024-01-02T00:00:00" // optional
+        }
+    
+    The replay runs inside the request, so it is bounded: at most
+    SIMULATION_MAX_ZONES proposed zones, SIMULATION_MAX_FIXES replayed fixes
+    (413 otherwise, narrow since/until) and SIMULATION_TIMEOUT seconds (504).
+    
+    Returns:
+        JSON simulation report with per-zone counts, shelter loads and projected SMS volume
+    """
+    try:
+        data = request.get_json()
+        config = current_app.config
+        
+        valid_types = ['RED', 'ORANGE', 'GREEN']
+        required_fields = ['name', 'type', 'latitude', 'longitude', 'radius']
+        if len(data.get('zones', [])) > config['SIMULATION_MAX_ZONES']:
+            return jsonify({
+                'success': False,
+                'message': f"At most {config['SIMULATION_MAX_ZONES']} proposed zones can be simulated at once"
+            }), 413
+        zones = []
+        for i, zone_data in enumerate(data.get('zones', [])):
+            for field in required_fields:
+                if field not in zone_data:
+                    return jsonify({
+                        'success': False,
+                        'message': f'Missing required field in zone {i}: {field}'
+                    }), 400
+            if zone_data['type'].upper() not in valid_types:
+                return jsonify({
+                    'success': False,
+                    'message': f'Invalid zone type. Must be one of: {", ".join(valid_types)}'
+                }), 400
+            
+            # Negative ids keep proposed zones apart from saved ones
+            zones.append(proposed_zone(
+                zone_id=-(i + 1),
+                name=zone_data['name'],
+                zone_type=zone_data['type'].upper(),
+                latitude=float(zone_data['latitude']),
+                longitude=float(zone_data['longitude']),
+                radius=float(zone_data['radius']),
+                description=zone_data.get('description')
+            ))
+        
+        window = {}
+        for field in ('since', 'until'):
+            if data.get(field):
+                window[field] = parse_utc_timestamp(data[field])
+        
+        replay = ReplayService()
+        if replay.count_history(**window) > config['SIMULATION_MAX_FIXES']:
+            return jsonify({
+                'success': False,
+                'message': f"More than {config['SIMULATION_MAX_FIXES']} fixes in the window, narrow since/until"
+            }), 413
+        
+        report = replay.simulate(
+            zones,
+            include_existing=data.get('include_existing', True),
+            processes=config['SIMULATION_PROCESSES'],
+            max_fixes=config['SIMULATION_MAX_FIXES'],
+            timeout=config['SIMULATION_TIMEOUT'],
+            **window
+        )
+        
+        return jsonify({
+            'success': True,
+            'simulation': report
+        }), 200
+        
+    except SimulationLimitExceeded as e:
+        return jsonify({
+            'success': False,
+            'message': f'{str(e)}, narrow since/until'
+        }), 413 if e.reason == 'fixes' else 504
+        
+    except Exception as e:
+        current_app.logger.error(f"Error simulating zones: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': 'An error occurred while simulating the zones'
+        }), 500
+
+@zone_bp.route('/regions', methods=['GET'])
+def get_region_stats():
+    """
+    Get the regional zone cache state of this worker.
+    
+    Returns:
+        JSON response with known and loaded regions and cache counters
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'regions': zone_index.snapshot()
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting zone regions: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': 'An error occurred while fetching zone regions'
+        }), 500
@@ -0,0 +1,174 @@
+import threading
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from backend.models import db, Address
+from backend.models.address import address_hash
+
+# Maximum number of addresses kept in the in-process intern cache
+ADDRESS_CACHE_SIZE = 50000
+
+# Session.info key of the addresses inserted by the session's open transaction
+PENDING_KEY = 'interned_addresses'
+
+class AddressService:
+    """
+    Service for interning address strings into the deduplicated addresses table.
+
+    An in-process LRU cache maps address text to id and id to text, so
+    repeated addresses (users clustered in the same neighborhoods) are
+    resolved without touching the database.
+
+    New addresses are inserted in the caller's transaction and only enter the
+    cache once it commits, so cached ids always refer to persisted rows.
+    """
+
+    def __init__(self, max_size=ADDRESS_CACHE_SIZE):
+        """Initialize an empty intern cache."""
+        self.max_size = max_size
+        self._ids_by_text = OrderedDict()
+        self._texts_by_id = OrderedDict()
+        self._lock = threading.Lock()
+        event.listen(Session, 'after_commit', self._on_commit)
+        event.listen(Session, 'after_transaction_end', self._on_transaction_end)
+
+    def _on_commit(self, session):
+        """Cache the addresses inserted by a committed transaction."""
+        if session.in_nested_transaction():
+            # Released savepoint; the enclosing transaction may still roll back
+            return
+        for text, address_id in session.info.pop(PENDING_KEY, {}).items():
+            self._remember(address_id, text)
+
+    def _on_transaction_end(self, session, transaction):
+        """Forget the addresses inserted by a transaction that was rolled back."""
+        if transaction.parent is None:
+            session.info.pop(PENDING_KEY, None)
+
+    def _remember(self, address_id, text):
+        """Add an id/text pair to the cache, evicting the least recently used."""
+        with self._lock:
+            self._ids_by_text[text] = address_id
+            self._ids_by_text.move_to_end(text)
+            self._texts_by_id[address_id] = text
+            self._texts_by_id.move_to_end(address_id)
+            while len(self._ids_by_text) > self.max_size:
+                self._ids_by_text.popitem(last=False)
+            while len(self._texts_by_id) > self.max_size:
+                self._texts_by_id.popitem(last=False)
+
+    def intern(self, text):
+        """
+        Get the id of an address, inserting it if it does not exist yet.
+
+        A new address is flushed in a savepoint of the current transaction and
+        committed along with the caller's changes. If another worker inserts
+        the same address first, its row is used instead.
+
+        Args:
+            text (str): Formatted address
+
+        Returns:
+            int: Address ID or None if no address was given
+        """
+        if not text:
+            return None
+        text = text[:255]
+
+        with self._lock:
+            address_id = self._ids_by_text.get(text)
+            if address_id is not None:
+                self._ids_by_text.move_to_end(text)
+                return address_id
+
+        pending = db.session.info.setdefault(PENDING_KEY, {})
+        address_id = pending.get(text)
+        if address_id is not None:
+            return address_id
+
+        text_hash = address_hash(text)
+        address_id = self._find(text_hash, text)
+        if address_id is not None:
+            self._remember(address_id, text)
+            return address_id
+
+        # Flush the caller's pending changes first: the savepoint below flushes
+        # them too, and their errors must not pass for an address race
+        db.session.flush()
+        address = Address(text_hash=text_hash, text=text)
+        try:
+            with db.session.begin_nested():
+                db.session.add(address)
+        except IntegrityError:
+            # Inserted concurrently; read the winner's row past this transaction's snapshot
+            address_id = self._find(text_hash, text, latest=True)
+            if address_id is None:
+                # Not a duplicate address after all
+                raise
+            self._remember(address_id, text)
+            return address_id
+
+        pending[text] = address.id
+        return address.id
+
+    def _find(self, text_hash, text, latest=False):
+        """Look up the id of an address row, reading the latest committed version if latest is set."""
+        query = db.session.query(Address.id).filter(Address.text_hash == text_hash, Address.text == text)
+        if latest:
+            query = query.with_for_update(read=True)
+        return query.scalar()
+
+    def resolve(self, address_ids):
+        """
+        Resolve address ids to their text with at most one query.
+
+        Args:
+            address_ids (iterable): Address IDs (None entries are ignored)
+
+        Returns:
+            dict: Address ID mapped to its text
+        """
+        resolved = {}
+        missing = set()
+
+        with self._lock:
+            for address_id in address_ids:
+                if address_id is None or address_id in resolved:
+                    continue
+                text = self._texts_by_id.get(address_id)
+                if text is None:
+                    missing.add(address_id)
+                else:
+                    resolved[address_id] = text
+
+        if missing:
+            rows = db.session.query(Address.id, Address.text).filter(Address.id.in_(missing)).all()
+            for address_id, text in rows:
+                resolved[address_id] = text
+                self._remember(address_id, text)
+
+        return resolved
+
+    def get_text(self, address_id):
+        """
+        Resolve a single address id to its text.
+
+        Args:
+            address_id (int): Address ID
+
+        Returns:
+            str: Address text or None if not found
+        """
+        if address_id is None:
+            return None
+        return self.resolve((address_id,)).get(address_id)
+
+    def clear(self):
+        """Empty the intern cache."""
+        with self._lock:
+            self._ids_by_text.clear()
+            self._texts_by_id.clear()
+
+# Process-wide intern cache shared by all services
+address_service = AddressService()
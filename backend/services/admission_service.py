@@ -0,0 +1,198 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from flask import current_app
+
+# Priority lanes, lower values are admitted first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+PRIORITY_NAMES = {PRIORITY_HIGH: 'high', PRIORITY_NORMAL: 'normal', PRIORITY_LOW: 'low'}
+
+# Number of phones remembered for new-phone and repeated-ping detection
+RECENT_PHONES_SIZE = 100000
+
+def _cell(latitude, longitude):
+    """Round a position to roughly 10 m cells, so GPS jitter still counts as the same position."""
+    return (round(latitude, 4), round(longitude, 4))
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of being admitted."""
+
+    def __init__(self, reason):
+        super().__init__(f"Request shed: {reason}")
+        self.reason = reason
+
+class AdmissionController:
+    """
+    Admission control with priority lanes for the location routes.
+
+    At most ADMISSION_MAX_CONCURRENT requests run at once per worker. Others
+    wait in a bounded queue ordered by priority (then arrival) for up to
+    ADMISSION_QUEUE_TIMEOUT seconds. When the queue is full, a new request
+    displaces the lowest-priority waiter if it outranks it, otherwise it is
+    shed. ``should_degrade`` tells callers to skip optional enrichment.
+    """
+
+    def __init__(self):
+        """Initialize an idle controller."""
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._queue = []
+        self._sequence = itertools.count()
+        self._recent = OrderedDict()
+        self._recent_lock = threading.Lock()
+        self.stats = Counter()
+
+    def classify(self, phone_key, latitude, longitude, zone_type=None):
+        """
+        Pick the priority lane of a location check.
+
+        Checks resolving to a RED zone and phones not seen recently go first;
+        a phone re-reporting the same position within ADMISSION_REPEAT_WINDOW
+        seconds is a low-priority repeat. Only served checks count as seen
+        (see ``mark_seen``), so a shed request keeps its priority on retry.
+
+        Args:
+            phone_key (int): Integer key of the phone number
+            latitude (float): Reported latitude
+            longitude (float): Reported longitude
+            zone_type (str, optional): Type of the zone the point falls in
+
+        Returns:
+            int: PRIORITY_HIGH, PRIORITY_NORMAL or PRIORITY_LOW
+        """
+        with self._recent_lock:
+            previous = self._recent.get(phone_key)
+
+        if zone_type == 'RED' or previous is None:
+            return PRIORITY_HIGH
+        if previous[0] == _cell(latitude, longitude) and \
+                time.monotonic() - previous[1] <= current_app.config['ADMISSION_REPEAT_WINDOW']:
+            return PRIORITY_LOW
+        return PRIORITY_NORMAL
+
+    def mark_seen(self, phone_key, latitude, longitude):
+        """
+        Remember a phone's position once its check has been served.
+
+        Args:
+            phone_key (int): Integer key of the phone number
+            latitude (float): Reported latitude
+            longitude (float): Reported longitude
+        """
+        with self._recent_lock:
+            self._recent[phone_key] = (_cell(latitude, longitude), time.monotonic())
+            self._recent.move_to_end(phone_key)
+            while len(self._recent) > RECENT_PHONES_SIZE:
+                self._recent.popitem(last=False)
+
+    def should_degrade(self):
+        """
+        Check whether an admitted request should skip optional enrichment.
+
+        Returns:
+            bool: True if requests are queueing or in-flight work reached
+                ADMISSION_DEGRADE_RATIO of the concurrency limit
+        """
+        config = current_app.config
+        threshold = config['ADMISSION_MAX_CONCURRENT'] * config['ADMISSION_DEGRADE_RATIO']
+        with self._cond:
+            degraded = bool(self._queue) or self._in_flight >= threshold
+            if degraded:
+                self.stats['degraded'] += 1
+        return degraded
+
+    @contextmanager
+    def admit(self, priority):
+        """
+        Hold a concurrency slot for the duration of the block.
+
+        Args:
+            priority (int): Priority lane from ``classify``
+
+        Raises:
+            AdmissionRejected: If the request is shed
+        """
+        config = current_app.config
+        max_concurrent = config['ADMISSION_MAX_CONCURRENT']
+        lane = PRIORITY_NAMES[priority]
+
+        with self._cond:
+            if priority == PRIORITY_LOW and (self._queue or self._in_flight >= max_concurrent):
+                self.stats['shed_repeat'] += 1
+                raise AdmissionRejected('repeat')
+
+            if not self._queue and self._in_flight < max_concurrent:
+                self._in_flight += 1
+            else:
+                self._wait(priority, max_concurrent, config['ADMISSION_MAX_QUEUE'], config['ADMISSION_QUEUE_TIMEOUT'])
+            self.stats['admitted'] += 1
+            self.stats[f'admitted_{lane}'] += 1
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def _wait(self, priority, max_concurrent, max_queue, timeout):
+        """Queue the caller until a slot frees up; must hold the condition lock."""
+        if len(self._queue) >= max_queue:
+            worst = max(self._queue) if self._queue else None
+            if worst is None or worst[0] <= priority:
+                self.stats['shed_queue_full'] += 1
+                raise AdmissionRejected('queue full')
+            # Displace the lowest-priority waiter to make room
+            worst[2] = 'displaced'
+            self._queue.remove(worst)
+            heapq.heapify(self._queue)
+            self._cond.notify_all()
+
+        entry = [priority, next(self._sequence), 'waiting']
+        heapq.heappush(self._queue, entry)
+        self.stats['waited'] += 1
+        deadline = time.monotonic() + timeout
+
+        while True:
+            if entry[2] == 'displaced':
+                self.stats['shed_displaced'] += 1
+                raise AdmissionRejected('displaced by higher priority')
+
+            if self._queue[0] is entry and self._in_flight < max_concurrent:
+                heapq.heappop(self._queue)
+                self._in_flight += 1
+                # Let the next waiter check whether another slot is free
+                self._cond.notify_all()
+                return
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+                self.stats['shed_timeout'] += 1
+                raise AdmissionRejected('queue timeout')
+            self._cond.wait(remaining)
+
+    def snapshot(self):
+        """
+        Get admission metrics.
+
+        Returns:
+            dict: Counters plus the current in-flight and queued request counts
+        """
+        with self._cond:
+            return {
+                'in_flight': self._in_flight,
+                'queued': len(self._queue),
+                **self.stats
+            }
+
+# Process-wide controller shared by the location routes
+admission_controller = AdmissionController()
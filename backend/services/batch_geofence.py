@@ -0,0 +1,284 @@
+"""
+Process-pool engine for CPU-heavy batch geofencing.
+
+With a single process the kernels run in the calling thread on the engine's
+own NumPy arrays. With a pool, the zone arrays are published once into
+``multiprocessing.shared_memory`` and every worker maps them as zero-copy
+NumPy views. Point batches are copied into shared memory as well, so tasks
+only carry ``(start, end)`` offsets and write their results straight into a
+shared output array, already in input order. Nothing proportional to the zone
+set or the batch is pickled per task.
+"""
+
+import os
+import threading
+from multiprocessing import get_all_start_methods, get_context, resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from backend.utils.distance import EARTH_RADIUS_KM, circle_fence
+
+# Zone array columns: latitude (rad), longitude (rad), cos(latitude), radius (km), zone id, is safe,
+# then the squared flat-distance bounds proving a point inside or outside (see utils.distance)
+_ZONE_COLUMNS = 8
+
+# Upper bound on the number of point x zone distances computed at once per worker
+_MAX_PAIRS = 4_000_000
+
+# Shared arrays mapped by a pool worker process, set by _init_worker and _points.
+# Only pool workers use it; each engine has its own pool, so it is never shared
+# between engines.
+_shared = {}
+
+def _open(name):
+    """Map an existing shared memory block in a pool worker."""
+    block = SharedMemory(name=name)
+    # Attaching registered the block with the resource tracker as if this worker
+    # owned it; the engine unlinks it, so the worker drops that registration
+    resource_tracker.unregister(block._name, 'shared_memory')
+    return block
+
+def _init_worker(zones_name, zone_count):
+    """Pool initializer: map the shared zone array."""
+    block = _open(zones_name)
+    _shared['zones_block'] = block
+    _shared['zones'] = np.ndarray((zone_count, _ZONE_COLUMNS), dtype=np.float64, buffer=block.buf)
+
+def _points(points_name, point_count):
+    """Map a batch's shared point array, replacing the previously mapped batch."""
+    if _shared.get('points_name') != points_name:
+        _shared.pop('points', None)
+        block = _shared.pop('points_block', None)
+        if block is not None:
+            block.close()
+        block = _open(points_name)
+        _shared['points_block'] = block
+        _shared['points_name'] = points_name
+        # Latitude and longitude rows (radians) followed by two result rows
+        _shared['points'] = np.ndarray((4, point_count), dtype=np.float64, buffer=block.buf)
+    return _shared['points']
+
+def _haversine(lat, lon, zone_lat, zone_lon, zone_cos):
+    """Haversine distances (km) between point columns and zone rows, all in radians."""
+    dlat = zone_lat - lat
+    dlon = zone_lon - lon
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat) * zone_cos * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def _locate(zones, points, start, end):
+    """Find the highest priority zone containing each point of a slice."""
+    lat = points[0, start:end, None]
+    lon = points[1, start:end, None]
+    result = np.full(end - start, -1.0)
+    unassigned = np.ones(end - start, dtype=bool)
+
+    # Zones are sorted by priority, so the first containing zone is the answer
+    block = max(1, _MAX_PAIRS // max(1, end - start))
+    for zone_start in range(0, len(zones), block):
+        z = zones[zone_start:zone_start + block]
+
+        # Flat-earth distance settles most pairs; haversine only runs near the edges
+        dlat = lat - z[:, 0]
+        x = (np.remainder(lon - z[:, 1] + np.pi, 2 * np.pi) - np.pi) * z[:, 2]
+        flat_sq = dlat * dlat + x * x
+        inside = flat_sq <= z[:, 6]
+        edge_rows, edge_cols = np.nonzero(~inside & (flat_sq <= z[:, 7]))
+        if len(edge_rows):
+            zone_rows = z[edge_cols]
+            inside[edge_rows, edge_cols] = _haversine(
+                lat[edge_rows, 0], lon[edge_rows, 0], zone_rows[:, 0], zone_rows[:, 1], zone_rows[:, 2]
+            ) <= zone_rows[:, 3]
+
+        hit = inside.any(axis=1) & unassigned
+        if hit.any():
+            result[hit] = z[inside[hit].argmax(axis=1), 4]
+            unassigned &= ~hit
+        if not unassigned.any():
+            break
+
+    points[2, start:end] = result
+
+def _nearest_safe(zones, points, start, end):
+    """Find the nearest safe zone of each point of a slice."""
+    safe = zones[zones[:, 5] == 1.0]
+    lat = points[0, start:end, None]
+    lon = points[1, start:end, None]
+    best_id = np.full(end - start, -1.0)
+    best_distance = np.full(end - start, np.inf)
+
+    block = max(1, _MAX_PAIRS // max(1, end - start))
+    for zone_start in range(0, len(safe), block):
+        z = safe[zone_start:zone_start + block]
+        distances = _haversine(lat, lon, z[:, 0], z[:, 1], z[:, 2])
+        nearest = distances.argmin(axis=1)
+        nearest_distance = distances[np.arange(len(nearest)), nearest]
+        closer = nearest_distance < best_distance
+        best_id[closer] = z[nearest[closer], 4]
+        best_distance[closer] = nearest_distance[closer]
+
+    points[2, start:end] = best_id
+    points[3, start:end] = best_distance
+
+def _locate_range(span):
+    """Pool task: run ``_locate`` over a slice of a shared point batch."""
+    points_name, point_count, start, end = span
+    _locate(_shared['zones'], _points(points_name, point_count), start, end)
+
+def _nearest_safe_range(span):
+    """Pool task: run ``_nearest_safe`` over a slice of a shared point batch."""
+    points_name, point_count, start, end = span
+    _nearest_safe(_shared['zones'], _points(points_name, point_count), start, end)
+
+# Pool task running each kernel
+_POOL_TASKS = {_locate: _locate_range, _nearest_safe: _nearest_safe_range}
+
+class BatchGeofenceEngine:
+    """
+    Batch geofencing over a fixed zone set, optionally spread across a process pool.
+
+    An engine may be used from several threads at once.
+
+    Usage:
+        with BatchGeofenceEngine(zone_index.zones()) as engine:
+            zone_ids = engine.locate(latitudes, longitudes)
+    """
+
+    def __init__(self, zones, processes=1, chunk_size=20000):
+        """
+        Build the zone array.
+
+        Args:
+            zones (iterable): Zones sorted by priority (e.g. ``zone_index.zones()``)
+            processes (int): Worker processes, capped at the CPU count; with 1 the
+                kernels run in the calling thread and no pool is started
+            chunk_size (int): Points per task
+        """
+        if np is None:
+            raise RuntimeError('numpy is required for batch geofencing')
+
+        zones = list(zones)
+        self.zone_count = len(zones)
+        self.processes = max(1, min(processes or 1, os.cpu_count() or 1))
+        self.chunk_size = chunk_size
+
+        self._lock = threading.Lock()
+        self._pool = None
+        self._zones_block = None
+        self._zones = np.empty((self.zone_count, _ZONE_COLUMNS), dtype=np.float64)
+        for row, zone in enumerate(zones):
+            # Workers run haversine only, whatever DISTANCE_METHOD the zone index uses
+            fence = circle_fence(zone.latitude, zone.longitude, zone.radius)
+            self._zones[row] = (fence.lat, fence.lon, fence.cos_lat, zone.radius, zone.id,
+                                1.0 if zone.type == 'GREEN' else 0.0, fence.inner_sq, fence.outer_sq)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Stop the worker pool and release the shared zone arrays."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
+            if self._zones_block is not None:
+                _unlink(self._zones_block)
+                self._zones_block = None
+
+    def _ensure_pool(self):
+        """Publish the zones and start the worker pool on first use."""
+        with self._lock:
+            if self._pool is None:
+                self._zones_block = SharedMemory(create=True, size=max(1, self._zones.nbytes))
+                np.ndarray(self._zones.shape, dtype=np.float64, buffer=self._zones_block.buf)[:] = self._zones
+                # Workers stay up for the engine's lifetime and map the zones only once.
+                # They never fork the (threaded) web worker itself: forkserver starts
+                # them from a clean single-threaded process.
+                context = get_context('forkserver' if 'forkserver' in get_all_start_methods() else 'spawn')
+                self._pool = context.Pool(
+                    self.processes, initializer=_init_worker, initargs=(self._zones_block.name, self.zone_count)
+                )
+            return self._pool
+
+    def _run(self, kernel, latitudes, longitudes):
+        """
+        Run a kernel over all points, in parallel when the batch is large enough.
+
+        Returns:
+            ndarray: The two result rows
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        count = len(latitudes)
+        if count == 0:
+            return np.empty((2, 0))
+
+        starts = range(0, count, self.chunk_size)
+        if min(self.processes, len(starts)) <= 1:
+            # Arrays private to this call, so concurrent callers share nothing mutable
+            points = np.empty((4, count), dtype=np.float64)
+            points[0] = np.radians(latitudes)
+            points[1] = np.radians(longitudes)
+            for start in starts:
+                kernel(self._zones, points, start, min(start + self.chunk_size, count))
+            return points[2:4]
+
+        pool = self._ensure_pool()
+        points_block = SharedMemory(create=True, size=4 * count * 8)
+        try:
+            points = np.ndarray((4, count), dtype=np.float64, buffer=points_block.buf)
+            points[0] = np.radians(latitudes)
+            points[1] = np.radians(longitudes)
+            spans = [(points_block.name, count, start, min(start + self.chunk_size, count)) for start in starts]
+            # Results land in shared memory; the return values are only completion signals
+            for _ in pool.imap_unordered(_POOL_TASKS[kernel], spans):
+                pass
+            result = points[2:4].copy()
+            del points
+            return result
+        finally:
+            _unlink(points_block)
+
+    def locate(self, latitudes, longitudes):
+        """
+        Find the zone containing each point, with the same priority rules as
+        ``ZoneService.is_in_zone``.
+
+        Args:
+            latitudes (array-like): Point latitudes in degrees
+            longitudes (array-like): Point longitudes in degrees
+
+        Returns:
+            ndarray: Zone ID per point (int64), -1 where the point is in no zone
+        """
+        return self._run(_locate, latitudes, longitudes)[0].astype(np.int64)
+
+    def nearest_safe(self, latitudes, longitudes):
+        """
+        Find the nearest GREEN zone of each point, like ``ZoneService.find_nearest_safe_zone``.
+
+        Args:
+            latitudes (array-like): Point latitudes in degrees
+            longitudes (array-like): Point longitudes in degrees
+
+        Returns:
+            tuple: (zone IDs as int64 with -1 if there is no safe zone, distances in km)
+        """
+        result = self._run(_nearest_safe, latitudes, longitudes)
+        return result[0].astype(np.int64), result[1]
+
+def _unlink(block):
+    """Close and remove a shared memory block created by an engine."""
+    # Pool workers unregistered the name after attaching, which removed it from
+    # the resource tracker they share with this process; registering again is a
+    # no-op otherwise and keeps unlink's own unregister balanced
+    resource_tracker.register(block._name, 'shared_memory')
+    block.close()
+    block.unlink()
@@ -0,0 +1,403 @@
+"""
+Durable local ingest log for location writes.
+
+With INGEST_LOG_DIR set, ``LocationService.save_user_location`` appends each
+ping to an append-only segment log instead of writing to the database, so the
+``/check`` verdict never waits on a slow or unavailable database.
+
+Each worker process claims a slot directory (``slot-N``, held with a file
+lock) and writes numbered segment files of CRC-checked frames::
+
+    <payload length: uint32> <crc32 of payload: uint32> <JSON payload>
+
+Concurrent appends share fsync calls (group commit). A background applier
+bulk-inserts new records into user_locations and moves the slot's checkpoint
+(``ingest_checkpoints``) in the same transaction, so after a crash replay
+resumes exactly where it stopped. Slots whose worker is gone are drained by
+whichever applier can take their lock.
+
+Opening a slot only touches local disk: a writer always starts a fresh
+segment, numbered past both the existing files and the slot's ``applied``
+marker (the first segment the applier may still need), so pings are accepted
+while the database is down and the checkpoint is read by the applier, which
+retries every pass. The log is off by default; without it ``/check`` writes
+to the database directly and only logs a failed write.
+"""
+
+import itertools
+import json
+import os
+import struct
+import threading
+import zlib
+from collections import Counter
+from datetime import datetime
+from flask import current_app
+from backend.models import db, IngestCheckpoint, UserLocation
+from backend.services.address_service import address_service
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+FRAME = struct.Struct('<II')
+SEGMENT_SUFFIX = '.seg'
+APPLIED_MARKER = 'applied'
+
+def _segment_path(slot_dir, number):
+    """Get the path of a numbered segment file."""
+    return os.path.join(slot_dir, f"{number:010d}{SEGMENT_SUFFIX}")
+
+def _segments(slot_dir):
+    """List the segment numbers of a slot in order."""
+    return sorted(
+        int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(slot_dir)
+        if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit()
+    )
+
+def _read_marker(slot_dir):
+    """Get the segment number below which a slot's segments are applied, 0 if unknown."""
+    try:
+        with open(os.path.join(slot_dir, APPLIED_MARKER)) as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+def _write_marker(slot_dir, number):
+    """Atomically record that segments below number are applied."""
+    path = os.path.join(slot_dir, APPLIED_MARKER)
+    with open(path + '.tmp', 'w') as f:
+        f.write(str(number))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+def read_records(path, offset=0):
+    """
+    Read the records of a segment file.
+
+    Stops at the first incomplete or corrupt frame, which is where a crash
+    mid-write leaves the end of the log.
+
+    Args:
+        path (str): Segment file path
+        offset (int): Byte offset of the first frame to read
+
+    Yields:
+        tuple: (record dict, byte offset just past the record)
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while True:
+            header = f.read(FRAME.size)
+            if len(header) < FRAME.size:
+                return
+            length, checksum = FRAME.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                return
+            offset += FRAME.size + length
+            yield json.loads(payload), offset
+
+class IngestLog:
+    """Append-only segment log of location writes, replayed into the database."""
+
+    def __init__(self):
+        """Initialize a closed log; it is opened by the first append in each process."""
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._pid = None
+        self._slot = None
+        self._slot_dir = None
+        self._lock_file = None
+        self._file = None
+        self._segment = 0
+        self._offset = 0
+        self._synced = (0, 0)
+        self._applier = None
+        self.stats = Counter()
+
+    def start(self, app):
+        """
+        Open this process's slot and start its applier, if the log is enabled.
+
+        Call it after forking (e.g. from gunicorn's post_worker_init) so logs
+        left behind by a crashed worker are replayed before the first ping.
+
+        Args:
+            app (Flask): Application providing the config and database
+        """
+        if app.config.get('INGEST_LOG_DIR'):
+            with self._lock:
+                self._ensure_open(app)
+
+    def _ensure_open(self, app):
+        """Claim a slot and start a new segment in it; must hold the write lock."""
+        if self._pid == os.getpid():
+            return
+        if fcntl is None:
+            raise RuntimeError('the ingest log requires fcntl file locks')
+
+        # State copied from a parent process belongs to the parent's slot
+        slot, slot_dir, lock_file = self._claim_slot(app.config['INGEST_LOG_DIR'])
+        try:
+            # Never append to an existing segment: it may end in a torn frame, and
+            # the applier may already have moved its checkpoint past it
+            numbers = _segments(slot_dir)
+            segment = max(numbers[-1] + 1 if numbers else 0, _read_marker(slot_dir))
+            file = open(_segment_path(slot_dir, segment), 'ab', buffering=0)
+        except Exception:
+            # Give the slot back rather than holding it with no writer
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+            raise
+
+        self._slot, self._slot_dir, self._lock_file = slot, slot_dir, lock_file
+        self._file = file
+        self._segment = segment
+        self._offset = 0
+        self._synced = (segment, 0)
+        self._pid = os.getpid()
+
+        self._applier = IngestApplier(app, self)
+        self._applier.start()
+
+    def _claim_slot(self, directory):
+        """Lock the first slot directory not held by another process."""
+        for index in itertools.count():
+            slot = f"slot-{index}"
+            slot_dir = os.path.join(directory, slot)
+            os.makedirs(slot_dir, exist_ok=True)
+            lock_file = open(os.path.join(slot_dir, 'lock'), 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                continue
+            except Exception:
+                lock_file.close()
+                raise
+            return slot, slot_dir, lock_file
+
+    def append(self, record):
+        """
+        Durably append a record.
+
+        Must be called inside an application context.
+
+        Args:
+            record (dict): JSON-serializable location record
+        """
+        app = current_app._get_current_object()
+        payload = json.dumps(record, separators=(',', ':')).encode('utf-8')
+        frame = FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+        limit = app.config['INGEST_SEGMENT_BYTES']
+
+        with self._lock:
+            self._ensure_open(app)
+            full = self._offset and self._offset + len(frame) > limit
+
+        if full:
+            # Rolling takes both locks (sync first) so no fsync runs on a closed segment
+            with self._sync_lock, self._lock:
+                if self._offset and self._offset + len(frame) > limit:
+                    self._roll()
+
+        with self._lock:
+            view = memoryview(frame)
+            while view:
+                view = view[self._file.write(view):]
+            self._offset += len(frame)
+            position = (self._segment, self._offset)
+            self.stats['appended'] += 1
+
+        if app.config['INGEST_FSYNC']:
+            self._sync(position)
+
+    def _roll(self):
+        """Seal the current segment and start the next one; must hold both locks."""
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._synced = (self._segment, self._offset)
+        self._segment += 1
+        self._offset = 0
+        self._file = open(_segment_path(self._slot_dir, self._segment), 'ab', buffering=0)
+
+    def _sync(self, position):
+        """Make sure everything up to position is on disk, sharing one fsync between waiting appends."""
+        with self._sync_lock:
+            if self._synced >= position:
+                return
+            with self._lock:
+                target = (self._segment, self._offset)
+                file = self._file
+            os.fsync(file.fileno())
+            self._synced = target
+            self.stats['fsyncs'] += 1
+
+    def apply_pending(self):
+        """
+        Replay unapplied records of this process's slot and of abandoned slots.
+
+        Must be called inside an application context.
+
+        Returns:
+            int: Number of records written to the database
+        """
+        with self._lock:
+            own_slot, own_dir, active = self._slot, self._slot_dir, self._segment
+
+        applied = 0
+        if own_slot is not None:
+            applied += self._apply_slot(own_slot, own_dir, active)
+
+        directory = current_app.config['INGEST_LOG_DIR']
+        for slot in sorted(os.listdir(directory)):
+            slot_dir = os.path.join(directory, slot)
+            if slot == own_slot or not slot.startswith('slot-') or not _segments(slot_dir):
+                continue
+            lock_file = open(os.path.join(slot_dir, 'lock'), 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Owned by a live worker, which applies it itself
+                lock_file.close()
+                continue
+            try:
+                applied += self._apply_slot(slot, slot_dir, None)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+        with self._lock:
+            self.stats['applied'] += applied
+        return applied
+
+    def _apply_slot(self, slot, slot_dir, active):
+        """Replay one slot from its checkpoint, deleting fully applied segments."""
+        batch_size = current_app.config['INGEST_APPLY_BATCH']
+        checkpoint = db.session.get(IngestCheckpoint, slot)
+        if checkpoint is None:
+            checkpoint = IngestCheckpoint(slot=slot, segment=0, offset=0)
+            db.session.add(checkpoint)
+
+        applied = 0
+        marker = _read_marker(slot_dir)
+        for number in _segments(slot_dir):
+            path = _segment_path(slot_dir, number)
+            if number < marker:
+                # Fully applied before a crash between the checkpoint commit and the removal
+                os.remove(path)
+                continue
+            if number < checkpoint.segment:
+                # The marker moves before the checkpoint, so this segment was written
+                # after the slot directory lost its state; replay it from the start
+                current_app.logger.error(f"Segment {path} is behind checkpoint {checkpoint.segment}, replaying it")
+                checkpoint.segment = number
+                checkpoint.offset = 0
+
+            offset = checkpoint.offset if number == checkpoint.segment else 0
+            end = offset
+            batch = []
+            for record, end in read_records(path, offset):
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    self._commit(batch, checkpoint, number, end)
+                    applied += len(batch)
+                    batch = []
+            if batch:
+                self._commit(batch, checkpoint, number, end)
+                applied += len(batch)
+
+            if number == active:
+                # The writer is still appending to this segment
+                break
+
+            size = os.path.getsize(path)
+            if end < size:
+                current_app.logger.error(f"Skipping {size - end} unreadable bytes at the end of {path}")
+            # Writers start past the marker, so it moves before the checkpoint does
+            marker = number + 1
+            _write_marker(slot_dir, marker)
+            checkpoint.segment = number + 1
+            checkpoint.offset = 0
+            db.session.commit()
+            os.remove(path)
+
+        return applied
+
+    def _commit(self, batch, checkpoint, number, end):
+        """Insert a batch of records and move the checkpoint past it in one transaction."""
+        # New addresses are committed together with the batch
+        address_ids = [address_service.intern(record['address']) for record in batch]
+
+        db.session.execute(UserLocation.__table__.insert(), [
+            {
+                'phone_number': record['phone_number'],
+                'phone_e164': record['phone_e164'],
+                'phone_key': record['phone_key'],
+                'latitude': record['latitude'],
+                'longitude': record['longitude'],
+                'address_id': address_id,
+                'in_danger_zone': record['in_danger_zone'],
+                'zone_id': record['zone_id'],
+                'created_at': datetime.fromisoformat(record['created_at'])
+            }
+            for record, address_id in zip(batch, address_ids)
+        ])
+        checkpoint.segment = number
+        checkpoint.offset = end
+        db.session.commit()
+
+    def snapshot(self):
+        """
+        Get ingest log metrics of this process.
+
+        Returns:
+            dict: Slot, write position, and appended/fsync/applied counters
+        """
+        with self._lock:
+            return {
+                'slot': self._slot,
+                'segment': self._segment,
+                'offset': self._offset,
+                **self.stats
+            }
+
+class IngestApplier(threading.Thread):
+    """Background thread replaying the ingest log every INGEST_APPLY_INTERVAL seconds."""
+
+    def __init__(self, app, log):
+        """
+        Initialize the applier.
+
+        Args:
+            app (Flask): Application providing the config and database
+            log (IngestLog): Log to replay
+        """
+        super().__init__(name='ingest-applier', daemon=True)
+        self.app = app
+        self.log = log
+        self._stop_event = threading.Event()
+
+    def run(self):
+        """Replay the log until stopped."""
+        interval = self.app.config['INGEST_APPLY_INTERVAL']
+        while not self._stop_event.is_set():
+            with self.app.app_context():
+                try:
+                    self.log.apply_pending()
+                except Exception as e:
+                    db.session.rollback()
+                    current_app.logger.error(f"Error applying ingest log: {str(e)}")
+                finally:
+                    db.session.remove()
+            self._stop_event.wait(interval)
+
+    def stop(self):
+        """Ask the applier to stop after the current pass."""
+        self._stop_event.set()
+
+# Process-wide ingest log used by LocationService
+ingest_log = IngestLog()
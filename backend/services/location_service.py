@@ -1,19 +1,48 @@
+import threading
 import googlemaps
-from math import radians, cos, sin, asin, sqrt
+from datetime import datetime
 from flask import current_app
+from sqlalchemy import func
 from backend.models import db, UserLocation
+from backend.services.address_service import address_service
+from backend.services.ingest_log import ingest_log
+from backend.utils.distance import haversine
+from backend.utils.phone import normalize_phone_number, phone_key
+from backend.utils.serializers import USER_LOCATION_FIELDS
+from backend.utils.singleflight import SingleFlight
 
 class LocationService:
-    """Service for handling location-related operations."""
+    """
+    Service for handling location-related operations.
+    
+    Google Maps lookups are coalesced: concurrent requests for the same
+    quantized coordinates (see COALESCE_PRECISION) share one API call.
+    """
     
     def __init__(self):
         """Initialize the service without directly accessing config."""
         self.gmaps = None
+        self.flight = SingleFlight()
+        self._client_lock = threading.Lock()
     
     def _ensure_gmaps_client(self):
-        """Ensure Google Maps client is initialized when needed."""
+        """
+        Ensure Google Maps client is initialized when needed.
+        
+        The client is created once under a lock and then shared by all threads;
+        its HTTP session pools connections and is safe for concurrent requests.
+        """
         if self.gmaps is None:
-            self.gmaps = googlemaps.Client(key=current_app.config['GOOGLE_MAPS_API_KEY'])
+            with self._client_lock:
+                if self.gmaps is None:
+                    self.gmaps = googlemaps.Client(key=current_app.config['GOOGLE_MAPS_API_KEY'])
+    
+    def _coalesce(self, key, fn):
+        """Run a Google Maps call once for all concurrent callers with the same key."""
+        config = current_app.config
+        return self.flight.do(
+            key, fn, config.get('COALESCE_LOCK_DIR'), config['COALESCE_SHARED_TTL'], config['COALESCE_LOCK_WAIT']
+        )
     
     def get_address_from_coordinates(self, latitude, longitude):
         """
@@ -26,6 +55,15 @@ class LocationService:
         Returns:
             str: Formatted address or None if not found
         """
+        precision = current_app.config['COALESCE_PRECISION']
+        latitude, longitude = round(latitude, precision), round(longitude, precision)
+        return self._coalesce(
+            ('geocode', latitude, longitude),
+            lambda: self._reverse_geocode(latitude, longitude)
+        )
+    
+    def _reverse_geocode(self, latitude, longitude):
+        """Reverse geocode coordinates, returning None on failure."""
         try:
             self._ensure_gmaps_client()
             reverse_geocode_result = self.gmaps.reverse_geocode((latitude, longitude))
@@ -48,16 +86,7 @@ class LocationService:
         Returns:
             float: Distance in kilometers
         """
-        # Convert decimal degrees to radians
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        
-        # Haversine formula
-        dlon = lon2 - lon1
-        dlat = lat2 - lat1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * asin(sqrt(a))
-        r = 6371  # Radius of earth in kilometers
-        return c * r
+        return haversine(lat1, lon1, lat2, lon2)
     
     def get_directions(self, origin_lat, origin_lng, destination_lat, destination_lng):
         """
@@ -72,6 +101,15 @@ class LocationService:
         Returns:
             dict: Directions information
         """
+        precision = current_app.config['COALESCE_PRECISION']
+        origin_lat, origin_lng = round(origin_lat, precision), round(origin_lng, precision)
+        return self._coalesce(
+            ('directions', origin_lat, origin_lng, destination_lat, destination_lng),
+            lambda: self._fetch_directions(origin_lat, origin_lng, destination_lat, destination_lng)
+        )
+    
+    def _fetch_directions(self, origin_lat, origin_lng, destination_lat, destination_lng):
+        """Fetch driving directions, returning None on failure."""
         try:
             self._ensure_gmaps_client()
             directions_result = self.gmaps.directions(
@@ -109,6 +147,12 @@ class LocationService:
         """
         Save user location to database.
         
+        The normalized E.164 form and integer key of the phone number are stored
+        alongside the raw value, and the address is interned into the shared
+        addresses table. With INGEST_LOG_DIR set the location is appended to
+        the local ingest log instead and written to the database in the
+        background, so this never waits on the database.
+        
         Args:
             phone_number (str): User's phone number
             latitude (float): User's latitude
@@ -118,13 +162,31 @@ class LocationService:
             zone_id (int): ID of the zone if user is in one
             
         Returns:
-            UserLocation: Saved user location object
+            UserLocation: Saved user location object, or None if it went to the ingest log
         """
+        phone_e164 = normalize_phone_number(phone_number, current_app.config['DEFAULT_PHONE_REGION'])
+        
+        if current_app.config.get('INGEST_LOG_DIR'):
+            ingest_log.append({
+                'phone_number': phone_number,
+                'phone_e164': phone_e164,
+                'phone_key': phone_key(phone_e164),
+                'latitude': latitude,
+                'longitude': longitude,
+                'address': address,
+                'in_danger_zone': in_danger_zone,
+                'zone_id': zone_id,
+                'created_at': datetime.utcnow().isoformat()
+            })
+            return None
+        
         user_location = UserLocation(
             phone_number=phone_number,
+            phone_e164=phone_e164,
+            phone_key=phone_key(phone_e164),
             latitude=latitude,
             longitude=longitude,
-            address=address,
+            address_id=address_service.intern(address),
             in_danger_zone=in_danger_zone,
             zone_id=zone_id
         )
@@ -132,4 +194,99 @@ class LocationService:
         db.session.add(user_location)
         db.session.commit()
         
-        return user_location
\ No newline at end of file
+        return user_location
+    
+    def _location_columns(self):
+        """Get the columns selected by the bulk location queries."""
+        return [getattr(UserLocation, field) for field in USER_LOCATION_FIELDS]
+    
+    def _iter_chunks(self, query, limit=None, chunk_size=1000):
+        """
+        Iterate over a location query newest first using keyset pagination.
+        
+        Args:
+            query: Query selecting the bulk location columns
+            limit (int, optional): Maximum number of rows in total
+            chunk_size (int): Number of rows fetched per query
+            
+        Yields:
+            list: Chunks of row tuples
+        """
+        last_id = None
+        remaining = limit
+        
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            chunk_query = query
+            if last_id is not None:
+                chunk_query = chunk_query.filter(UserLocation.id < last_id)
+            rows = chunk_query.order_by(UserLocation.id.desc()).limit(size).all()
+            if not rows:
+                return
+            
+            yield rows
+            
+            last_id = rows[-1].id
+            if remaining is not None:
+                remaining -= len(rows)
+            if len(rows) < size:
+                return
+    
+    def iter_locations(self, phone_e164=None, zone_ids=None, in_danger_zone=None,
+                       since=None, until=None, limit=None, chunk_size=1000):
+        """
+        Iterate over stored user locations, newest first, selecting only the
+        columns needed for serialization.
+        
+        Args:
+            phone_e164 (str, optional): Only locations of this E.164 number
+            zone_ids (list, optional): Only locations in these zones
+            in_danger_zone (bool, optional): Filter on the danger flag
+            since (datetime, optional): Only locations created at or after this time
+            until (datetime, optional): Only locations created before this time
+            limit (int, optional): Maximum number of locations
+            chunk_size (int): Number of rows fetched per query
+            
+        Yields:
+            list: Chunks of row tuples
+        """
+        query = db.session.query(*self._location_columns())
+        
+        if phone_e164 is not None:
+            query = query.filter(UserLocation.phone_key == phone_key(phone_e164))
+        if zone_ids is not None:
+            query = query.filter(UserLocation.zone_id.in_(zone_ids))
+        if in_danger_zone is not None:
+            query = query.filter(UserLocation.in_danger_zone == in_danger_zone)
+        if since is not None:
+            query = query.filter(UserLocation.created_at >= since)
+        if until is not None:
+            query = query.filter(UserLocation.created_at < until)
+        
+        return self._iter_chunks(query, limit, chunk_size)
+    
+    def iter_latest_locations(self, zone_ids=None, in_danger_zone=None, limit=None, chunk_size=1000):
+        """
+        Iterate over the most recent location of every phone, newest first.
+        
+        Args:
+            zone_ids (list, optional): Only phones currently in these zones
+            in_danger_zone (bool, optional): Filter on the danger flag
+            limit (int, optional): Maximum number of locations
+            chunk_size (int): Number of rows fetched per query
+            
+        Yields:
+            list: Chunks of row tuples
+        """
+        latest_ids = (
+            db.session.query(func.max(UserLocation.id))
+            .group_by(UserLocation.phone_key)
+        )
+        query = db.session.query(*self._location_columns()).filter(UserLocation.id.in_(latest_ids))
+        
+        if zone_ids is not None:
+            query = query.filter(UserLocation.zone_id.in_(zone_ids))
+        if in_danger_zone is not None:
+            query = query.filter(UserLocation.in_danger_zone == in_danger_zone)
+        
+        return self._iter_chunks(query, limit, chunk_size)
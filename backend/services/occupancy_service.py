@@ -0,0 +1,319 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+from backend.models import db, UserLocation
+from backend.utils import geohash
+
+class OccupancyTracker:
+    """
+    Live per-zone occupancy counters and a multi-resolution population heatmap.
+
+    Every phone is counted once, at its most recent position. ``record`` moves
+    the phone from its previous zone and grid cells to the new ones, so reads
+    are served from memory without scanning user_locations. Counters are
+    rebuilt from the database every OCCUPANCY_RECONCILE_INTERVAL seconds, which
+    folds in pings handled by other workers and drops phones that have not
+    reported within OCCUPANCY_WINDOW_MINUTES. Reconciliation runs in a
+    background thread; pings recorded while it queries are kept aside and
+    applied again on top of the rebuilt counters, as the database may not
+    have them yet.
+    """
+
+    def __init__(self):
+        """Initialize empty counters; they are built from the database on first use."""
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._precisions = ()
+        # phone key -> (zone_id, tuple of geohash cells one per precision, latitude, longitude)
+        self._phones = {}
+        self._zone_counts = Counter()
+        self._cell_counts = {}
+        self._built_at = None
+        # While a rebuild runs: phone key -> entry of the phones moved since it started,
+        # and the zones deleted since it started
+        self._changes = None
+        self._forgotten = None
+
+    def _cells(self, latitude, longitude):
+        """Get the geohash cells of a point at every tracked precision."""
+        finest = geohash.encode(latitude, longitude, self._precisions[-1])
+        return tuple(finest[:precision] for precision in self._precisions)
+
+    def _add(self, zone_id, cells, delta):
+        """Apply a count delta to a zone and its grid cells."""
+        if zone_id is not None:
+            self._zone_counts[zone_id] += delta
+            if self._zone_counts[zone_id] <= 0:
+                del self._zone_counts[zone_id]
+
+        for precision, cell in zip(self._precisions, cells):
+            counts = self._cell_counts[precision]
+            counts[cell] += delta
+            if counts[cell] <= 0:
+                del counts[cell]
+
+    def rebuild(self):
+        """
+        Rebuild all counters from the latest recent location of every phone.
+
+        Must be called inside an application context.
+
+        Returns:
+            int: Number of phones counted
+        """
+        config = current_app.config
+        since = datetime.utcnow() - timedelta(minutes=config['OCCUPANCY_WINDOW_MINUTES'])
+
+        with self._lock:
+            self._changes = {}
+            self._forgotten = set()
+
+        try:
+            latest_ids = (
+                db.session.query(func.max(UserLocation.id))
+                .filter(UserLocation.created_at >= since, UserLocation.phone_key.isnot(None))
+                .group_by(UserLocation.phone_key)
+            )
+            rows = (
+                db.session.query(
+                    UserLocation.phone_key, UserLocation.zone_id,
+                    UserLocation.latitude, UserLocation.longitude
+                )
+                .filter(UserLocation.id.in_(latest_ids))
+                .all()
+            )
+        except Exception:
+            with self._lock:
+                self._changes = self._forgotten = None
+            raise
+
+        precisions = tuple(sorted(config['HEATMAP_PRECISIONS']))
+        phones = {}
+        for row in rows:
+            finest = geohash.encode(row.latitude, row.longitude, precisions[-1])
+            cells = tuple(finest[:precision] for precision in precisions)
+            phones[row.phone_key] = (row.zone_id, cells, row.latitude, row.longitude)
+
+        with self._lock:
+            changes, forgotten = self._changes, self._forgotten
+            self._changes = self._forgotten = None
+
+            self._precisions = precisions
+            self._phones = {}
+            self._zone_counts = Counter()
+            self._cell_counts = {precision: Counter() for precision in precisions}
+
+            # Phones moved during the query may be missing from it, or be there at an older position
+            phones.update(changes)
+            for phone, (zone_id, cells, latitude, longitude) in phones.items():
+                if zone_id in forgotten:
+                    zone_id = None
+                self._phones[phone] = (zone_id, cells, latitude, longitude)
+                self._add(zone_id, cells, 1)
+
+            self._built_at = time.monotonic()
+
+        return len(phones)
+
+    def _due(self):
+        """Check whether the counters were never built or are due for reconciliation."""
+        interval = current_app.config.get('OCCUPANCY_RECONCILE_INTERVAL', 0)
+        return self._built_at is None or bool(interval and time.monotonic() - self._built_at > interval)
+
+    def _reconcile(self):
+        """Rebuild the counters, keeping the live ones if the database is unavailable."""
+        try:
+            self.rebuild()
+        except SQLAlchemyError as e:
+            # Keep counting live pings while the database is unavailable and reconcile later
+            db.session.rollback()
+            with self._lock:
+                if self._built_at is None:
+                    self._precisions = tuple(sorted(current_app.config['HEATMAP_PRECISIONS']))
+                    self._cell_counts = {precision: Counter() for precision in self._precisions}
+                self._built_at = time.monotonic()
+            current_app.logger.warning(f"Occupancy reconciliation failed, keeping live counters: {str(e)}")
+
+    def _reconcile_in_background(self, app):
+        """Thread target: reconcile the counters, then let the next reconciliation start."""
+        with app.app_context():
+            try:
+                self._reconcile()
+            except Exception as e:
+                current_app.logger.error(f"Error reconciling occupancy counters: {str(e)}")
+            finally:
+                db.session.remove()
+                self._rebuild_lock.release()
+
+    def _ensure_fresh(self):
+        """
+        Build the counters if they were never built, or start their reconciliation if it is due.
+
+        The first build runs in the calling thread and the other threads wait
+        for it. Later reconciliations run in a background thread, one at a
+        time, while requests keep counting against the current state.
+        """
+        if not self._due():
+            return
+        if not self._rebuild_lock.acquire(blocking=self._built_at is None):
+            return
+
+        if not self._due():
+            # Built or reconciled by another thread meanwhile
+            self._rebuild_lock.release()
+            return
+
+        if self._built_at is None:
+            try:
+                self._reconcile()
+            finally:
+                self._rebuild_lock.release()
+            return
+
+        try:
+            threading.Thread(
+                target=self._reconcile_in_background, args=(current_app._get_current_object(),),
+                name='occupancy-reconcile', daemon=True
+            ).start()
+        except Exception:
+            self._rebuild_lock.release()
+            raise
+
+    def record(self, phone_key, zone_id, latitude, longitude):
+        """
+        Move a phone to its newly reported position.
+
+        Args:
+            phone_key (int): Integer key of the phone number
+            zone_id (int): Zone the phone is now in, or None
+            latitude (float): New latitude
+            longitude (float): New longitude
+        """
+        self._ensure_fresh()
+        cells = self._cells(latitude, longitude)
+
+        with self._lock:
+            previous = self._phones.get(phone_key)
+            self._phones[phone_key] = (zone_id, cells, latitude, longitude)
+            if self._changes is not None:
+                self._changes[phone_key] = self._phones[phone_key]
+            if previous is not None and previous[:2] == (zone_id, cells):
+                return
+            if previous is not None:
+                self._add(previous[0], previous[1], -1)
+            self._add(zone_id, cells, 1)
+
+    def forget_zone(self, zone_id):
+        """
+        Stop counting a deleted zone; its phones stay in the heatmap.
+
+        Args:
+            zone_id (int): Zone ID
+        """
+        with self._lock:
+            self._zone_counts.pop(zone_id, None)
+            if self._forgotten is not None:
+                self._forgotten.add(zone_id)
+            for phone, (phone_zone_id, cells, latitude, longitude) in list(self._phones.items()):
+                if phone_zone_id == zone_id:
+                    self._phones[phone] = (None, cells, latitude, longitude)
+
+    def reassign(self, zone, resolve):
+        """
+        Re-resolve the zone of every phone a zone activation or expiry can affect.
+
+        Args:
+            zone (IndexedZone): Zone that went live or expired
+            resolve (callable): Maps (latitude, longitude) to the zone ID the
+                point is now in, or None
+
+        Returns:
+            list: (phone_key, zone_id) of the phones that changed zone
+        """
+        with self._lock:
+            # Only phones in the zone, or within its latitude band, can change
+            candidates = [
+                (phone, entry) for phone, entry in self._phones.items()
+                if entry[0] == zone.id or abs(entry[2] - zone.latitude) <= zone.lat_margin
+            ]
+
+        # Resolving looks zones up (and may load them), so it runs without the lock
+        changes = []
+        for phone, entry in candidates:
+            new_zone_id = resolve(entry[2], entry[3])
+            if new_zone_id != entry[0]:
+                changes.append((phone, entry, new_zone_id))
+
+        moved = []
+        with self._lock:
+            for phone, entry, new_zone_id in changes:
+                if self._phones.get(phone) is not entry:
+                    # Moved by a newer ping (or a rebuild) in the meantime
+                    continue
+                zone_id, cells, latitude, longitude = entry
+                self._add(zone_id, (), -1)
+                self._add(new_zone_id, (), 1)
+                self._phones[phone] = (new_zone_id, cells, latitude, longitude)
+                if self._changes is not None:
+                    self._changes[phone] = self._phones[phone]
+                moved.append((phone, new_zone_id))
+        return moved
+
+    def zone_occupancy(self, zone_id):
+        """
+        Get the number of phones currently in a zone.
+
+        Args:
+            zone_id (int): Zone ID
+
+        Returns:
+            int: Number of phones
+        """
+        self._ensure_fresh()
+        return self._zone_counts.get(zone_id, 0)
+
+    def precisions(self):
+        """
+        Get the geohash precisions aggregated by the heatmap.
+
+        Returns:
+            tuple: Precisions in ascending order
+        """
+        self._ensure_fresh()
+        return self._precisions
+
+    def heatmap(self, min_lat, min_lon, max_lat, max_lon, precision):
+        """
+        Get phone counts per geohash cell inside a bounding box.
+
+        Cells are looked up directly when the box covers few of them, otherwise
+        the populated cells at that precision are filtered by the box.
+
+        Args:
+            min_lat, min_lon, max_lat, max_lon (float): Bounding box in degrees
+            precision (int): One of the tracked geohash precisions
+
+        Returns:
+            dict: Geohash mapped to the number of phones in it (empty cells omitted)
+        """
+        self._ensure_fresh()
+
+        with self._lock:
+            counts = self._cell_counts[precision]
+            if geohash.count_cells(min_lat, min_lon, max_lat, max_lon, precision) <= len(counts):
+                return {
+                    cell: counts[cell]
+                    for cell in geohash.cells_in_bbox(min_lat, min_lon, max_lat, max_lon, precision)
+                    if cell in counts
+                }
+            return {
+                cell: count for cell, count in counts.items()
+                if geohash.bbox_intersects(cell, min_lat, min_lon, max_lat, max_lon)
+            }
+
+# Process-wide tracker shared by all routes
+occupancy_tracker = OccupancyTracker()
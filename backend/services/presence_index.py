@@ -0,0 +1,310 @@
+import math
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from backend.models import db, UserLocation
+from backend.services.location_service import LocationService
+from backend.services.zone_index import KM_PER_DEGREE_LAT
+from backend.utils import geohash
+
+EPOCH = datetime(1970, 1, 1)
+
+# Rows read per catch-up query and phones per confirmation query
+CATCH_UP_CHUNK = 10000
+CONFIRM_CHUNK = 500
+
+def _timestamp(value):
+    """Convert a naive UTC datetime to epoch seconds."""
+    return (value - EPOCH).total_seconds()
+
+class PresenceIndex:
+    """
+    Spatio-temporal index answering "which phones were inside this circle
+    between t1 and t2".
+
+    Pings are grouped into time buckets of PRESENCE_BUCKET_MINUTES, each
+    mapping geohash cells (PRESENCE_PRECISION) to posting lists of
+    ``phone_key -> (first_seen, last_seen)``. A query visits only the buckets
+    overlapping the window and the cells covering the circle:
+
+    - cells entirely inside the circle, in buckets entirely inside the window,
+      are answered from the postings alone
+    - otherwise a phone is accepted when its first or last sighting in the
+      cell falls inside the window, and any remaining candidates are confirmed
+      with one indexed query on their own pings
+
+    The index is built from user_locations on first use and then kept current
+    by ``record`` on every ping handled here, plus a catch-up read of rows
+    added by other workers (by id watermark) before each query. Each catch-up
+    also re-reads the last PRESENCE_CATCH_UP_OVERLAP ids below the watermark,
+    since concurrent transactions can commit out of id order; a row committed
+    after that many later ids is still missed by the index. Buckets older than
+    PRESENCE_RETENTION_HOURS are dropped, and the part of a window before the
+    retained range is answered from user_locations directly.
+    """
+
+    def __init__(self):
+        """Initialize an empty index; it is built from the database on first query."""
+        self._lock = threading.Lock()
+        self._catch_up_lock = threading.Lock()
+        self._buckets = {}
+        self._watermark = None
+        self._horizon = None
+        self._bucket_seconds = None
+        self._precision = None
+        self._distance = LocationService().calculate_distance
+
+    def _add(self, phone_key, latitude, longitude, seen):
+        """Add a sighting to its posting list; must hold the lock."""
+        bucket = int(seen // self._bucket_seconds)
+        cell = geohash.encode(latitude, longitude, self._precision)
+        postings = self._buckets.setdefault(bucket, {}).setdefault(cell, {})
+        span = postings.get(phone_key)
+        if span is None:
+            postings[phone_key] = (seen, seen)
+        elif seen < span[0] or seen > span[1]:
+            postings[phone_key] = (min(span[0], seen), max(span[1], seen))
+
+    def _evict(self, now):
+        """Drop buckets past the retention window; must hold the lock."""
+        retention = current_app.config['PRESENCE_RETENTION_HOURS'] * 3600
+        oldest = int((now - retention) // self._bucket_seconds)
+        for bucket in [bucket for bucket in self._buckets if bucket < oldest]:
+            del self._buckets[bucket]
+        self._horizon = max(self._horizon, oldest * self._bucket_seconds)
+
+    def record(self, phone_key, latitude, longitude, seen=None):
+        """
+        Add a ping to the index.
+
+        Does nothing until the index has been built by a first query, so
+        workers that never answer presence queries keep no postings.
+
+        Args:
+            phone_key (int): Integer key of the phone number
+            latitude (float): Ping latitude
+            longitude (float): Ping longitude
+            seen (datetime, optional): Ping time in UTC, defaults to now
+        """
+        if self._watermark is None or phone_key is None:
+            return
+        with self._lock:
+            self._add(phone_key, latitude, longitude, _timestamp(seen or datetime.utcnow()))
+
+    def catch_up(self):
+        """
+        Fold in rows written since the last catch-up (all retained rows on first use).
+
+        Concurrent callers are serialized so every row is read once.
+        Must be called inside an application context.
+
+        Returns:
+            int: Number of rows read
+        """
+        with self._catch_up_lock:
+            return self._catch_up()
+
+    def _catch_up(self):
+        """Read new rows into the index; must hold the catch-up lock."""
+        config = current_app.config
+        now = datetime.utcnow()
+        cutoff = now - timedelta(hours=config['PRESENCE_RETENTION_HOURS'])
+
+        with self._lock:
+            if self._watermark is None:
+                self._bucket_seconds = config['PRESENCE_BUCKET_MINUTES'] * 60
+                self._precision = config['PRESENCE_PRECISION']
+                # Every ping from here on is in the index
+                self._horizon = _timestamp(cutoff)
+                watermark = 0
+            else:
+                # Adding a sighting twice changes nothing, so rows read again are harmless
+                watermark = max(0, self._watermark - config['PRESENCE_CATCH_UP_OVERLAP'])
+
+        read = 0
+        while True:
+            rows = (
+                db.session.query(
+                    UserLocation.id, UserLocation.phone_key, UserLocation.latitude,
+                    UserLocation.longitude, UserLocation.created_at
+                )
+                .filter(UserLocation.id > watermark)
+                .order_by(UserLocation.id)
+                .limit(CATCH_UP_CHUNK)
+                .all()
+            )
+            with self._lock:
+                for row in rows:
+                    if row.phone_key is not None and row.created_at is not None and row.created_at >= cutoff:
+                        self._add(row.phone_key, row.latitude, row.longitude, _timestamp(row.created_at))
+                if rows:
+                    watermark = rows[-1].id
+                self._watermark = max(self._watermark or 0, watermark)
+            read += len(rows)
+            if len(rows) < CATCH_UP_CHUNK:
+                break
+
+        with self._lock:
+            self._evict(_timestamp(now))
+        return read
+
+    def _classify_cells(self, latitude, longitude, radius):
+        """Split the cells covering a circle into fully inside and boundary cells."""
+        dlat = radius / KM_PER_DEGREE_LAT
+        dlon = dlat / max(math.cos(math.radians(latitude)), 1e-6)
+        inside, boundary = set(), set()
+
+        for cell in geohash.cells_in_bbox(latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon,
+                                          self._precision):
+            lat_lo, lon_lo, lat_hi, lon_hi = geohash.decode_bbox(cell)
+            # Nearest point of the cell to the center, and its farthest corner
+            near_lat = min(max(latitude, lat_lo), lat_hi)
+            near_lon = min(max(longitude, lon_lo), lon_hi)
+            if self._distance(latitude, longitude, near_lat, near_lon) > radius:
+                continue
+            far_lat = lat_lo if abs(latitude - lat_lo) > abs(latitude - lat_hi) else lat_hi
+            far_lon = lon_lo if abs(longitude - lon_lo) > abs(longitude - lon_hi) else lon_hi
+            if self._distance(latitude, longitude, far_lat, far_lon) <= radius:
+                inside.add(cell)
+            else:
+                boundary.add(cell)
+
+        return inside, boundary
+
+    def query(self, latitude, longitude, radius, start, end):
+        """
+        Find every phone with a ping inside a circle during a time window.
+
+        The part of the window before the retained buckets is scanned from
+        user_locations instead. Must be called inside an application context.
+
+        Args:
+            latitude (float): Circle center latitude
+            longitude (float): Circle center longitude
+            radius (float): Circle radius in kilometers
+            start (datetime): Window start in UTC (inclusive)
+            end (datetime): Window end in UTC (exclusive)
+
+        Returns:
+            dict: Sorted phone keys and counters of the work done
+        """
+        self.catch_up()
+        t1, t2 = _timestamp(start), _timestamp(end)
+        inside, boundary = self._classify_cells(latitude, longitude, radius)
+        cells = inside | boundary
+
+        found = set()
+        candidates = set()
+        visited_buckets = visited_cells = 0
+        scanned = 0
+
+        with self._lock:
+            horizon = self._horizon
+            first_bucket = int(t1 // self._bucket_seconds)
+            last_bucket = int(math.ceil(t2 / self._bucket_seconds)) - 1
+            # Only retained buckets can match, however long the window is
+            buckets = sorted(bucket for bucket in self._buckets if first_bucket <= bucket <= last_bucket)
+            for bucket in buckets:
+                cell_postings = self._buckets[bucket]
+                if not cell_postings:
+                    continue
+                visited_buckets += 1
+                covered = t1 <= bucket * self._bucket_seconds and (bucket + 1) * self._bucket_seconds <= t2
+
+                # Walk whichever side is smaller: the circle's cells or the bucket's cells
+                if len(cell_postings) < len(cells):
+                    matches = [(cell, postings) for cell, postings in cell_postings.items() if cell in cells]
+                else:
+                    matches = [(cell, cell_postings[cell]) for cell in cells if cell in cell_postings]
+
+                for cell, postings in matches:
+                    visited_cells += 1
+                    if cell in inside and covered:
+                        found.update(postings)
+                        continue
+                    for key, (first_seen, last_seen) in postings.items():
+                        if key in found:
+                            continue
+                        if last_seen < t1 or first_seen >= t2:
+                            continue
+                        if cell in inside and (t1 <= first_seen < t2 or t1 <= last_seen < t2):
+                            found.add(key)
+                        else:
+                            candidates.add(key)
+
+        candidates -= found
+        found |= self._confirm(candidates, latitude, longitude, radius, start, end)
+
+        if t1 < horizon:
+            # The index no longer holds this part of the window
+            older, scanned = self._scan(latitude, longitude, radius, start, min(end, EPOCH + timedelta(seconds=horizon)))
+            found |= older
+
+        return {
+            'phone_keys': sorted(found),
+            'buckets': visited_buckets,
+            'cells': visited_cells,
+            'confirmed': len(candidates),
+            'scanned': scanned
+        }
+
+    def _scan(self, latitude, longitude, radius, start, end):
+        """
+        Find the phones with a stored ping inside a circle during a window, without the index.
+
+        Returns:
+            tuple: (set of phone keys, number of rows read)
+        """
+        dlat = radius / KM_PER_DEGREE_LAT
+        dlon = dlat / max(math.cos(math.radians(latitude)), 1e-6)
+        rows = (
+            db.session.query(UserLocation.phone_key, UserLocation.latitude, UserLocation.longitude)
+            .filter(
+                UserLocation.phone_key.isnot(None),
+                UserLocation.created_at >= start,
+                UserLocation.created_at < end,
+                UserLocation.latitude.between(latitude - dlat, latitude + dlat),
+                UserLocation.longitude.between(longitude - dlon, longitude + dlon)
+            )
+            .yield_per(CATCH_UP_CHUNK)
+        )
+        found = set()
+        read = 0
+        for row in rows:
+            read += 1
+            if row.phone_key not in found and \
+                    self._distance(latitude, longitude, row.latitude, row.longitude) <= radius:
+                found.add(row.phone_key)
+        return found, read
+
+    def _confirm(self, candidates, latitude, longitude, radius, start, end):
+        """Check candidate phones against their stored pings in the window."""
+        if not candidates:
+            return set()
+
+        dlat = radius / KM_PER_DEGREE_LAT
+        dlon = dlat / max(math.cos(math.radians(latitude)), 1e-6)
+        confirmed = set()
+        candidates = list(candidates)
+
+        for i in range(0, len(candidates), CONFIRM_CHUNK):
+            rows = (
+                db.session.query(UserLocation.phone_key, UserLocation.latitude, UserLocation.longitude)
+                .filter(
+                    UserLocation.phone_key.in_(candidates[i:i + CONFIRM_CHUNK]),
+                    UserLocation.created_at >= start,
+                    UserLocation.created_at < end,
+                    UserLocation.latitude.between(latitude - dlat, latitude + dlat),
+                    UserLocation.longitude.between(longitude - dlon, longitude + dlon)
+                )
+                .all()
+            )
+            for row in rows:
+                if row.phone_key not in confirmed and \
+                        self._distance(latitude, longitude, row.latitude, row.longitude) <= radius:
+                    confirmed.add(row.phone_key)
+
+        return confirmed
+
+# Process-wide presence index shared by all routes
+presence_index = PresenceIndex()
@@ -0,0 +1,231 @@
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from flask import current_app
+
+# Label of stacks sampled after PROFILER_MAX_STACKS distinct ones were collected
+TRUNCATED = '[truncated]'
+
+class SamplingProfiler:
+    """
+    In-process sampling profiler for request threads.
+
+    A sampler thread wakes every PROFILER_INTERVAL seconds, reads the current
+    frame of each thread serving a profiled request (``sys._current_frames``)
+    and counts its collapsed stack, rooted at the request's method and path.
+    Requests are profiled while a window opened with ``enable`` is running
+    (optionally only those whose path starts with a prefix), or individually
+    when they carry the admin token.
+
+    Nothing runs while profiling is off: the sampler thread exits once the
+    window is over and no profiled request is in flight, and the per-request
+    check is a timestamp comparison. State is per process, so with several
+    gunicorn workers each one profiles (and reports) its own requests.
+    """
+
+    def __init__(self):
+        """Initialize an idle profiler."""
+        self._lock = threading.Lock()
+        self._targets = {}
+        self._stacks = Counter()
+        self._labels = {}
+        self._until = 0.0
+        self._prefix = None
+        self._samples = 0
+        self._thread = None
+
+    def authorized(self, token):
+        """
+        Check an admin token against PROFILER_TOKEN.
+
+        Args:
+            token (str): Token sent by the client
+
+        Returns:
+            bool: True if profiling is configured and the token matches
+        """
+        expected = current_app.config.get('PROFILER_TOKEN')
+        return bool(expected and token) and hmac.compare_digest(token.encode(), expected.encode())
+
+    def enable(self, seconds, prefix=None):
+        """
+        Profile requests for a while.
+
+        Args:
+            seconds (float): Window length, capped at PROFILER_MAX_SECONDS
+            prefix (str, optional): Only profile requests whose path starts with it
+
+        Returns:
+            float: Epoch time at which the window ends
+        """
+        seconds = min(seconds, current_app.config['PROFILER_MAX_SECONDS'])
+        with self._lock:
+            self._until = time.time() + seconds
+            self._prefix = prefix
+            self._ensure_sampler()
+            return self._until
+
+    def disable(self):
+        """Close the current window; requests already being profiled finish normally."""
+        with self._lock:
+            self._until = 0.0
+            self._prefix = None
+
+    def wants(self, path):
+        """
+        Check whether the open window covers a request path.
+
+        Args:
+            path (str): Request path
+
+        Returns:
+            bool: True if the request should be profiled
+        """
+        if self._until < time.time():
+            return False
+        prefix = self._prefix
+        return prefix is None or path.startswith(prefix)
+
+    def attach(self, label):
+        """
+        Start sampling the calling thread.
+
+        Args:
+            label (str): Root frame of its stacks, e.g. "GET /api/location/check"
+        """
+        with self._lock:
+            self._targets[threading.get_ident()] = label
+            self._ensure_sampler()
+
+    def detach(self):
+        """Stop sampling the calling thread."""
+        if self._targets:
+            with self._lock:
+                self._targets.pop(threading.get_ident(), None)
+
+    def _ensure_sampler(self):
+        """Start the sampler thread if it is not running; must hold the lock."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        config = current_app.config
+        self._thread = ProfileSampler(self, config['PROFILER_INTERVAL'], config['PROFILER_MAX_STACKS'])
+        self._thread.start()
+
+    def _frame_label(self, code):
+        """Name a code object as "function (path:line)", cached per code object."""
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename
+            parts = path.replace(os.sep, '/').rsplit('/', 3)
+            short = '/'.join(parts[-3:]) if len(parts) > 1 else path
+            label = f"{code.co_name} ({short}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def sample(self, max_stacks):
+        """
+        Take one sample of every profiled thread.
+
+        Args:
+            max_stacks (int): Distinct stacks kept before new ones are counted as truncated
+
+        Returns:
+            bool: False once the window is over and no thread is profiled
+        """
+        with self._lock:
+            targets = dict(self._targets)
+            if not targets and self._until < time.time():
+                self._thread = None
+                return False
+        if not targets:
+            return True
+
+        frames = sys._current_frames()
+        collapsed = []
+        for ident, label in targets.items():
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                names.append(self._frame_label(frame.f_code))
+                frame = frame.f_back
+            names.append(label)
+            names.reverse()
+            collapsed.append(';'.join(names))
+        del frames
+
+        with self._lock:
+            for stack in collapsed:
+                if stack not in self._stacks and len(self._stacks) >= max_stacks:
+                    stack = TRUNCATED
+                self._stacks[stack] += 1
+            self._samples += len(collapsed)
+        return True
+
+    def collapsed(self, reset=False):
+        """
+        Get the aggregated stacks in collapsed ("folded") format.
+
+        Each line is the frames from the root, separated by semicolons,
+        followed by a space and the sample count; flamegraph.pl, speedscope
+        and similar tools read it directly.
+
+        Args:
+            reset (bool): Clear the aggregated stacks afterwards
+
+        Returns:
+            str: Collapsed stacks, most sampled first
+        """
+        with self._lock:
+            stacks = self._stacks.most_common()
+            if reset:
+                self._stacks = Counter()
+                self._samples = 0
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def snapshot(self):
+        """
+        Get the profiler state.
+
+        Returns:
+            dict: Window end, path prefix, profiled requests in flight and sample counts
+        """
+        with self._lock:
+            return {
+                'active_until': self._until if self._until > time.time() else None,
+                'prefix': self._prefix,
+                'in_flight': len(self._targets),
+                'samples': self._samples,
+                'stacks': len(self._stacks)
+            }
+
+class ProfileSampler(threading.Thread):
+    """Background thread sampling the profiled threads until profiling is off."""
+
+    def __init__(self, profiler, interval, max_stacks):
+        """
+        Initialize the sampler.
+
+        Args:
+            profiler (SamplingProfiler): Profiler collecting the samples
+            interval (float): Seconds between samples
+            max_stacks (int): Distinct stacks kept
+        """
+        super().__init__(name='profile-sampler', daemon=True)
+        self.profiler = profiler
+        self.interval = interval
+        self.max_stacks = max_stacks
+
+    def run(self):
+        """Sample until the profiler has nothing left to watch."""
+        while True:
+            time.sleep(self.interval)
+            if not self.profiler.sample(self.max_stacks):
+                return
+
+# Process-wide profiler shared by all routes
+profiler = SamplingProfiler()
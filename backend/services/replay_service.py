@@ -0,0 +1,238 @@
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from backend.models import db, UserLocation
+from backend.services.batch_geofence import BatchGeofenceEngine, np
+from backend.services.zone_index import IndexedZone, ZONE_PRIORITY, KM_PER_DEGREE_LAT, zone_index
+from backend.utils.distance import circle_fence
+
+# Zone types that trigger an evacuation alert and a route to the nearest shelter
+DANGER_TYPES = ('RED', 'ORANGE')
+
+EPOCH = datetime(1970, 1, 1)
+
+class SimulationLimitExceeded(Exception):
+    """Raised when a simulation would replay too many fixes or run too long."""
+
+    def __init__(self, message, reason):
+        super().__init__(message)
+        self.reason = reason
+
+def proposed_zone(zone_id, name, zone_type, latitude, longitude, radius, description=None):
+    """
+    Build an unsaved zone snapshot for simulations.
+
+    Args:
+        zone_id (int): Identifier for the proposed zone (negative to avoid clashing with saved zones)
+        name (str): Zone name
+        zone_type (str): Zone type (RED, ORANGE, GREEN)
+        latitude (float): Zone center latitude
+        longitude (float): Zone center longitude
+        radius (float): Zone radius in kilometers
+        description (str, optional): Zone description
+
+    Returns:
+        IndexedZone: Zone snapshot
+    """
+    return IndexedZone(
+        id=zone_id, name=name, type=zone_type, latitude=latitude, longitude=longitude,
+        radius=radius, address_id=None, address=None, description=description,
+        created_at=None, updated_at=None, lat_margin=radius / KM_PER_DEGREE_LAT,
+        fence=circle_fence(latitude, longitude, radius)
+    )
+
+class ReplayService:
+    """
+    Service for replaying location fixes against a proposed zone set.
+
+    Fixes are read in chunks (from user_locations history or a synthetic trace)
+    and geofenced in bulk by BatchGeofenceEngine with the same priority and
+    nearest-shelter rules as the live ``/check`` path, then folded into counts,
+    shelter loads and projected SMS volume per phone in time order.
+    """
+
+    def _history_query(self, since, until):
+        """Select (id, phone_key, latitude, longitude, created_at) history rows of a window."""
+        query = db.session.query(
+            UserLocation.id, UserLocation.phone_key, UserLocation.latitude,
+            UserLocation.longitude, UserLocation.created_at
+        )
+        if since is not None:
+            query = query.filter(UserLocation.created_at >= since)
+        if until is not None:
+            query = query.filter(UserLocation.created_at < until)
+        return query
+
+    def count_history(self, since=None, until=None):
+        """
+        Count the history fixes a simulation of a window would replay.
+
+        Args:
+            since (datetime, optional): Window start (inclusive)
+            until (datetime, optional): Window end (exclusive)
+
+        Returns:
+            int: Number of fixes
+        """
+        return self._history_query(since, until).order_by(None).count()
+
+    def _history_chunks(self, since, until, chunk_size):
+        """Read (phone_key, latitude, longitude, created_at) history rows in id order."""
+        query = self._history_query(since, until)
+
+        last_id = 0
+        while True:
+            rows = query.filter(UserLocation.id > last_id).order_by(UserLocation.id).limit(chunk_size).all()
+            if not rows:
+                return
+            yield [(row.phone_key, row.latitude, row.longitude, row.created_at) for row in rows]
+            last_id = rows[-1].id
+            if len(rows) < chunk_size:
+                return
+
+    def _trace_chunks(self, trace, chunk_size):
+        """Split a synthetic trace into chunks."""
+        trace = iter(trace)
+        while True:
+            chunk = list(islice(trace, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def simulate(self, proposed_zones, include_existing=True, trace=None, since=None, until=None,
+                 chunk_size=50000, processes=1, timeline_minutes=60, max_fixes=None, timeout=None):
+        """
+        Replay fixes against a proposed zone set.
+
+        Args:
+            proposed_zones (list): Zone snapshots (see ``proposed_zone``)
+            include_existing (bool): Also evaluate the currently saved zones
+            trace (iterable, optional): (phone_key, latitude, longitude, created_at)
+                tuples in time order; defaults to the stored location history
+            since (datetime, optional): Only replay history created at or after this time
+            until (datetime, optional): Only replay history created before this time
+            chunk_size (int): Fixes geofenced per batch
+            processes (int): Worker processes for the batch engine, 1 to run in this thread
+            timeline_minutes (int): Width of the timeline buckets
+            max_fixes (int, optional): Stop once more fixes than this were read
+            timeout (float, optional): Stop once the replay ran longer than this (seconds)
+
+        Returns:
+            dict: Simulation report
+
+        Raises:
+            SimulationLimitExceeded: If max_fixes or timeout is exceeded
+        """
+        started = time.perf_counter()
+
+        zones = list(proposed_zones)
+        proposed_ids = {zone.id for zone in zones}
+        if include_existing:
+            zones.extend(zone_index.zones())
+        zones.sort(key=lambda z: ZONE_PRIORITY.get(z.type, 3))
+
+        chunks = self._trace_chunks(trace, chunk_size) if trace is not None else \
+            self._history_chunks(since, until, chunk_size)
+
+        fixes = 0
+        danger_fixes = 0
+        alerts = 0
+        zone_fixes = {zone.id: 0 for zone in zones}
+        zone_phones = {zone.id: set() for zone in zones}
+        current_zone = {}
+        assigned_shelter = {}
+        timeline = {}
+        bucket_seconds = timeline_minutes * 60
+
+        with BatchGeofenceEngine(zones, processes=processes, chunk_size=max(1, chunk_size // 8)) as engine:
+            danger_ids = np.array([zone.id for zone in zones if zone.type in DANGER_TYPES], dtype=np.int64)
+
+            for chunk in chunks:
+                if max_fixes is not None and fixes + len(chunk) > max_fixes:
+                    raise SimulationLimitExceeded(f'More than {max_fixes} fixes to replay', 'fixes')
+                if timeout is not None and time.perf_counter() - started > timeout:
+                    raise SimulationLimitExceeded(f'Simulation ran longer than {timeout} seconds', 'timeout')
+
+                latitudes = np.fromiter((fix[1] for fix in chunk), dtype=np.float64, count=len(chunk))
+                longitudes = np.fromiter((fix[2] for fix in chunk), dtype=np.float64, count=len(chunk))
+
+                located = engine.locate(latitudes, longitudes)
+                in_danger = np.isin(located, danger_ids)
+
+                shelters = np.full(len(chunk), -1, dtype=np.int64)
+                if in_danger.any():
+                    shelters[in_danger] = engine.nearest_safe(latitudes[in_danger], longitudes[in_danger])[0]
+
+                for (phone, _, _, created_at), zone_id, danger, shelter_id in zip(
+                    chunk, located.tolist(), in_danger.tolist(), shelters.tolist()
+                ):
+                    fixes += 1
+                    zone_id = zone_id if zone_id != -1 else None
+                    previous = current_zone.get(phone)
+                    current_zone[phone] = zone_id
+
+                    if zone_id is None:
+                        continue
+
+                    zone_fixes[zone_id] += 1
+                    zone_phones[zone_id].add(phone)
+
+                    if not danger:
+                        continue
+
+                    danger_fixes += 1
+                    if shelter_id != -1:
+                        assigned_shelter[phone] = shelter_id
+
+                    # One alert each time a phone enters a danger zone it was not already in
+                    if previous != zone_id:
+                        alerts += 1
+                        if created_at is not None:
+                            bucket = int((created_at - EPOCH).total_seconds() // bucket_seconds)
+                            timeline[bucket] = timeline.get(bucket, 0) + 1
+
+        shelter_loads = {}
+        for shelter_id in assigned_shelter.values():
+            shelter_loads[shelter_id] = shelter_loads.get(shelter_id, 0) + 1
+
+        by_type = {}
+        for zone in zones:
+            by_type.setdefault(zone.type, set()).update(zone_phones[zone.id])
+
+        return {
+            'fixes': fixes,
+            'phones': len(current_zone),
+            'zones': [
+                {
+                    'id': zone.id,
+                    'name': zone.name,
+                    'type': zone.type,
+                    'proposed': zone.id in proposed_ids,
+                    'fixes': zone_fixes[zone.id],
+                    'phones': len(zone_phones[zone.id])
+                }
+                for zone in zones
+            ],
+            'phones_by_type': {zone_type: len(phones) for zone_type, phones in by_type.items()},
+            'shelters': [
+                {
+                    'id': zone.id,
+                    'name': zone.name,
+                    'phones': shelter_loads.get(zone.id, 0)
+                }
+                for zone in zones if zone.type == 'GREEN'
+            ],
+            'sms': {
+                # Alerts sent on each danger zone entry, and if every danger ping triggered one
+                'alerts': alerts,
+                'alerts_per_check': danger_fixes
+            },
+            'timeline': [
+                {
+                    'start': (EPOCH + timedelta(seconds=bucket * bucket_seconds)).isoformat(),
+                    'alerts': count
+                }
+                for bucket, count in sorted(timeline.items())
+            ],
+            'elapsed_seconds': round(time.perf_counter() - started, 3)
+        }
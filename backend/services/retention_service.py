@@ -0,0 +1,256 @@
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from backend.models import db, UserLocation
+from backend.services.address_service import address_service
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+EPOCH = datetime(1970, 1, 1)
+
+# Columns read for each history row; full ORM objects are never loaded
+_HISTORY_COLUMNS = (
+    UserLocation.id,
+    UserLocation.phone_number,
+    UserLocation.phone_key,
+    UserLocation.latitude,
+    UserLocation.longitude,
+    UserLocation.address_id,
+    UserLocation.in_danger_zone,
+    UserLocation.zone_id,
+    UserLocation.created_at,
+)
+
+class RetentionService:
+    """
+    Service for bounding the size of the user_locations history.
+
+    A single pass walks old rows in primary key order, in chunks of
+    RETENTION_CHUNK_SIZE rows, each committed in its own short transaction:
+
+    - rows identical to the previous kept row of the same phone are dropped
+    - rows older than RETENTION_DOWNSAMPLE_AFTER_HOURS are thinned to one
+      point per phone every RETENTION_DOWNSAMPLE_MINUTES
+    - surviving rows older than RETENTION_ARCHIVE_AFTER_DAYS are written to
+      compressed JSONL archive files and removed from the table
+    """
+
+    def _settings(self):
+        """Read retention settings from the application config."""
+        config = current_app.config
+        archive_dir = config.get('RETENTION_ARCHIVE_DIR') or os.path.join(current_app.instance_path, 'archive')
+        return {
+            'dedup_after': timedelta(minutes=config['RETENTION_DEDUP_AFTER_MINUTES']),
+            'downsample_after': timedelta(hours=config['RETENTION_DOWNSAMPLE_AFTER_HOURS']),
+            'bucket_seconds': config['RETENTION_DOWNSAMPLE_MINUTES'] * 60,
+            'archive_after': timedelta(days=config['RETENTION_ARCHIVE_AFTER_DAYS']),
+            'archive_dir': archive_dir,
+            'chunk_size': config['RETENTION_CHUNK_SIZE'],
+            'chunk_pause': config['RETENTION_CHUNK_PAUSE'],
+        }
+
+    def compact(self, now=None):
+        """
+        Run one deduplication, downsampling and archiving pass.
+
+        Args:
+            now (datetime, optional): Reference UTC time, defaults to utcnow
+
+        Returns:
+            dict: Counts of scanned, deduplicated, downsampled and archived rows
+        """
+        settings = self._settings()
+        now = now or datetime.utcnow()
+        dedup_cutoff = now - settings['dedup_after']
+        downsample_cutoff = now - settings['downsample_after']
+        archive_cutoff = now - settings['archive_after']
+
+        stats = {'scanned': 0, 'deduplicated': 0, 'downsampled': 0, 'archived': 0}
+        # phone -> (bucket, latitude, longitude, zone_id, in_danger_zone) of its last kept row
+        last_kept = {}
+        last_id = 0
+
+        while True:
+            rows = (
+                db.session.query(*_HISTORY_COLUMNS)
+                .filter(UserLocation.id > last_id)
+                .order_by(UserLocation.id)
+                .limit(settings['chunk_size'])
+                .all()
+            )
+            rows = [row for row in rows if row.created_at is not None and row.created_at < dedup_cutoff]
+            if not rows:
+                break
+
+            drop_ids = []
+            archive_rows = []
+            for row in rows:
+                phone = row.phone_key if row.phone_key is not None else row.phone_number
+                bucket = int((row.created_at - EPOCH).total_seconds() // settings['bucket_seconds'])
+                fingerprint = (row.latitude, row.longitude, row.zone_id, row.in_danger_zone)
+                previous = last_kept.get(phone)
+
+                if previous is not None and previous[1:] == fingerprint:
+                    drop_ids.append(row.id)
+                    stats['deduplicated'] += 1
+                    continue
+
+                if previous is not None and row.created_at < downsample_cutoff and previous[0] == bucket:
+                    drop_ids.append(row.id)
+                    stats['downsampled'] += 1
+                    continue
+
+                last_kept[phone] = (bucket,) + fingerprint
+                if row.created_at < archive_cutoff:
+                    archive_rows.append(row)
+
+            if archive_rows:
+                self._write_archive(settings['archive_dir'], archive_rows)
+                drop_ids.extend(row.id for row in archive_rows)
+                stats['archived'] += len(archive_rows)
+
+            if drop_ids:
+                UserLocation.query.filter(UserLocation.id.in_(drop_ids)).delete(synchronize_session=False)
+            db.session.commit()
+
+            stats['scanned'] += len(rows)
+            last_id = rows[-1].id
+
+            # Rows are in insertion order, so a short chunk means the cutoff was reached
+            if len(rows) < settings['chunk_size']:
+                break
+
+            # Give live /check writers a chance to take the write lock
+            time.sleep(settings['chunk_pause'])
+
+        current_app.logger.info(f"Retention pass finished: {stats}")
+        return stats
+
+    def _write_archive(self, archive_dir, rows):
+        """
+        Write rows to a new compressed JSONL archive file.
+
+        Args:
+            archive_dir (str): Directory holding archive files
+            rows (list): History rows to archive, in id order
+
+        Returns:
+            str: Path of the written file
+        """
+        os.makedirs(archive_dir, exist_ok=True)
+        extension = 'zst' if zstandard is not None else 'gz'
+        path = os.path.join(archive_dir, f"user_locations-{rows[0].id:012d}-{rows[-1].id:012d}.jsonl.{extension}")
+
+        addresses = address_service.resolve(row.address_id for row in rows)
+        payload = ''.join(
+            json.dumps({
+                'id': row.id,
+                'phone_number': row.phone_number,
+                'phone_key': row.phone_key,
+                'latitude': row.latitude,
+                'longitude': row.longitude,
+                'address': addresses.get(row.address_id),
+                'in_danger_zone': row.in_danger_zone,
+                'zone_id': row.zone_id,
+                'created_at': row.created_at.isoformat()
+            }, separators=(',', ':')) + '\n'
+            for row in rows
+        ).encode('utf-8')
+
+        if zstandard is not None:
+            payload = zstandard.ZstdCompressor(level=10).compress(payload)
+        else:
+            payload = gzip.compress(payload, compresslevel=6)
+
+        # Write under a temporary name so readers never see a partial file
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        return path
+
+def scan_archive(archive_dir, phone_key=None, start=None, end=None):
+    """
+    Iterate over archived history rows.
+
+    Args:
+        archive_dir (str): Directory holding archive files
+        phone_key (int, optional): Only yield rows of this phone
+        start (datetime, optional): Only yield rows created at or after this time
+        end (datetime, optional): Only yield rows created before this time
+
+    Yields:
+        dict: Archived row with created_at parsed back to a datetime
+    """
+    for path in sorted(glob.glob(os.path.join(archive_dir, 'user_locations-*.jsonl.*'))):
+        if path.endswith('.zst'):
+            if zstandard is None:
+                raise RuntimeError(f"zstandard is required to read {path}")
+            with open(path, 'rb') as f:
+                data = zstandard.ZstdDecompressor().decompressobj().decompress(f.read())
+        elif path.endswith('.gz'):
+            with gzip.open(path, 'rb') as f:
+                data = f.read()
+        else:
+            continue
+
+        for line in data.decode('utf-8').splitlines():
+            row = json.loads(line)
+            if phone_key is not None and row['phone_key'] != phone_key:
+                continue
+            row['created_at'] = datetime.fromisoformat(row['created_at'])
+            if start is not None and row['created_at'] < start:
+                continue
+            if end is not None and row['created_at'] >= end:
+                continue
+            yield row
+
+class RetentionWorker(threading.Thread):
+    """
+    Background thread that runs a retention pass every RETENTION_INTERVAL seconds.
+
+    The web app never starts it: ``run_retention.py --loop`` does, in its own
+    process, so there is one retention pass at a time however many gunicorn
+    workers serve requests.
+    """
+
+    def __init__(self, app):
+        """
+        Initialize the worker.
+
+        Args:
+            app (Flask): Application providing the config and database
+        """
+        super().__init__(name='retention-worker', daemon=True)
+        self.app = app
+        self.service = RetentionService()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        """Run retention passes until stopped."""
+        interval = self.app.config['RETENTION_INTERVAL']
+        while not self._stop_event.is_set():
+            with self.app.app_context():
+                try:
+                    self.service.compact()
+                except Exception as e:
+                    db.session.rollback()
+                    current_app.logger.error(f"Error running retention pass: {str(e)}")
+                finally:
+                    db.session.remove()
+            self._stop_event.wait(interval)
+
+    def stop(self):
+        """Ask the worker to stop after the current pass."""
+        self._stop_event.set()
@@ -1,5 +1,7 @@
+import threading
 from twilio.rest import Client
 from flask import current_app
+from backend.services.sms_templates import render_alert, estimate_broadcast
 
 class SMSService:
     """Service for sending SMS notifications using Twilio."""
@@ -8,15 +10,24 @@ class SMSService:
         """Initialize the service without immediately accessing config."""
         self.client = None
         self.from_number = None
+        self._client_lock = threading.Lock()
     
     def _ensure_client(self):
-        """Ensure Twilio client is initialized when needed."""
+        """
+        Ensure Twilio client is initialized when needed.
+        
+        The client is created once under a lock and shared by all threads.
+        The sender number is set first, so a thread that sees the client also
+        sees the number.
+        """
         if self.client is None:
-            self.client = Client(
-                current_app.config['TWILIO_ACCOUNT_SID'],
-                current_app.config['TWILIO_AUTH_TOKEN']
-            )
-            self.from_number = current_app.config['TWILIO_PHONE_NUMBER']
+            with self._client_lock:
+                if self.client is None:
+                    self.from_number = current_app.config['TWILIO_PHONE_NUMBER']
+                    self.client = Client(
+                        current_app.config['TWILIO_ACCOUNT_SID'],
+                        current_app.config['TWILIO_AUTH_TOKEN']
+                    )
     
     def send_evacuation_alert(self, to_number, zone_type, current_address, directions=None):
         """
@@ -35,29 +46,10 @@ class SMSService:
             # Ensure client is initialized
             self._ensure_client()
             
-            # Format the message based on zone type
-            if zone_type == 'RED':
-                message_body = f"⚠️ EMERGENCY ALERT ⚠️\n\nYou are currently in a HIGH DANGER zone at: {current_address}. IMMEDIATE EVACUATION is required!"
-                
-                if directions:
-                    message_body += f"\n\nEvacuation route ({directions['distance']}, {directions['duration']}):\n- Head to: {directions['end_address']}"
-                    
-                    # Add first 2-3 steps for immediate guidance
-                    steps = directions['steps'][:3]  # Limit to first 3 steps
-                    if steps:
-                        message_body += "\n\nImmediate steps:"
-                        for i, step in enumerate(steps, 1):
-                            # Extract just the text from the HTML instructions
-                            instruction = step['instruction'].replace('<b>', '').replace('</b>', '').replace('<div>', '\n').replace('</div>', '')
-                            message_body += f"\n{i}. {instruction} ({step['distance']})"
-                
-                message_body += "\n\nStay calm and follow official evacuation routes. This is a QUICK EVAC emergency notification."
-                
-            elif zone_type == 'ORANGE':
-                message_body = f"⚠️ WARNING ALERT ⚠️\n\nYou are in a MEDIUM DANGER zone at: {current_address}. Prepare for possible evacuation and stay alert for further instructions.\n\nThis is a QUICK EVAC notification."
-                
-            else:  # GREEN or unknown
-                message_body = f"✓ SAFETY NOTIFICATION\n\nYou are currently in a SAFE zone at: {current_address}. No evacuation is necessary at this time.\n\nThis is a QUICK EVAC notification."
+            # Render the precompiled template for the zone type
+            message_body = render_alert(
+                zone_type, current_address, directions, current_app.config['SMS_TEMPLATE_VARIANT']
+            )
             
             # Send the message
             message = self.client.messages.create(
@@ -71,4 +63,28 @@ class SMSService:
             
         except Exception as e:
             current_app.logger.error(f"Error sending SMS: {str(e)}")
-            return None
\ No newline at end of file
+            return None
+    
+    def estimate_broadcast(self, recipients, zone_type, current_address=None, directions=None, variant=None):
+        """
+        Estimate segments, cost and send time of an alert broadcast before sending it.
+        
+        Args:
+            recipients (int): Number of recipients
+            zone_type (str): Type of zone (RED, ORANGE, GREEN)
+            current_address (str, optional): Representative address
+            directions (dict, optional): Representative directions to a safe zone
+            variant (str, optional): Template variant, defaults to SMS_TEMPLATE_VARIANT
+            
+        Returns:
+            dict: Broadcast estimate
+        """
+        return estimate_broadcast(
+            recipients,
+            zone_type,
+            current_address,
+            directions,
+            variant or current_app.config['SMS_TEMPLATE_VARIANT'],
+            cost_per_segment=current_app.config['SMS_COST_PER_SEGMENT'],
+            segments_per_second=current_app.config['SMS_SEGMENTS_PER_SECOND']
+        )
@@ -0,0 +1,301 @@
+"""
+Precompiled SMS alert templates with segment-aware encoding.
+
+Alert bodies are compiled once per zone type and variant:
+
+- ``full``: the detailed alert with emoji and turn-by-turn steps. The emoji
+  force UCS-2 encoding, so it usually spans several 67-character segments.
+- ``compact``: GSM-7-only wording trimmed to fit a single 160-character
+  segment, which is cheaper and faster to deliver in mass sends.
+
+Directions HTML is stripped once per route and the result is cached.
+"""
+
+import math
+import unicodedata
+from functools import lru_cache
+from html.parser import HTMLParser
+from string import Formatter
+
+# GSM 03.38 basic character set and extension table (extension characters take two septets)
+GSM7_BASIC = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM7_EXTENSION = set("^{}\\[~]|€\f")
+
+# Segment sizes: single message / per part of a concatenated message
+GSM7_SEGMENT = (160, 153)
+UCS2_SEGMENT = (70, 67)
+
+VARIANTS = ('full', 'compact')
+
+# Number of direction steps included in the full alert
+MAX_STEPS = 3
+
+class MessageTemplate:
+    """A message format string split once into literal and field parts."""
+
+    def __init__(self, source):
+        """
+        Compile a template.
+
+        Args:
+            source (str): Template using ``{field}`` placeholders
+        """
+        self.parts = tuple(
+            (literal, field) for literal, field, _, _ in Formatter().parse(source)
+        )
+
+    def render(self, **fields):
+        """
+        Render the template.
+
+        Args:
+            **fields: Values for the template placeholders
+
+        Returns:
+            str: Rendered message
+        """
+        return ''.join(literal + (fields[field] if field else '') for literal, field in self.parts)
+
+_TEMPLATES = {
+    ('full', 'RED'): MessageTemplate(
+        "⚠️ EMERGENCY ALERT ⚠️\n\nYou are currently in a HIGH DANGER zone at: {address}. "
+        "IMMEDIATE EVACUATION is required!{route}\n\n"
+        "Stay calm and follow official evacuation routes. This is a QUICK EVAC emergency notification."
+    ),
+    ('full', 'ORANGE'): MessageTemplate(
+        "⚠️ WARNING ALERT ⚠️\n\nYou are in a MEDIUM DANGER zone at: {address}. "
+        "Prepare for possible evacuation and stay alert for further instructions.\n\n"
+        "This is a QUICK EVAC notification."
+    ),
+    ('full', 'GREEN'): MessageTemplate(
+        "✓ SAFETY NOTIFICATION\n\nYou are currently in a SAFE zone at: {address}. "
+        "No evacuation is necessary at this time.\n\nThis is a QUICK EVAC notification."
+    ),
+    ('compact', 'RED'): MessageTemplate(
+        "QUICK EVAC EMERGENCY: HIGH DANGER zone at {address}. Evacuate NOW{route}."
+    ),
+    ('compact', 'ORANGE'): MessageTemplate(
+        "QUICK EVAC WARNING: MEDIUM DANGER zone at {address}. Prepare to evacuate and watch for instructions."
+    ),
+    ('compact', 'GREEN'): MessageTemplate(
+        "QUICK EVAC: You are in a SAFE zone at {address}. No evacuation is needed at this time."
+    ),
+}
+
+_FULL_ROUTE = MessageTemplate("\n\nEvacuation route ({distance}, {duration}):\n- Head to: {destination}{steps}")
+_FULL_STEP = MessageTemplate("\n{number}. {instruction} ({distance})")
+_COMPACT_ROUTE = MessageTemplate(" to {destination} ({distance}, {duration})")
+
+class _TextExtractor(HTMLParser):
+    """Collects the text of an HTML fragment, turning block elements into line breaks."""
+
+    BLOCK_TAGS = {'div', 'p', 'br', 'li'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chunks = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.BLOCK_TAGS:
+            self.chunks.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.BLOCK_TAGS:
+            self.chunks.append('\n')
+
+    def handle_data(self, data):
+        self.chunks.append(data)
+
+@lru_cache(maxsize=4096)
+def strip_html(fragment):
+    """
+    Convert an HTML fragment (e.g. a Google directions instruction) to plain text.
+
+    Args:
+        fragment (str): HTML fragment
+
+    Returns:
+        str: Text with tags removed, entities decoded and whitespace collapsed
+    """
+    parser = _TextExtractor()
+    parser.feed(fragment)
+    parser.close()
+    lines = (' '.join(line.split()) for line in ''.join(parser.chunks).split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+def to_gsm7(text):
+    """
+    Make text representable in GSM-7, transliterating accents and replacing
+    anything else with '?'.
+
+    Args:
+        text (str): Any text
+
+    Returns:
+        str: GSM-7 safe text
+    """
+    if is_gsm7(text):
+        return text
+    out = []
+    for ch in text:
+        if ch in GSM7_BASIC or ch in GSM7_EXTENSION:
+            out.append(ch)
+            continue
+        base = ''.join(c for c in unicodedata.normalize('NFKD', ch) if not unicodedata.combining(c))
+        out.append(base if base and all(c in GSM7_BASIC for c in base) else '?')
+    return ''.join(out)
+
+def is_gsm7(text):
+    """Check whether text can be sent with the GSM-7 alphabet."""
+    return all(ch in GSM7_BASIC or ch in GSM7_EXTENSION for ch in text)
+
+def encoded_length(text):
+    """
+    Get the length of a message in its SMS encoding units.
+
+    Returns:
+        tuple: (encoding name, length in septets for GSM-7 or UTF-16 code units for UCS-2)
+    """
+    if is_gsm7(text):
+        return 'GSM-7', sum(2 if ch in GSM7_EXTENSION else 1 for ch in text)
+    return 'UCS-2', len(text.encode('utf-16-le')) // 2
+
+def segment_count(text):
+    """
+    Count the SMS segments a message is split into.
+
+    Args:
+        text (str): Message body
+
+    Returns:
+        int: Number of segments billed by the carrier
+    """
+    encoding, length = encoded_length(text)
+    single, multi = GSM7_SEGMENT if encoding == 'GSM-7' else UCS2_SEGMENT
+    if length <= single:
+        return 1
+    return math.ceil(length / multi)
+
+@lru_cache(maxsize=1024)
+def _compile_route(destination, distance, duration, steps):
+    """Build the route blocks of both variants once per distinct route."""
+    full_steps = ''
+    if steps:
+        full_steps = "\n\nImmediate steps:" + ''.join(
+            _FULL_STEP.render(number=str(i), instruction=strip_html(instruction), distance=step_distance)
+            for i, (instruction, step_distance) in enumerate(steps, 1)
+        )
+    return {
+        'full': _FULL_ROUTE.render(distance=distance, duration=duration, destination=destination, steps=full_steps),
+        'compact': {'destination': to_gsm7(destination), 'distance': to_gsm7(distance), 'duration': to_gsm7(duration)},
+    }
+
+def _route(directions):
+    """Get the compiled route blocks of a directions dict, or None."""
+    if not directions:
+        return None
+    steps = tuple((step['instruction'], step['distance']) for step in directions['steps'][:MAX_STEPS])
+    return _compile_route(directions['end_address'], directions['distance'], directions['duration'], steps)
+
+def _truncate(text, length):
+    """Shorten text to at most length characters, marking the cut with '...'."""
+    if len(text) <= length:
+        return text
+    if length <= 3:
+        return text[:max(0, length)]
+    return text[:length - 3].rstrip() + '...'
+
+def _render_compact(zone_type, address, route):
+    """Render the compact alert, trimming fields until it fits in one GSM-7 segment."""
+    template = _TEMPLATES[('compact', zone_type)]
+    address = to_gsm7(address)
+    limit = GSM7_SEGMENT[0]
+
+    def render(address, route_fields):
+        route_text = _COMPACT_ROUTE.render(**route_fields) if route_fields else ''
+        return template.render(address=address, route=route_text)
+
+    route_fields = dict(route['compact']) if route else None
+    body = render(address, route_fields)
+    if encoded_length(body)[1] <= limit:
+        return body
+
+    # Shorten the address first, then the destination, then drop the route altogether
+    overflow = encoded_length(body)[1] - limit
+    address = _truncate(address, max(20, len(address) - overflow))
+    body = render(address, route_fields)
+
+    if route_fields and encoded_length(body)[1] > limit:
+        overflow = encoded_length(body)[1] - limit
+        route_fields['destination'] = _truncate(
+            route_fields['destination'], max(20, len(route_fields['destination']) - overflow)
+        )
+        body = render(address, route_fields)
+        if encoded_length(body)[1] > limit:
+            body = render(address, None)
+
+    if encoded_length(body)[1] > limit:
+        overflow = encoded_length(body)[1] - limit
+        body = render(_truncate(address, len(address) - overflow), None)
+
+    return body
+
+def render_alert(zone_type, address, directions=None, variant='full'):
+    """
+    Render an evacuation alert body.
+
+    Args:
+        zone_type (str): Type of zone (RED, ORANGE, GREEN; anything else is treated as GREEN)
+        address (str): User's current address
+        directions (dict, optional): Directions to the safe zone (RED alerts only)
+        variant (str): 'full' or 'compact'
+
+    Returns:
+        str: Message body
+    """
+    if zone_type not in ('RED', 'ORANGE'):
+        zone_type = 'GREEN'
+    address = address or 'your location'
+    route = _route(directions) if zone_type == 'RED' else None
+
+    if variant == 'compact':
+        return _render_compact(zone_type, address, route)
+
+    return _TEMPLATES[('full', zone_type)].render(address=address, route=route['full'] if route else '')
+
+def estimate_broadcast(recipients, zone_type, address=None, directions=None, variant='full',
+                       cost_per_segment=0.0, segments_per_second=1.0):
+    """
+    Estimate the carrier cost and send time of an alert broadcast.
+
+    Args:
+        recipients (int): Number of recipients
+        zone_type (str): Type of zone (RED, ORANGE, GREEN)
+        address (str, optional): Representative address used to size the message
+        directions (dict, optional): Representative directions
+        variant (str): 'full' or 'compact'
+        cost_per_segment (float): Carrier price of one segment
+        segments_per_second (float): Sending throughput in segments per second
+
+    Returns:
+        dict: Encoding, segment, cost and duration estimate
+    """
+    body = render_alert(zone_type, address, directions, variant)
+    encoding, length = encoded_length(body)
+    segments = segment_count(body)
+    total_segments = segments * recipients
+
+    return {
+        'variant': variant,
+        'encoding': encoding,
+        'length': length,
+        'segments_per_message': segments,
+        'recipients': recipients,
+        'total_segments': total_segments,
+        'estimated_cost': round(total_segments * cost_per_segment, 4),
+        'estimated_seconds': round(total_segments / segments_per_second, 1) if segments_per_second else None,
+        'sample': body
+    }
@@ -0,0 +1,308 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from backend.services.zone_index import zone_index, KM_PER_DEGREE_LAT
+from backend.utils import mvt
+from backend.utils.change_feed import zone_changes
+
+# Integer coordinate extent of a tile and the buffer drawn around it
+TILE_EXTENT = 4096
+TILE_BUFFER = 256
+
+# Maximum distance in tile pixels between a circle and its simplified polygon
+SIMPLIFY_TOLERANCE = 1.0
+MIN_CIRCLE_VERTICES = 8
+MAX_CIRCLE_VERTICES = 64
+
+def tile_bounds(z, x, y):
+    """
+    Get the geographic bounds of a web mercator tile.
+
+    Args:
+        z, x, y (int): Tile coordinates
+
+    Returns:
+        tuple: (min_lat, min_lon, max_lat, max_lon)
+    """
+    n = 1 << z
+
+    def lat(tile_y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+    return lat(y + 1), x / n * 360.0 - 180.0, lat(y), (x + 1) / n * 360.0 - 180.0
+
+def _zone_bbox(latitude, longitude, radius):
+    """Get the geographic bounding box of a circular zone."""
+    dlat = radius / KM_PER_DEGREE_LAT
+    dlon = dlat / max(math.cos(math.radians(latitude)), 1e-6)
+    return latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon
+
+def _bbox_intersects(a, b):
+    """Check whether two (min_lat, min_lon, max_lat, max_lon) boxes overlap."""
+    return a[0] <= b[2] and a[2] >= b[0] and a[1] <= b[3] and a[3] >= b[1]
+
+def _ring_area(ring):
+    """Get twice the signed area of a ring of (x, y) vertices (shoelace formula)."""
+    return sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1]))
+
+def _padded_tile_bounds(z, x, y):
+    """Get the bounds of a tile including the buffer drawn around it."""
+    min_lat, min_lon, max_lat, max_lon = tile_bounds(z, x, y)
+    pad_lat = (max_lat - min_lat) * TILE_BUFFER / TILE_EXTENT
+    pad_lon = (max_lon - min_lon) * TILE_BUFFER / TILE_EXTENT
+    return min_lat - pad_lat, min_lon - pad_lon, max_lat + pad_lat, max_lon + pad_lon
+
+def _tile_range(bbox, z):
+    """
+    Get the tiles of a zoom level whose buffered bounds may meet a bounding box.
+
+    The range is widened by one tile on every side (the buffer is a fraction
+    of a tile), so callers check each candidate against its padded bounds.
+
+    Args:
+        bbox (tuple): (min_lat, min_lon, max_lat, max_lon)
+        z (int): Zoom level
+
+    Returns:
+        tuple: (min_x, max_x, min_y, max_y), inclusive
+    """
+    n = 1 << z
+
+    def tile_x(longitude):
+        return int(math.floor((longitude + 180.0) / 360.0 * n))
+
+    def tile_y(latitude):
+        lat_rad = math.radians(max(min(latitude, 85.0511), -85.0511))
+        return int(math.floor((1.0 - math.log(math.tan(lat_rad) + 1.0 / math.cos(lat_rad)) / math.pi) / 2.0 * n))
+
+    return (
+        max(0, tile_x(bbox[1]) - 1), min(n - 1, tile_x(bbox[3]) + 1),
+        max(0, tile_y(bbox[2]) - 1), min(n - 1, tile_y(bbox[0]) + 1),
+    )
+
+class TileService:
+    """
+    Service rendering zones as Mapbox Vector Tiles, with a tile cache.
+
+    Circles are turned into polygons whose vertex count depends on their
+    on-screen size at the tile's zoom level, and zones smaller than a couple of
+    pixels become points. Rendered tiles are kept in a bounded in-memory LRU
+    cache and, when TILE_CACHE_DIR is set, on disk as ``<z>/<x>/<y>.mvt``.
+    Zone mutations invalidate only the cached tiles the zone intersects, and
+    the other workers drop the same tiles from their memory caches when they
+    read the change from the zone change feed.
+    """
+
+    def __init__(self):
+        """Initialize an empty tile cache."""
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        # Zone change feed offset the memory cache is up to date with, set on first use
+        self._feed_offset = None
+
+    def _project(self, latitude, longitude, z, x, y):
+        """Project coordinates to integer tile coordinates, clamped to the tile buffer."""
+        n = 1 << z
+        lat_rad = math.radians(max(min(latitude, 85.0511), -85.0511))
+        world_x = (longitude + 180.0) / 360.0 * n
+        world_y = (1.0 - math.log(math.tan(lat_rad) + 1.0 / math.cos(lat_rad)) / math.pi) / 2.0 * n
+        px = int(round((world_x - x) * TILE_EXTENT))
+        py = int(round((world_y - y) * TILE_EXTENT))
+        return (
+            max(-TILE_BUFFER, min(TILE_EXTENT + TILE_BUFFER, px)),
+            max(-TILE_BUFFER, min(TILE_EXTENT + TILE_BUFFER, py)),
+        )
+
+    def _zone_feature(self, zone, z, x, y):
+        """Build the simplified vector tile feature of a zone, or None if it has no area in the tile."""
+        properties = {'id': zone.id, 'name': zone.name, 'type': zone.type, 'radius': zone.radius}
+        center = self._project(zone.latitude, zone.longitude, z, x, y)
+
+        # Radius in tile pixels at this zoom level (web mercator scale at the zone's latitude)
+        meters_per_pixel = 40075016.686 * math.cos(math.radians(zone.latitude)) / ((1 << z) * TILE_EXTENT)
+        radius_px = zone.radius * 1000.0 / meters_per_pixel
+
+        if radius_px < 2:
+            return {'id': zone.id, 'type': mvt.POINT, 'geometry': center, 'properties': properties}
+
+        # Chord error of an n-gon is r * (1 - cos(pi / n)); pick the smallest n within tolerance
+        if radius_px <= SIMPLIFY_TOLERANCE:
+            vertices = MIN_CIRCLE_VERTICES
+        else:
+            vertices = math.ceil(math.pi / math.acos(1 - SIMPLIFY_TOLERANCE / radius_px))
+        vertices = max(MIN_CIRCLE_VERTICES, min(MAX_CIRCLE_VERTICES, vertices))
+
+        dlat = zone.radius / KM_PER_DEGREE_LAT
+        dlon = dlat / max(math.cos(math.radians(zone.latitude)), 1e-6)
+        ring = []
+        for i in range(vertices):
+            # Clockwise in tile coordinates (y grows southwards), as MVT expects for exterior rings
+            angle = -2 * math.pi * i / vertices
+            point = self._project(
+                zone.latitude + dlat * math.sin(angle), zone.longitude + dlon * math.cos(angle), z, x, y
+            )
+            if not ring or point != ring[-1]:
+                ring.append(point)
+
+        # A zone beyond the buffer clamps onto the buffer's edge, leaving a ring with no area
+        if len(set(ring)) < 3 or not _ring_area(ring):
+            return None
+
+        return {'id': zone.id, 'type': mvt.POLYGON, 'geometry': ring, 'properties': properties}
+
+    def render_tile(self, z, x, y):
+        """
+        Render the zones intersecting a tile.
+
+        Args:
+            z, x, y (int): Tile coordinates
+
+        Returns:
+            bytes: Encoded vector tile
+        """
+        # Include the buffer so features crossing the tile edge render seamlessly
+        bounds = _padded_tile_bounds(z, x, y)
+
+        # Draw lower-priority zones first so RED ends up on top
+        features = []
+        for zone in reversed(zone_index.zones_in_bbox(*bounds)):
+            if _bbox_intersects(_zone_bbox(zone.latitude, zone.longitude, zone.radius), bounds):
+                feature = self._zone_feature(zone, z, x, y)
+                if feature is not None:
+                    features.append(feature)
+
+        if not features:
+            return b''
+        return mvt.encode_tile([mvt.encode_layer('zones', features, TILE_EXTENT)])
+
+    def _disk_path(self, z, x, y):
+        """Get the on-disk cache path of a tile, or None if disk caching is off."""
+        cache_dir = current_app.config.get('TILE_CACHE_DIR')
+        if not cache_dir:
+            return None
+        return os.path.join(cache_dir, str(z), str(x), f"{y}.mvt")
+
+    def get_tile(self, z, x, y):
+        """
+        Get a rendered tile, from the cache when possible.
+
+        Args:
+            z, x, y (int): Tile coordinates
+
+        Returns:
+            bytes: Encoded vector tile
+        """
+        key = (z, x, y)
+        ttl = current_app.config.get('TILE_CACHE_TTL', 0)
+        self._follow_changes()
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and (not ttl or time.monotonic() - entry[0] <= ttl):
+                self._cache.move_to_end(key)
+                return entry[1]
+
+        path = self._disk_path(z, x, y)
+        tile = None
+        if path and os.path.exists(path) and (not ttl or time.time() - os.path.getmtime(path) <= ttl):
+            with open(path, 'rb') as f:
+                tile = f.read()
+
+        if tile is None:
+            tile = self.render_tile(z, x, y)
+            if path:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(tile)
+                os.replace(tmp_path, path)
+
+        with self._lock:
+            self._cache[key] = (time.monotonic(), tile)
+            self._cache.move_to_end(key)
+            while len(self._cache) > current_app.config['TILE_CACHE_SIZE']:
+                self._cache.popitem(last=False)
+
+        return tile
+
+    def _follow_changes(self):
+        """Drop the memory-cached tiles of zones other workers changed, as announced on the zone change feed."""
+        offset = self._feed_offset
+        if offset is not None and zone_changes.position() == offset:
+            return
+        with self._lock:
+            if self._feed_offset != offset:
+                # Another thread read these records
+                return
+            if offset is None:
+                # Nothing is cached yet, so only later changes matter
+                self._feed_offset = zone_changes.position()
+                return
+            try:
+                self._feed_offset, changes = zone_changes.read(offset)
+            except (OSError, ValueError) as e:
+                current_app.logger.warning(f"Zone change feed unreadable, relying on the tile TTL: {str(e)}")
+                return
+            if changes is None:
+                self._cache.clear()
+                return
+            for change in changes:
+                for circle in change.get('circles', ()):
+                    self._drop_cached(_zone_bbox(*circle))
+
+    def _drop_cached(self, zone_bbox):
+        """Drop the memory-cached tiles a zone bounding box meets (call with the lock held)."""
+        for key in [key for key in self._cache if _bbox_intersects(zone_bbox, _padded_tile_bounds(*key))]:
+            del self._cache[key]
+
+    def invalidate_zone(self, latitude, longitude, radius):
+        """
+        Drop every cached tile a zone's circle intersects.
+
+        Call with the old geometry and again with the new one when a zone moves.
+        On disk, only the tile ranges the zone covers at each zoom level are
+        looked at, so the cost does not grow with the rest of the cache.
+
+        Args:
+            latitude (float): Zone center latitude
+            longitude (float): Zone center longitude
+            radius (float): Zone radius in kilometers
+        """
+        zone_bbox = _zone_bbox(latitude, longitude, radius)
+
+        with self._lock:
+            self._drop_cached(zone_bbox)
+
+        cache_dir = current_app.config.get('TILE_CACHE_DIR')
+        if not cache_dir or not os.path.isdir(cache_dir):
+            return
+
+        for z in range(current_app.config['TILE_MAX_ZOOM'] + 1):
+            z_dir = os.path.join(cache_dir, str(z))
+            if not os.path.isdir(z_dir):
+                continue
+            min_x, max_x, min_y, max_y = _tile_range(zone_bbox, z)
+            for x_name in os.listdir(z_dir):
+                if not x_name.isdigit() or not min_x <= int(x_name) <= max_x:
+                    continue
+                x_dir = os.path.join(z_dir, x_name)
+                for file_name in os.listdir(x_dir):
+                    y_name = file_name[:-len('.mvt')]
+                    if not file_name.endswith('.mvt') or not y_name.isdigit() or not min_y <= int(y_name) <= max_y:
+                        continue
+                    if _bbox_intersects(zone_bbox, _padded_tile_bounds(z, int(x_name), int(y_name))):
+                        try:
+                            os.remove(os.path.join(x_dir, file_name))
+                        except FileNotFoundError:
+                            pass
+
+    def clear(self):
+        """Empty the in-memory tile cache."""
+        with self._lock:
+            self._cache.clear()
+
+# Process-wide tile cache shared by all routes
+tile_service = TileService()
@@ -0,0 +1,871 @@
+import math
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, namedtuple
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import case, func
+from sqlalchemy.exc import SQLAlchemyError
+from backend.models import db, Zone
+from backend.utils import geohash
+from backend.utils.change_feed import zone_changes
+from backend.utils.distance import EARTH_RADIUS_KM, circle_fence
+from backend.utils.timer_wheel import TimerWheel
+
+# Zone type priority used when a point falls inside several zones (RED > ORANGE > GREEN)
+ZONE_PRIORITY = {'RED': 0, 'ORANGE': 1, 'GREEN': 2}
+
+# Kilometers per degree of latitude, used for the cheap latitude pre-check
+KM_PER_DEGREE_LAT = 111.19
+
+EPOCH = datetime(1970, 1, 1)
+
+# Placeholder for zones whose region is not cached
+_MISSING = object()
+
+# Cached region of zone ids that do not exist
+_NO_ZONE = object()
+
+_IndexedZoneBase = namedtuple('IndexedZone', [
+    'id', 'name', 'type', 'latitude', 'longitude', 'radius',
+    'address_id', 'address', 'description', 'created_at', 'updated_at', 'lat_margin',
+    'active_from', 'active_until', 'fence', 'region'
+], defaults=(None, None, None, None))
+
+def _timestamp(value):
+    """Convert a naive UTC datetime to epoch seconds, passing None through."""
+    return None if value is None else (value - EPOCH).total_seconds()
+
+class IndexedZone(_IndexedZoneBase):
+    """
+    Immutable, session-independent snapshot of a Zone row.
+
+    It exposes the same attributes and ``to_dict`` output as ``Zone`` so it can
+    be returned from lookups without keeping ORM objects alive across requests.
+    ``fence`` holds the precomputed containment test used by ``is_in_zone``.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_zone(cls, zone, method='haversine'):
+        """
+        Build a snapshot from a Zone model instance.
+
+        Args:
+            zone (Zone): Zone row
+            method (str): Exact distance used near the zone edge ('haversine' or 'vincenty')
+
+        Returns:
+            IndexedZone: Zone snapshot
+        """
+        return cls(
+            id=zone.id,
+            name=zone.name,
+            type=zone.type,
+            latitude=zone.latitude,
+            longitude=zone.longitude,
+            radius=zone.radius,
+            address_id=zone.address_id,
+            address=zone.address,
+            description=zone.description,
+            created_at=zone.created_at,
+            updated_at=zone.updated_at,
+            lat_margin=zone.radius / KM_PER_DEGREE_LAT,
+            active_from=zone.active_from,
+            active_until=zone.active_until,
+            fence=circle_fence(zone.latitude, zone.longitude, zone.radius, method),
+            region=zone.region
+        )
+
+    def to_dict(self):
+        """Convert zone snapshot to dictionary."""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'type': self.type,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'radius': self.radius,
+            'address_id': self.address_id,
+            'address': self.address,
+            'description': self.description,
+            'region': self.region,
+            'active_from': self.active_from.isoformat() if self.active_from else None,
+            'active_until': self.active_until.isoformat() if self.active_until else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class ZoneIndex:
+    """
+    In-memory index of the zones (of one region, see ``RegionalZoneIndex``)
+    used by the geofencing hot path.
+
+    Zones are loaded once (ideally before gunicorn forks its workers) and kept
+    sorted by type priority, so ``/check`` requests never query the zones table.
+    The snapshot is rebuilt after local mutations via ``invalidate`` and
+    periodically refreshed according to ``ZONE_INDEX_TTL`` so changes made by
+    other workers are picked up.
+
+    Only zones inside their ``active_from``/``active_until`` window are live
+    (returned by ``zones`` and ``safe_zones``). Pending activations and expiries
+    sit in a timer wheel that a per-process scheduler thread advances every
+    ZONE_SCHEDULER_TICK seconds, so lookups never compare timestamps. Callbacks
+    registered with ``on_transition`` run whenever a zone goes live or expires.
+    """
+
+    def __init__(self, criterion=None, listeners=None, schedule=True):
+        """
+        Initialize an empty index; zones are loaded on first use.
+
+        Args:
+            criterion (optional): SQLAlchemy filter selecting the indexed zones, all zones if None
+            listeners (list, optional): Transition callbacks, shared with the owner of the index
+            schedule (bool): Start a scheduler thread for this index; False when
+                the owner advances it
+        """
+        self.criterion = criterion
+        self._schedule = schedule
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._generation = 0
+        self._loaded_generation = None
+        self._zones = None
+        self._by_id = {}
+        self._live_ids = frozenset()
+        self._safe_zones = ()
+        self._loaded_at = 0.0
+        self._wheel = None
+        self._clock = None
+        self._listeners = listeners if listeners is not None else []
+        self._scheduler = None
+        self._scheduler_pid = None
+
+    def on_transition(self, callback):
+        """
+        Register a callback for zone activations and expiries.
+
+        Args:
+            callback (callable): Called as ``callback(zone, active)`` inside an
+                application context, with the IndexedZone and whether it went live
+        """
+        self._listeners.append(callback)
+
+    def _publish(self, live):
+        """Replace the live zone set; must hold the lock."""
+        live = sorted(live, key=lambda z: ZONE_PRIORITY.get(z.type, 3))
+        self._live_ids = frozenset(zone.id for zone in live)
+        self._safe_zones = tuple(zone for zone in live if zone.type == 'GREEN')
+        self._zones = tuple(live)
+
+    def load(self):
+        """
+        Load all zones from the database into the index.
+
+        Must be called inside an application context.
+
+        Returns:
+            int: Number of zones indexed
+        """
+        count, transitions = self._load()
+        self._notify(transitions)
+        return count
+
+    def _load(self):
+        """
+        Load the zones without running the transition callbacks.
+
+        Returns:
+            tuple: (number of zones indexed, list of (zone, active) transitions
+                the caller must pass to ``_notify``)
+        """
+        generation = self._generation
+        method = current_app.config.get('DISTANCE_METHOD', 'haversine')
+        query = Zone.query if self.criterion is None else Zone.query.filter(self.criterion)
+        snapshots = [IndexedZone.from_zone(zone, method) for zone in query.all()]
+        now = time.time()
+        transitions = []
+
+        with self._lock:
+            previous_clock = self._clock
+            wheel = TimerWheel(now)
+            live = []
+
+            for zone in snapshots:
+                start, end = _timestamp(zone.active_from), _timestamp(zone.active_until)
+
+                if end is not None and end <= now:
+                    # Expired since the last look: the wheel did not get to fire it
+                    if previous_clock is not None and end > previous_clock:
+                        transitions.append((zone, False))
+                    continue
+                if start is not None and start > now:
+                    wheel.schedule(start, (zone.id, True))
+                    continue
+
+                live.append(zone)
+                if previous_clock is not None and start is not None and start > previous_clock:
+                    transitions.append((zone, True))
+                if end is not None:
+                    wheel.schedule(end, (zone.id, False))
+
+            self._by_id = {zone.id: zone for zone in snapshots}
+            self._wheel = wheel
+            self._clock = now
+            self._publish(live)
+            self._loaded_at = time.monotonic()
+            self._loaded_generation = generation
+
+        return len(snapshots), transitions
+
+    def advance(self, now=None):
+        """
+        Fire due activations and expiries.
+
+        Must be called inside an application context.
+
+        Args:
+            now (float, optional): Current time in epoch seconds
+
+        Returns:
+            int: Number of zones that changed state
+        """
+        now = time.time() if now is None else now
+        transitions = []
+
+        with self._lock:
+            if self._wheel is None or self._zones is None:
+                return 0
+
+            live = {zone.id: zone for zone in self._zones}
+            for zone_id, active in self._wheel.advance(now):
+                zone = self._by_id.get(zone_id)
+                if zone is None:
+                    continue
+                if active:
+                    live[zone_id] = zone
+                    if zone.active_until is not None:
+                        self._wheel.schedule(_timestamp(zone.active_until), (zone_id, False))
+                else:
+                    live.pop(zone_id, None)
+                transitions.append((zone, active))
+
+            self._clock = now
+            if transitions:
+                self._publish(live.values())
+
+        self._notify(transitions)
+        return len(transitions)
+
+    def _notify(self, transitions):
+        """Run the transition callbacks."""
+        for zone, active in transitions:
+            current_app.logger.info(f"Zone {zone.id} ({zone.name}) is now {'active' if active else 'inactive'}")
+            for callback in self._listeners:
+                try:
+                    callback(zone, active)
+                except Exception as e:
+                    current_app.logger.error(f"Error handling zone {zone.id} transition: {str(e)}")
+
+    def invalidate(self):
+        """Mark the snapshot stale so the next lookup reloads it."""
+        with self._lock:
+            self._generation += 1
+
+    def _ensure_loaded(self):
+        """
+        Load the snapshot if it is missing, invalidated or older than the configured TTL.
+
+        Only one thread loads at a time. Lookups wait for a missing or
+        invalidated snapshot, so a zone change is visible right after it is
+        made, but a TTL refresh runs in one thread while the others keep
+        serving the current snapshot.
+        """
+        self._ensure_scheduler()
+        transitions = ()
+
+        if self._zones is None or self._loaded_generation != self._generation:
+            with self._load_lock:
+                if self._zones is None or self._loaded_generation != self._generation:
+                    _, transitions = self._load()
+        else:
+            ttl = current_app.config.get('ZONE_INDEX_TTL', 0)
+            if not ttl or time.monotonic() - self._loaded_at <= ttl:
+                return
+            if not self._load_lock.acquire(blocking=False):
+                return
+            try:
+                if time.monotonic() - self._loaded_at > ttl:
+                    _, transitions = self._load()
+            except SQLAlchemyError as e:
+                # Keep geofencing against the last snapshot while the database is unavailable
+                db.session.rollback()
+                self._loaded_at = time.monotonic()
+                current_app.logger.warning(f"Zone index refresh failed, serving stale zones: {str(e)}")
+            finally:
+                self._load_lock.release()
+
+        # Callbacks look zones up again (e.g. occupancy reassignment), so they
+        # run after the load lock is released
+        self._notify(transitions)
+
+    def _ensure_scheduler(self):
+        """Start this process's scheduler thread (threads do not survive a fork)."""
+        if not self._schedule or self._scheduler_pid == os.getpid():
+            return
+        with self._lock:
+            if self._scheduler_pid == os.getpid() or not current_app.config.get('ZONE_SCHEDULER_TICK'):
+                return
+            self._scheduler = ZoneScheduler(current_app._get_current_object(), self)
+            self._scheduler.start()
+            self._scheduler_pid = os.getpid()
+
+    def zones(self):
+        """
+        Get all live zones sorted by type priority.
+
+        Returns:
+            tuple: IndexedZone snapshots
+        """
+        self._ensure_loaded()
+        return self._zones
+
+    def all_zones(self):
+        """
+        Get every known zone, including scheduled and expired ones.
+
+        Returns:
+            list: IndexedZone snapshots
+        """
+        self._ensure_loaded()
+        return list(self._by_id.values())
+
+    def safe_zones(self):
+        """
+        Get all live GREEN zones.
+
+        Returns:
+            tuple: IndexedZone snapshots of safe zones
+        """
+        self._ensure_loaded()
+        return self._safe_zones
+
+    def get(self, zone_id):
+        """
+        Get an indexed zone by ID, whether or not it is live.
+
+        Args:
+            zone_id (int): Zone ID
+
+        Returns:
+            IndexedZone: Zone snapshot or None if not found
+        """
+        self._ensure_loaded()
+        return self._by_id.get(zone_id)
+
+    def get_live(self, zone_id):
+        """
+        Get an indexed zone by ID if it is currently live.
+
+        Args:
+            zone_id (int): Zone ID
+
+        Returns:
+            IndexedZone: Zone snapshot or None if not found or not live
+        """
+        self._ensure_loaded()
+        return self._by_id.get(zone_id) if zone_id in self._live_ids else None
+
+class ZoneScheduler(threading.Thread):
+    """Background thread advancing the zone index's timer wheel."""
+
+    def __init__(self, app, index):
+        """
+        Initialize the scheduler.
+
+        Args:
+            app (Flask): Application providing the config
+            index (ZoneIndex or RegionalZoneIndex): Index whose wheels are advanced
+        """
+        super().__init__(name='zone-scheduler', daemon=True)
+        self.app = app
+        self.index = index
+        self._stop_event = threading.Event()
+
+    def run(self):
+        """Advance the wheel until stopped."""
+        tick = self.app.config['ZONE_SCHEDULER_TICK']
+        while not self._stop_event.wait(tick):
+            with self.app.app_context():
+                try:
+                    self.index.advance()
+                except Exception as e:
+                    current_app.logger.error(f"Error advancing zone schedule: {str(e)}")
+                finally:
+                    db.session.remove()
+
+    def stop(self):
+        """Ask the scheduler to stop."""
+        self._stop_event.set()
+
+_RegionInfo = namedtuple('RegionInfo', [
+    'key', 'count', 'safe', 'center_bbox', 'bbox'
+])
+
+def region_criterion(region):
+    """
+    Build the filter selecting the zones of a region.
+
+    Args:
+        region (str): Region key, None for zones without one
+
+    Returns:
+        SQLAlchemy filter on the zones table
+    """
+    return Zone.region.is_(None) if region is None else Zone.region == region
+
+def _bbox_distance(latitude, longitude, bbox):
+    """
+    Lower bound (km) on the distance from a point to any point of a bounding box.
+
+    Any path into the box covers the latitude gap, and when the point is
+    outside the box's longitudes it also crosses the nearer bounding meridian,
+    whose great circle is at least the cross-track distance away.
+    """
+    min_lat, min_lon, max_lat, max_lon = bbox
+    lat_gap = max(min_lat - latitude, latitude - max_lat, 0.0) * KM_PER_DEGREE_LAT
+    if min_lon <= longitude <= max_lon:
+        return lat_gap
+
+    dlon = min(abs(longitude - min_lon) % 360, abs(longitude - max_lon) % 360)
+    dlon = min(dlon, 360 - dlon)
+    if dlon >= 90:
+        return lat_gap
+    cross_track = math.asin(min(1.0, math.cos(math.radians(latitude)) * math.sin(math.radians(dlon))))
+    return max(lat_gap, cross_track * EARTH_RADIUS_KM)
+
+class RegionalZoneIndex:
+    """
+    Zone index partitioned by region.
+
+    Every zone belongs to a region: an explicit key (e.g. a state) or, by
+    default, the geohash of its center at ZONE_REGION_PRECISION. A small
+    directory, built from one GROUP BY query, keeps each region's zone count
+    and bounding box and maps every coarse geohash cell to the regions whose
+    zones can reach into it, so routing a coordinate is one geohash encode and
+    a dict lookup.
+
+    Each region has its own ``ZoneIndex``, loaded on first use. Loaded regions
+    are kept in LRU order and evicted once more than ZONE_REGION_CACHE_ZONES
+    zones are in memory, except regions with pending activations or expiries,
+    which stay loaded so their transitions fire on time. A region reloaded
+    after eviction fires the transitions it missed. Regions never loaded in a
+    process fire no transitions there, as no phones in them are tracked.
+
+    Every lookup first checks the zone change feed, so regions changed by
+    another worker are reloaded right away rather than after ZONE_INDEX_TTL.
+    """
+
+    def __init__(self):
+        """Initialize an empty index; the directory is loaded on first use."""
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._generation = 0
+        self._listeners = []
+        self._directory = None
+        self._cells = {}
+        self._wide = ()
+        self._precision = None
+        self._loaded_at = 0.0
+        self._regions = OrderedDict()
+        self._clocks = {}
+        self._region_of = {}
+        self._feed_offset = None
+        self._scheduler = None
+        self._scheduler_pid = None
+        self.stats = Counter()
+
+    def on_transition(self, callback):
+        """
+        Register a callback for zone activations and expiries.
+
+        Args:
+            callback (callable): Called as ``callback(zone, active)`` inside an
+                application context, with the IndexedZone and whether it went live
+        """
+        self._listeners.append(callback)
+
+    def load(self):
+        """
+        Load the region directory, then as many regions as the cache allows.
+
+        Must be called inside an application context.
+
+        Returns:
+            int: Number of zones in all regions
+        """
+        directory = self._load_directory()
+        budget = current_app.config['ZONE_REGION_CACHE_ZONES']
+        loaded = 0
+        # Biggest regions first, as they are the most likely to be queried
+        for info in sorted(directory.values(), key=lambda info: -info.count):
+            if loaded + info.count > budget:
+                continue
+            self._region(info.key)
+            loaded += info.count
+        return sum(info.count for info in directory.values())
+
+    def _load_directory(self):
+        """Rebuild the region directory from the zones table."""
+        generation = self._generation
+        # Changes announced from here on are not in what is loaded below
+        feed_offset = zone_changes.position() if self._feed_offset is None else None
+        config = current_app.config
+        precision = config['ZONE_REGION_PRECISION']
+        max_cells = config['ZONE_REGION_MAX_CELLS']
+
+        rows = db.session.query(
+            Zone.region,
+            func.count(Zone.id),
+            func.sum(case((Zone.type == 'GREEN', 1), else_=0)),
+            func.min(Zone.latitude), func.min(Zone.longitude),
+            func.max(Zone.latitude), func.max(Zone.longitude),
+            func.max(Zone.radius)
+        ).group_by(Zone.region).all()
+
+        directory = {}
+        cells = {}
+        wide = []
+        for key, count, safe, min_lat, min_lon, max_lat, max_lon, max_radius in rows:
+            # Widen the box of centers by the largest radius so it covers every circle
+            lat_margin = max_radius / KM_PER_DEGREE_LAT
+            edge_lat = min(89.9, max(abs(min_lat), abs(max_lat)) + lat_margin)
+            lon_margin = lat_margin / math.cos(math.radians(edge_lat))
+            bbox = (max(-90.0, min_lat - lat_margin), max(-180.0, min_lon - lon_margin),
+                    min(90.0, max_lat + lat_margin), min(180.0, max_lon + lon_margin))
+            info = _RegionInfo(key, count, safe or 0, (min_lat, min_lon, max_lat, max_lon), bbox)
+            directory[key] = info
+
+            if geohash.count_cells(*bbox, precision) > max_cells:
+                # Too spread out to list by cell: consulted for every coordinate
+                wide.append(key)
+                continue
+            for cell in geohash.cells_in_bbox(*bbox, precision):
+                cells.setdefault(cell, []).append(key)
+
+        with self._lock:
+            # An invalidation during the query leaves the directory due for another load
+            self._directory = directory if generation == self._generation else None
+            self._cells = {cell: tuple(keys) for cell, keys in cells.items()}
+            self._wide = tuple(wide)
+            self._precision = precision
+            self._loaded_at = time.monotonic()
+            self._region_of = {}
+            if self._feed_offset is None:
+                self._feed_offset = feed_offset
+            # Regions that no longer have zones
+            for key in [key for key in self._regions if key not in directory]:
+                self._clocks[key] = self._regions.pop(key)._clock
+
+        return directory
+
+    def _ensure_directory(self):
+        """
+        Load the directory if it is missing, invalidated or older than ZONE_INDEX_TTL.
+
+        Like ``ZoneIndex._ensure_loaded``, one thread loads while the others
+        wait for a missing directory or keep using a merely old one.
+        """
+        self._ensure_scheduler()
+        self._follow_changes()
+
+        directory = self._directory
+        if directory is None:
+            with self._load_lock:
+                directory = self._directory
+                if directory is None:
+                    directory = self._load_directory()
+            return directory
+
+        ttl = current_app.config.get('ZONE_INDEX_TTL', 0)
+        if not ttl or time.monotonic() - self._loaded_at <= ttl:
+            return directory
+        if not self._load_lock.acquire(blocking=False):
+            return directory
+        try:
+            if time.monotonic() - self._loaded_at > ttl:
+                directory = self._load_directory()
+        except SQLAlchemyError as e:
+            # Keep routing with the last directory while the database is unavailable
+            db.session.rollback()
+            self._loaded_at = time.monotonic()
+            current_app.logger.warning(f"Zone region directory refresh failed, serving stale regions: {str(e)}")
+        finally:
+            self._load_lock.release()
+        return directory
+
+    def _follow_changes(self):
+        """Drop the regions other workers changed, as announced on the zone change feed."""
+        offset = self._feed_offset
+        if offset is None or zone_changes.position() == offset:
+            return
+        with self._lock:
+            if self._feed_offset != offset:
+                # Another thread read these records
+                return
+            try:
+                self._feed_offset, changes = zone_changes.read(offset)
+            except (OSError, ValueError) as e:
+                current_app.logger.warning(f"Zone change feed unreadable, relying on the TTL refresh: {str(e)}")
+                return
+            self.stats['feed_changes'] += len(changes or ())
+
+        if changes is None:
+            self.invalidate()
+        elif changes:
+            self.invalidate(*{region for change in changes for region in change['regions']})
+
+    def _ensure_scheduler(self):
+        """Start this process's scheduler thread (threads do not survive a fork)."""
+        if self._scheduler_pid == os.getpid():
+            return
+        with self._lock:
+            if self._scheduler_pid == os.getpid() or not current_app.config.get('ZONE_SCHEDULER_TICK'):
+                return
+            self._scheduler = ZoneScheduler(current_app._get_current_object(), self)
+            self._scheduler.start()
+            self._scheduler_pid = os.getpid()
+
+    def _region(self, key):
+        """
+        Get a region's index, loading it and evicting others as needed.
+
+        Args:
+            key (str): Region key
+
+        Returns:
+            ZoneIndex: Loaded index of the region
+        """
+        with self._lock:
+            index = self._regions.get(key)
+            if index is not None:
+                self._regions.move_to_end(key)
+                self.stats['hits'] += 1
+                return index
+            index = ZoneIndex(region_criterion(key), self._listeners, schedule=False)
+            # Pick up where the evicted copy left off so missed transitions fire
+            index._clock = self._clocks.pop(key, None)
+            self._regions[key] = index
+            self.stats['loads'] += 1
+
+        index._ensure_loaded()
+
+        with self._lock:
+            self._evict(keep=key)
+        return index
+
+    def _evict(self, keep):
+        """Evict least recently used regions over the cache budget; must hold the lock."""
+        budget = current_app.config['ZONE_REGION_CACHE_ZONES']
+        total = sum(len(index._by_id) for index in self._regions.values())
+        for key in list(self._regions):
+            if total <= budget:
+                break
+            index = self._regions[key]
+            if key == keep or (index._wheel is not None and len(index._wheel)):
+                continue
+            del self._regions[key]
+            self._clocks[key] = index._clock
+            total -= len(index._by_id)
+            self.stats['evictions'] += 1
+
+    def regions_at(self, latitude, longitude):
+        """
+        Get the regions whose zones can contain a coordinate.
+
+        Args:
+            latitude (float): Latitude
+            longitude (float): Longitude
+
+        Returns:
+            tuple: Region keys
+        """
+        self._ensure_directory()
+        cell = geohash.encode(latitude, longitude, self._precision)
+        return self._cells.get(cell, ()) + self._wide
+
+    def _merge(self, keys, select):
+        """Combine the zones of several regions, sorted by type priority then ID."""
+        if len(keys) == 1:
+            return select(self._region(keys[0]))
+        zones = [zone for key in keys for zone in select(self._region(key))]
+        return tuple(sorted(zones, key=lambda z: (ZONE_PRIORITY.get(z.type, 3), z.id)))
+
+    def zones_at(self, latitude, longitude):
+        """
+        Get the live zones that can contain a coordinate, sorted by type priority.
+
+        Args:
+            latitude (float): Latitude
+            longitude (float): Longitude
+
+        Returns:
+            tuple: IndexedZone snapshots
+        """
+        return self._merge(self.regions_at(latitude, longitude), ZoneIndex.zones)
+
+    def zones_in_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        """
+        Get the live zones of every region overlapping a bounding box, sorted by type priority.
+
+        Args:
+            min_lat, min_lon, max_lat, max_lon (float): Bounding box in degrees
+
+        Returns:
+            tuple: IndexedZone snapshots
+        """
+        directory = self._ensure_directory()
+        keys = [
+            info.key for info in directory.values()
+            if info.bbox[0] <= max_lat and min_lat <= info.bbox[2]
+            and info.bbox[1] <= max_lon and min_lon <= info.bbox[3]
+        ]
+        return self._merge(keys, ZoneIndex.zones) if keys else ()
+
+    def zones(self):
+        """
+        Get the live zones of every region, sorted by type priority.
+
+        This visits every region, so it is meant for offline work (replays,
+        batch jobs) rather than per-request lookups.
+
+        Returns:
+            tuple: IndexedZone snapshots
+        """
+        directory = self._ensure_directory()
+        return self._merge(list(directory), ZoneIndex.zones) if directory else ()
+
+    def safe_zones_by_distance(self, latitude, longitude):
+        """
+        Walk the regions with safe zones, nearest first.
+
+        Args:
+            latitude (float): Latitude
+            longitude (float): Longitude
+
+        Yields:
+            tuple: (lower bound in km on the distance to the region's zone
+                centers, live GREEN zones of the region)
+        """
+        directory = self._ensure_directory()
+        candidates = sorted(
+            (_bbox_distance(latitude, longitude, info.center_bbox), info.key)
+            for info in directory.values() if info.safe
+        )
+        for bound, key in candidates:
+            yield bound, self._region(key).safe_zones()
+
+    def _region_of_zone(self, zone_id):
+        """Get the region key of a zone, or raise KeyError if it does not exist."""
+        self._follow_changes()
+        key = self._region_of.get(zone_id, _MISSING)
+        if key is _NO_ZONE:
+            raise KeyError(zone_id)
+        if key is not _MISSING:
+            return key
+        row = db.session.query(Zone.region).filter(Zone.id == zone_id).first()
+        # Unknown ids (e.g. deleted zones still referenced by history) are cached
+        # too, until the next invalidation, so they cost one query each
+        if len(self._region_of) >= current_app.config['ZONE_REGION_CACHE_ZONES']:
+            # Bounds what lookups of arbitrary ids can hold
+            self._region_of = {}
+        self._region_of[zone_id] = _NO_ZONE if row is None else row.region
+        if row is None:
+            raise KeyError(zone_id)
+        return row.region
+
+    def get(self, zone_id):
+        """
+        Get an indexed zone by ID, whether or not it is live.
+
+        Args:
+            zone_id (int): Zone ID
+
+        Returns:
+            IndexedZone: Zone snapshot or None if not found
+        """
+        try:
+            key = self._region_of_zone(zone_id)
+        except KeyError:
+            return None
+        return self._region(key).get(zone_id)
+
+    def get_live(self, zone_id):
+        """
+        Get an indexed zone by ID if it is currently live.
+
+        Args:
+            zone_id (int): Zone ID
+
+        Returns:
+            IndexedZone: Zone snapshot or None if not found or not live
+        """
+        try:
+            key = self._region_of_zone(zone_id)
+        except KeyError:
+            return None
+        return self._region(key).get_live(zone_id)
+
+    def advance(self, now=None):
+        """
+        Fire due activations and expiries in every loaded region.
+
+        Must be called inside an application context.
+
+        Args:
+            now (float, optional): Current time in epoch seconds
+
+        Returns:
+            int: Number of zones that changed state
+        """
+        with self._lock:
+            regions = list(self._regions.values())
+        return sum(index.advance(now) for index in regions)
+
+    def invalidate(self, *regions):
+        """
+        Drop cached zones so the next lookup reloads them.
+
+        Args:
+            *regions (str): Regions whose zones changed, every region if none are given
+        """
+        with self._lock:
+            self._generation += 1
+            self._directory = None
+            self._region_of = {}
+            for key, index in self._regions.items():
+                if not regions or key in regions:
+                    index.invalidate()
+
+    def snapshot(self):
+        """
+        Get the state of the regional cache.
+
+        Returns:
+            dict: Known and loaded regions, zones in memory, and hit, load and eviction counters
+        """
+        directory = self._ensure_directory()
+        with self._lock:
+            return {
+                'regions': len(directory),
+                'zones': sum(info.count for info in directory.values()),
+                'loaded_regions': list(self._regions),
+                'loaded_zones': sum(len(index._by_id) for index in self._regions.values()),
+                'wide_regions': list(self._wide),
+                **self.stats
+            }
+
+# Process-wide index shared by all services
+zone_index = RegionalZoneIndex()
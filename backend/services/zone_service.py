@@ -1,6 +1,29 @@
 from flask import current_app
-from backend.models import db, Zone
+from backend.models import db, Zone, Address, UserLocation
+from backend.services.address_service import address_service
 from backend.services.location_service import LocationService
+from backend.services.occupancy_service import occupancy_tracker
+from backend.services.sms_service import SMSService
+from backend.services.tile_service import tile_service
+from backend.services.zone_index import zone_index
+from backend.utils import geohash
+from backend.utils.change_feed import zone_changes
+from backend.utils.distance import fence_distance, in_circle
+from backend.utils.phone import phone_key_to_e164
+from backend.utils.serializers import ZONE_FIELDS
+
+def auto_region(latitude, longitude):
+    """
+    Get the automatic region of a zone center.
+
+    Args:
+        latitude (float): Zone center latitude
+        longitude (float): Zone center longitude
+
+    Returns:
+        str: Geohash of the center at ZONE_REGION_PRECISION
+    """
+    return geohash.encode(latitude, longitude, current_app.config['ZONE_REGION_PRECISION'])
 
 class ZoneService:
     """Service for handling zone-related operations."""
@@ -8,6 +31,7 @@ class ZoneService:
     def __init__(self):
         """Initialize the location service."""
         self.location_service = LocationService()
+        self.sms_service = SMSService()
     
     def get_all_zones(self):
         """
@@ -42,7 +66,27 @@ class ZoneService:
         """
         return Zone.query.filter_by(type=zone_type).all()
     
-    def create_zone(self, name, zone_type, latitude, longitude, radius, description=None):
+    def get_zone_rows(self, zone_type=None):
+        """
+        Get zones as plain row tuples, for the bulk serializers.
+        
+        Args:
+            zone_type (str, optional): Only zones of this type (RED, ORANGE, GREEN)
+            
+        Returns:
+            list: Row tuples with the columns of ZONE_FIELDS
+        """
+        columns = [
+            Address.text.label('address') if field == 'address' else getattr(Zone, field)
+            for field in ZONE_FIELDS
+        ]
+        query = db.session.query(*columns).outerjoin(Address, Zone.address_id == Address.id)
+        if zone_type:
+            query = query.filter(Zone.type == zone_type)
+        return query.order_by(Zone.id).all()
+    
+    def create_zone(self, name, zone_type, latitude, longitude, radius, description=None,
+                    active_from=None, active_until=None, region=None):
         """
         Create a new zone.
         
@@ -53,6 +97,9 @@ class ZoneService:
             longitude (float): Zone center longitude
             radius (float): Zone radius in kilometers
             description (str, optional): Zone description
+            active_from (datetime, optional): When the zone goes live (UTC)
+            active_until (datetime, optional): When the zone expires (UTC)
+            region (str, optional): Region key, defaults to the coarse geohash of the center
             
         Returns:
             Zone: Created zone object
@@ -66,12 +113,18 @@ class ZoneService:
             latitude=latitude,
             longitude=longitude,
             radius=radius,
-            address=address,
-            description=description
+            address_id=address_service.intern(address),
+            description=description,
+            active_from=active_from,
+            active_until=active_until,
+            region=region or auto_region(latitude, longitude)
         )
         
         db.session.add(zone)
         db.session.commit()
+        zone_index.invalidate(zone.region)
+        tile_service.invalidate_zone(latitude, longitude, radius)
+        zone_changes.publish(regions=[zone.region], circles=[[latitude, longitude, radius]])
         
         return zone
     
@@ -90,6 +143,14 @@ class ZoneService:
         if not zone:
             return None
         
+        old_geometry = (zone.latitude, zone.longitude, zone.radius)
+        old_region = zone.region
+        was_auto = old_region is None or old_region == auto_region(zone.latitude, zone.longitude)
+        
+        # Addresses are stored by reference to the deduplicated addresses table
+        if 'address' in kwargs:
+            zone.address_id = address_service.intern(kwargs.pop('address'))
+        
         # Update fields
         for key, value in kwargs.items():
             if hasattr(zone, key):
@@ -97,11 +158,24 @@ class ZoneService:
         
         # If coordinates were updated, update the address
         if 'latitude' in kwargs or 'longitude' in kwargs:
-            zone.address = self.location_service.get_address_from_coordinates(
-                zone.latitude, zone.longitude
+            zone.address_id = address_service.intern(
+                self.location_service.get_address_from_coordinates(zone.latitude, zone.longitude)
             )
         
+        # Automatic regions follow the center; explicit ones stay until changed
+        if not zone.region or (was_auto and 'region' not in kwargs):
+            zone.region = auto_region(zone.latitude, zone.longitude)
+        
         db.session.commit()
+        zone_index.invalidate(old_region, zone.region)
+        
+        # Tiles under both the old and the new circle show this zone's properties
+        tile_service.invalidate_zone(*old_geometry)
+        tile_service.invalidate_zone(zone.latitude, zone.longitude, zone.radius)
+        zone_changes.publish(
+            regions=[old_region, zone.region],
+            circles=[list(old_geometry), [zone.latitude, zone.longitude, zone.radius]]
+        )
         
         return zone
     
@@ -109,6 +183,8 @@ class ZoneService:
         """
         Delete a zone.
         
+        The location history keeps its rows, with the zone reference cleared.
+        
         Args:
             zone_id (int): Zone ID
             
@@ -119,8 +195,19 @@ class ZoneService:
         if not zone:
             return False
         
+        old_geometry = (zone.latitude, zone.longitude, zone.radius)
+        old_region = zone.region
+        
+        # One UPDATE, also for tables whose foreign key predates ON DELETE SET NULL
+        UserLocation.query.filter(UserLocation.zone_id == zone_id).update(
+            {UserLocation.zone_id: None}, synchronize_session=False
+        )
         db.session.delete(zone)
         db.session.commit()
+        zone_index.invalidate(old_region)
+        occupancy_tracker.forget_zone(zone_id)
+        tile_service.invalidate_zone(*old_geometry)
+        zone_changes.publish(regions=[old_region], circles=[list(old_geometry)])
         
         return True
     
@@ -128,72 +215,109 @@ class ZoneService:
         """
         Check if coordinates are in a specific zone or any zone.
         
+        Zones are read from the in-memory zone index rather than the database,
+        and only the regions the coordinates route to are considered.
+        
         Args:
             latitude (float): Latitude to check
             longitude (float): Longitude to check
             zone_id (int, optional): Specific zone ID to check
             
         Returns:
-            tuple: (bool, Zone) - Whether in zone and the zone object
+            tuple: (bool, IndexedZone) - Whether in zone and the zone snapshot
         """
         if zone_id:
-            # Check specific zone
-            zone = self.get_zone_by_id(zone_id)
+            # Check specific zone, as long as it is live
+            zone = zone_index.get_live(zone_id)
             if not zone:
                 return False, None
-                
-            distance = self.location_service.calculate_distance(
-                latitude, longitude, zone.latitude, zone.longitude
-            )
-            
-            if distance <= zone.radius:
-                return True, zone
-            
-            return False, None
+            zones = (zone,)
         else:
-            # Check all zones, prioritizing red zones
-            zones = self.get_all_zones()
-            
-            # Sort by zone type priority (RED > ORANGE > GREEN)
-            priority = {'RED': 0, 'ORANGE': 1, 'GREEN': 2}
-            zones.sort(key=lambda z: priority.get(z.type, 3))
+            # Check the zones of the point's regions, already sorted by priority (RED > ORANGE > GREEN)
+            zones = zone_index.zones_at(latitude, longitude)
+        
+        for zone in zones:
+            # Points further away in latitude alone than the radius cannot be inside
+            if abs(latitude - zone.latitude) > zone.lat_margin:
+                continue
             
-            for zone in zones:
-                distance = self.location_service.calculate_distance(
+            if zone.fence is not None:
+                inside = in_circle(zone.fence, latitude, longitude)
+            else:
+                inside = self.location_service.calculate_distance(
                     latitude, longitude, zone.latitude, zone.longitude
-                )
-                
-                if distance <= zone.radius:
-                    return True, zone
+                ) <= zone.radius
             
-            return False, None
+            if inside:
+                return True, zone
+        
+        return False, None
     
     def find_nearest_safe_zone(self, latitude, longitude):
         """
         Find the nearest GREEN (safe) zone from the given coordinates.
         
+        Regions are visited nearest first and the search stops at the first
+        region that cannot hold anything closer than the best zone so far.
+        
         Args:
             latitude (float): Current latitude
             longitude (float): Current longitude
             
         Returns:
-            tuple: (Zone, float) - Nearest safe zone and distance in km
+            tuple: (IndexedZone, float) - Nearest safe zone and distance in km
         """
-        safe_zones = self.get_zones_by_type('GREEN')
-        
-        if not safe_zones:
-            return None, None
-        
         nearest_zone = None
         min_distance = float('inf')
         
-        for zone in safe_zones:
-            distance = self.location_service.calculate_distance(
-                latitude, longitude, zone.latitude, zone.longitude
-            )
+        for bound, safe_zones in zone_index.safe_zones_by_distance(latitude, longitude):
+            if bound >= min_distance:
+                break
             
-            if distance < min_distance:
-                min_distance = distance
-                nearest_zone = zone
+            for zone in safe_zones:
+                if zone.fence is not None:
+                    distance = fence_distance(zone.fence, latitude, longitude)
+                else:
+                    distance = self.location_service.calculate_distance(
+                        latitude, longitude, zone.latitude, zone.longitude
+                    )
+                
+                if distance < min_distance:
+                    min_distance = distance
+                    nearest_zone = zone
+        
+        if nearest_zone is None:
+            return None, None
+        
+        return nearest_zone, min_distance
+    
+    def handle_transition(self, zone, active):
+        """
+        React to a scheduled zone going live or expiring.
+        
+        Redraws the zone's tiles and moves the phones it now covers (or no
+        longer covers) in the occupancy counters. With ZONE_TRANSITION_ALERTS
+        set, phones that end up in a newly live RED or ORANGE zone are alerted.
+        
+        Args:
+            zone (IndexedZone): Zone that changed state
+            active (bool): Whether the zone went live
+        """
+        tile_service.invalidate_zone(zone.latitude, zone.longitude, zone.radius)
+        
+        def resolve(latitude, longitude):
+            in_zone, found = self.is_in_zone(latitude, longitude)
+            return found.id if in_zone else None
         
-        return nearest_zone, min_distance
\ No newline at end of file
+        moved = occupancy_tracker.reassign(zone, resolve)
+        current_app.logger.info(f"Zone {zone.id} transition moved {len(moved)} phones")
+        
+        if not (active and zone.type in ('RED', 'ORANGE') and current_app.config['ZONE_TRANSITION_ALERTS']):
+            return
+        
+        for key, zone_id in moved:
+            if zone_id == zone.id:
+                self.sms_service.send_evacuation_alert(phone_key_to_e164(key), zone.type, zone.address)
+
+# Keep tiles, occupancy and alerts in step with scheduled zones
+zone_index.on_transition(ZoneService().handle_transition)
@@ -0,0 +1,105 @@
+"""
+Cross-process change announcements through an append-only file.
+
+Gunicorn workers each cache zones in memory. After committing a change, the
+worker that made it appends one JSON line describing it to the feed; the
+other workers check the feed's size on every lookup (a single ``stat``) and
+read only the lines added since they last looked, so they drop exactly the
+cached data the change touched, right away.
+
+The feed lives in CHANGE_FEED_DIR (the app's instance folder by default), so
+it reaches the workers of one host. Other hosts still rely on their cache TTL.
+"""
+
+import json
+import os
+from flask import current_app
+
+class ChangeFeed:
+    """
+    Append-only feed of change records shared by the worker processes.
+
+    Readers keep their own byte offset: ``position`` when they load the data
+    the feed describes, then whatever ``read`` returns.
+    """
+
+    def __init__(self, name):
+        """
+        Initialize a feed.
+
+        Args:
+            name (str): Feed name, used as the file name
+        """
+        self.name = name
+
+    def _path(self):
+        """Get the feed file path."""
+        directory = current_app.config.get('CHANGE_FEED_DIR') or current_app.instance_path
+        return os.path.join(directory, f"{self.name}.changes")
+
+    def position(self):
+        """
+        Get the current end of the feed.
+
+        Returns:
+            int: Byte offset just past the last record
+        """
+        try:
+            return os.stat(self._path()).st_size
+        except FileNotFoundError:
+            return 0
+
+    def publish(self, **record):
+        """
+        Announce a committed change to the other processes.
+
+        Failures are logged rather than raised, as the change itself is already
+        committed; the other processes then pick it up at their cache TTL.
+
+        Args:
+            **record: JSON-serializable fields describing the change
+        """
+        line = json.dumps({'pid': os.getpid(), **record}, separators=(',', ':')) + '\n'
+        path = self._path()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # One O_APPEND write per record, so concurrent writers never interleave lines
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode('utf-8'))
+            finally:
+                os.close(fd)
+        except OSError as e:
+            current_app.logger.error(f"Error publishing to the {self.name} change feed: {str(e)}")
+
+    def read(self, offset):
+        """
+        Read the records other processes added after an offset.
+
+        Args:
+            offset (int): Offset returned by ``position`` or a previous ``read``
+
+        Returns:
+            tuple: (new offset, list of record dicts), or (new offset, None) if
+                the feed was removed or truncated and the reader must drop everything
+        """
+        end = self.position()
+        if end == offset:
+            return offset, []
+        if end < offset:
+            return end, None
+
+        with open(self._path(), 'rb') as f:
+            f.seek(offset)
+            data = f.read(end - offset)
+        # A record still being written ends without a newline; leave it for next time
+        complete = data[:data.rfind(b'\n') + 1]
+        records = []
+        for line in complete.splitlines():
+            record = json.loads(line)
+            if record.pop('pid', None) != os.getpid():
+                records.append(record)
+        return offset + len(complete), records
+
+# Feed of zone changes (affected regions and circles)
+zone_changes = ChangeFeed('zones')
@@ -0,0 +1,259 @@
+"""
+Distance kernels for geofencing.
+
+Containment tests first use a flat-earth (equirectangular) distance around the
+zone center, with cos(latitude) precomputed per zone, and only fall back to an
+exact distance (haversine, or Vincenty on the WGS-84 ellipsoid) when the point
+lies within the approximation's error margin of the radius.
+
+Error bound. On a sphere of radius R the line element is
+``ds^2 = R^2 (dlat^2 + cos(lat)^2 dlon^2)`` and the flat metric around a zone
+at latitude lat0 is ``R^2 (dlat^2 + cos(lat0)^2 dlon^2)``. Their ratio along
+any path lies between ``min(1, cos(lat0) / cos(lat))`` and
+``max(1, cos(lat0) / cos(lat))`` over the latitudes the path crosses. Both the
+flat straight line to the center and the great circle of length d <= D stay
+within D / R of lat0, so with k_min and k_max taken over that band:
+
+    k_min * d <= d_flat <= k_max * d
+
+Hence ``d_flat <= k_min * r`` proves the point inside and
+``d_flat > k_max * r`` proves it outside (if d > D >= r it is outside anyway).
+For Vincenty, ellipsoidal lengths are between s_min and s_max times spherical
+ones (the extreme radii of curvature over R), so the bounds become
+``k_min / s_max`` and ``k_max / s_min``. Only the band in between needs the
+exact formula, about 0.01% of the radius for a 1 km zone at mid latitudes.
+"""
+
+import math
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+EARTH_RADIUS_KM = 6371
+
+# WGS-84 ellipsoid
+WGS84_A = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+# Smallest (meridian at the equator) and largest (at the poles) radii of
+# curvature of the ellipsoid, relative to the spherical radius
+ELLIPSOID_SCALE = (WGS84_B ** 2 / WGS84_A / EARTH_RADIUS_KM, WGS84_A ** 2 / WGS84_B / EARTH_RADIUS_KM)
+
+# Extra room on the latitude band and bounds against floating point rounding
+_BAND_FACTOR = 1.01
+_ROUNDING = 1e-9
+
+METHODS = ('haversine', 'vincenty')
+
+Fence = namedtuple('Fence', ['lat', 'lon', 'cos_lat', 'radius', 'inner_sq', 'outer_sq', 'method'])
+Fence.__doc__ = """
+Precomputed containment test of a circle: center in radians, cos of its
+latitude, radius in km, squared flat-distance bounds (radians) that prove a
+point inside or outside, and the exact method used in between.
+"""
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Calculate the great circle distance between two points.
+
+    Args:
+        lat1, lon1: Coordinates of point 1 in degrees
+        lat2, lon2: Coordinates of point 2 in degrees
+
+    Returns:
+        float: Distance in kilometers
+    """
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    return _haversine_rad(lat1, lon1, math.cos(lat1), lat2, lon2)
+
+def _haversine_rad(lat1, lon1, cos_lat1, lat2, lon2):
+    """Haversine distance (km) with the cosine of the first latitude precomputed."""
+    a = math.sin((lat2 - lat1) / 2) ** 2 + cos_lat1 * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+def vincenty(lat1, lon1, lat2, lon2, tolerance=1e-12, max_iterations=200):
+    """
+    Calculate the geodesic distance between two points on the WGS-84 ellipsoid.
+
+    Falls back to haversine for nearly antipodal points, where the iteration
+    does not converge.
+
+    Args:
+        lat1, lon1: Coordinates of point 1 in degrees
+        lat2, lon2: Coordinates of point 2 in degrees
+        tolerance (float): Convergence threshold on lambda in radians
+        max_iterations (int): Iteration limit
+
+    Returns:
+        float: Distance in kilometers
+    """
+    u1 = math.atan((1 - WGS84_F) * math.tan(math.radians(lat1)))
+    u2 = math.atan((1 - WGS84_F) * math.tan(math.radians(lat2)))
+    big_l = math.radians(lon2 - lon1)
+    sin_u1, cos_u1 = math.sin(u1), math.cos(u1)
+    sin_u2, cos_u2 = math.sin(u2), math.cos(u2)
+
+    lam = big_l
+    for _ in range(max_iterations):
+        sin_lam, cos_lam = math.sin(lam), math.cos(lam)
+        sin_sigma = math.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+        if sin_sigma == 0:
+            return 0.0
+        cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+        sigma = math.atan2(sin_sigma, cos_sigma)
+        sin_alpha = cos_u1 * cos_u2 * sin_lam / sin_sigma
+        cos2_alpha = 1 - sin_alpha ** 2
+        cos_2sigma_m = cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha if cos2_alpha else 0.0
+        c = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+        previous = lam
+        lam = big_l + (1 - c) * WGS84_F * sin_alpha * (
+            sigma + c * sin_sigma * (cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+        )
+        if abs(lam - previous) < tolerance:
+            break
+    else:
+        return haversine(lat1, lon1, lat2, lon2)
+
+    u_sq = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    big_a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    big_b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = big_b * sin_sigma * (cos_2sigma_m + big_b / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+        - big_b / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+    ))
+    return WGS84_B * big_a * (sigma - delta_sigma)
+
+def circle_fence(latitude, longitude, radius, method='haversine'):
+    """
+    Precompute the containment test of a circle.
+
+    Args:
+        latitude (float): Center latitude in degrees
+        longitude (float): Center longitude in degrees
+        radius (float): Radius in kilometers
+        method (str): Exact distance used near the edge, 'haversine' or 'vincenty'
+
+    Returns:
+        Fence: Precomputed test for ``in_circle``
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown distance method: {method}")
+
+    lat = math.radians(latitude)
+    cos_lat = math.cos(lat)
+    band = radius / EARTH_RADIUS_KM * _BAND_FACTOR
+
+    # Largest and smallest cos(latitude) across the band around the center
+    cos_high = math.cos(max(0.0, abs(lat) - band))
+    low_lat = abs(lat) + band
+    cos_low = math.cos(low_lat) if low_lat < math.pi / 2 else 0.0
+
+    k_min = min(1.0, cos_lat / cos_high)
+    k_max = max(1.0, cos_lat / cos_low) if cos_low > 0 else math.inf
+    if method == 'vincenty':
+        # Ellipsoidal lengths are between ELLIPSOID_SCALE[0] and [1] times spherical ones
+        k_min /= ELLIPSOID_SCALE[1]
+        k_max /= ELLIPSOID_SCALE[0]
+
+    angle = radius / EARTH_RADIUS_KM
+    inner = angle * k_min * (1 - _ROUNDING)
+    outer = angle * k_max * (1 + _ROUNDING)
+    return Fence(lat, math.radians(longitude), cos_lat, radius, inner * inner, outer * outer, method)
+
+def _wrap(dlon):
+    """Wrap a longitude difference in radians to [-pi, pi]."""
+    if dlon > math.pi:
+        return dlon - 2 * math.pi
+    if dlon < -math.pi:
+        return dlon + 2 * math.pi
+    return dlon
+
+def fence_distance(fence, latitude, longitude):
+    """
+    Get the exact distance from a fence's center to a point.
+
+    Args:
+        fence (Fence): Precomputed circle
+        latitude (float): Point latitude in degrees
+        longitude (float): Point longitude in degrees
+
+    Returns:
+        float: Distance in kilometers, using the fence's method
+    """
+    if fence.method == 'vincenty':
+        return vincenty(math.degrees(fence.lat), math.degrees(fence.lon), latitude, longitude)
+    return _haversine_rad(fence.lat, fence.lon, fence.cos_lat, math.radians(latitude), math.radians(longitude))
+
+def in_circle(fence, latitude, longitude):
+    """
+    Check whether a point is inside a circle.
+
+    Args:
+        fence (Fence): Precomputed circle from ``circle_fence``
+        latitude (float): Point latitude in degrees
+        longitude (float): Point longitude in degrees
+
+    Returns:
+        bool: True if the exact distance is within the radius
+    """
+    dlat = math.radians(latitude) - fence.lat
+    x = _wrap(math.radians(longitude) - fence.lon) * fence.cos_lat
+    flat_sq = dlat * dlat + x * x
+
+    if flat_sq <= fence.inner_sq:
+        return True
+    if flat_sq > fence.outer_sq:
+        return False
+    return fence_distance(fence, latitude, longitude) <= fence.radius
+
+def haversine_batch(lat1, lon1, lat2, lon2):
+    """
+    Vectorized haversine distance.
+
+    Args:
+        lat1, lon1, lat2, lon2 (array-like): Coordinates in degrees (broadcastable)
+
+    Returns:
+        ndarray: Distances in kilometers
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def in_circle_batch(fence, latitudes, longitudes):
+    """
+    Vectorized ``in_circle`` over many points.
+
+    Args:
+        fence (Fence): Precomputed circle
+        latitudes (array-like): Point latitudes in degrees
+        longitudes (array-like): Point longitudes in degrees
+
+    Returns:
+        ndarray: Boolean mask of the points inside the circle
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    dlat = np.radians(latitudes) - fence.lat
+    dlon = np.radians(longitudes) - fence.lon
+    dlon = (dlon + np.pi) % (2 * np.pi) - np.pi
+    flat_sq = dlat * dlat + (dlon * fence.cos_lat) ** 2
+
+    inside = flat_sq <= fence.inner_sq
+    edge = ~inside & (flat_sq <= fence.outer_sq)
+    if edge.any():
+        if fence.method == 'vincenty':
+            center = (math.degrees(fence.lat), math.degrees(fence.lon))
+            inside[edge] = [
+                vincenty(center[0], center[1], lat, lon) <= fence.radius
+                for lat, lon in zip(latitudes[edge].tolist(), longitudes[edge].tolist())
+            ]
+        else:
+            inside[edge] = haversine_batch(
+                math.degrees(fence.lat), math.degrees(fence.lon), latitudes[edge], longitudes[edge]
+            ) <= fence.radius
+    return inside
@@ -0,0 +1,176 @@
+"""
+Minimal geohash encoding helpers.
+
+Used to bucket coordinates into grid cells for heatmaps and spatial indexes.
+"""
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_DECODE = {ch: i for i, ch in enumerate(_BASE32)}
+
+def encode(latitude, longitude, precision=6):
+    """
+    Encode coordinates as a geohash.
+
+    Args:
+        latitude (float): Latitude in degrees
+        longitude (float): Longitude in degrees
+        precision (int): Number of geohash characters
+
+    Returns:
+        str: Geohash of the cell containing the point
+    """
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if longitude >= mid:
+                value = (value << 1) | 1
+                lon_lo = mid
+            else:
+                value <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+
+    return ''.join(chars)
+
+def decode_bbox(geohash):
+    """
+    Get the bounding box of a geohash cell.
+
+    Args:
+        geohash (str): Geohash
+
+    Returns:
+        tuple: (min_lat, min_lon, max_lat, max_lon)
+    """
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    even = True
+
+    for ch in geohash:
+        value = _DECODE[ch]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                if bit:
+                    lon_lo = mid
+                else:
+                    lon_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+
+    return lat_lo, lon_lo, lat_hi, lon_hi
+
+def decode(geohash):
+    """
+    Get the center of a geohash cell.
+
+    Args:
+        geohash (str): Geohash
+
+    Returns:
+        tuple: (latitude, longitude) of the cell center
+    """
+    lat_lo, lon_lo, lat_hi, lon_hi = decode_bbox(geohash)
+    return (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+
+def cell_size(precision):
+    """
+    Get the size of geohash cells at a precision.
+
+    Args:
+        precision (int): Number of geohash characters
+
+    Returns:
+        tuple: (height, width) of a cell in degrees
+    """
+    total_bits = precision * 5
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+def _grid_range(min_lat, min_lon, max_lat, max_lon, precision):
+    """Get the inclusive row and column ranges of cells covering a bounding box."""
+    height, width = cell_size(precision)
+    max_row = int(round(180.0 / height)) - 1
+    max_col = int(round(360.0 / width)) - 1
+    first_row = max(0, int((min_lat + 90.0) // height))
+    last_row = min(max_row, int((max_lat + 90.0) // height))
+    first_col = max(0, int((min_lon + 180.0) // width))
+    last_col = min(max_col, int((max_lon + 180.0) // width))
+    return first_row, last_row, first_col, last_col
+
+def count_cells(min_lat, min_lon, max_lat, max_lon, precision):
+    """
+    Count the cells at a precision that cover a bounding box.
+
+    Args:
+        min_lat, min_lon, max_lat, max_lon (float): Bounding box in degrees
+        precision (int): Number of geohash characters
+
+    Returns:
+        int: Number of covering cells
+    """
+    first_row, last_row, first_col, last_col = _grid_range(min_lat, min_lon, max_lat, max_lon, precision)
+    return max(0, last_row - first_row + 1) * max(0, last_col - first_col + 1)
+
+def cells_in_bbox(min_lat, min_lon, max_lat, max_lon, precision):
+    """
+    Enumerate the geohash cells covering a bounding box.
+
+    Args:
+        min_lat, min_lon, max_lat, max_lon (float): Bounding box in degrees
+        precision (int): Number of geohash characters
+
+    Yields:
+        str: Geohash of each covering cell
+    """
+    height, width = cell_size(precision)
+    first_row, last_row, first_col, last_col = _grid_range(min_lat, min_lon, max_lat, max_lon, precision)
+
+    for row in range(first_row, last_row + 1):
+        # Encode the cell centers so floating point edges never pick a neighbor
+        latitude = -90.0 + (row + 0.5) * height
+        for col in range(first_col, last_col + 1):
+            longitude = -180.0 + (col + 0.5) * width
+            yield encode(latitude, longitude, precision)
+
+def bbox_intersects(geohash, min_lat, min_lon, max_lat, max_lon):
+    """
+    Check whether a geohash cell intersects a bounding box.
+
+    Args:
+        geohash (str): Geohash
+        min_lat, min_lon, max_lat, max_lon (float): Bounding box in degrees
+
+    Returns:
+        bool: True if the cell and the box overlap
+    """
+    lat_lo, lon_lo, lat_hi, lon_hi = decode_bbox(geohash)
+    return lat_lo <= max_lat and lat_hi >= min_lat and lon_lo <= max_lon and lon_hi >= min_lon
@@ -1,14 +1,64 @@
 import os
 from flask import Flask
 from flask_cors import CORS
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+from backend.config import config_by_name
 from backend.models import db
 from backend.routes import all_blueprints
+from backend.services.zone_index import zone_index
+from backend.utils.phone import normalize_phone_number
 
-def create_app(test_config=None):
+def _set_sqlite_pragmas(dbapi_connection, pragmas):
+    """
+    Apply SQLite pragmas to a freshly opened DB-API connection.
+    
+    Args:
+        dbapi_connection: Raw sqlite3 connection
+        pragmas (dict): Pragma names mapped to their values
+    """
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def _engine_options(app):
+    """
+    Build SQLAlchemy engine options for the configured database.
+    
+    Args:
+        app (Flask): Application whose config is used
+        
+    Returns:
+        dict: Engine options for SQLALCHEMY_ENGINE_OPTIONS
+    """
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        # Allow connections to be used from the threads of a gthread worker
+        connect_args = options.setdefault('connect_args', {})
+        connect_args.setdefault('check_same_thread', False)
+    else:
+        options.setdefault('pool_size', app.config['DB_POOL_SIZE'])
+        options.setdefault('max_overflow', app.config['DB_MAX_OVERFLOW'])
+        options.setdefault('pool_recycle', app.config['DB_POOL_RECYCLE'])
+        options.setdefault('pool_timeout', app.config['DB_POOL_TIMEOUT'])
+        options.setdefault('pool_pre_ping', True)
+    
+    return options
+
+def create_app(config_name=None, test_config=None):
     """
     Create and configure the Flask application.
     
+    Schema creation is kept off the startup path unless CREATE_SCHEMA_ON_STARTUP
+    is set; use init_db.py to create tables in production. When
+    PRELOAD_ZONE_INDEX is set the zone index is loaded here, so with gunicorn's
+    preload_app it is built once and shared copy-on-write by all workers.
+    
     Args:
+        config_name (str, optional): Configuration profile name ('development' or
+            'production'), defaults to the APP_CONFIG environment variable
         test_config (dict, optional): Test configuration
         
     Returns:
@@ -18,13 +68,16 @@ def create_app(test_config=None):
     app = Flask(__name__, instance_relative_config=True)
     
     # Load configuration
-    if test_config is None:
-        # Load the instance config, if it exists, when not testing
-        app.config.from_object('backend.config.Config')
-    else:
-        # Load the test config if passed in
+    config_name = config_name or os.environ.get('APP_CONFIG', 'production')
+    app.config.from_object(config_by_name[config_name])
+    if test_config is not None:
+        # Overlay the test config if passed in
         app.config.from_mapping(test_config)
     
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = _engine_options(app)
+    if hasattr(app, 'json'):
+        app.json.sort_keys = app.config['JSON_SORT_KEYS']
+    
     # Ensure the instance folder exists
     try:
         os.makedirs(app.instance_path)
@@ -37,9 +90,27 @@ def create_app(test_config=None):
     # Initialize database
     db.init_app(app)
     
-    # Create database tables
     with app.app_context():
-        db.create_all()
+        if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+            pragmas = app.config['SQLITE_PRAGMAS']
+            event.listen(
+                db.engine, 'connect',
+                lambda dbapi_connection, connection_record: _set_sqlite_pragmas(dbapi_connection, pragmas)
+            )
+        
+        if app.config['CREATE_SCHEMA_ON_STARTUP']:
+            db.create_all()
+        
+        if app.config['PRELOAD_ZONE_INDEX']:
+            try:
+                count = zone_index.load()
+                app.logger.info(f"Preloaded zone index with {count} zones")
+            except SQLAlchemyError as e:
+                app.logger.warning(f"Zone index not preloaded: {str(e)}")
+        
+        # Do not hand pooled connections opened during startup to forked workers
+        db.session.remove()
+        db.engine.dispose()
     
     # Register blueprints
     for blueprint in all_blueprints:
@@ -52,24 +123,21 @@ def create_app(test_config=None):
     
     return app
 
-def format_phone_number(phone_number):
+def format_phone_number(phone_number, region='US'):
     """
     Format phone number to E.164 format for Twilio.
     
     Args:
         phone_number (str): Phone number in any format
+        region (str): Region code used for numbers without a country code
         
     Returns:
         str: Phone number in E.164 format
     """
-    # Remove any non-digit characters
-    digits_only = ''.join(filter(str.isdigit, phone_number))
+    normalized = normalize_phone_number(phone_number, region)
+    if normalized:
+        return normalized
     
-    # Ensure it has country code (add +1 for US if not present)
-    if len(digits_only) == 10:  # US number without country code
-        return f"+1{digits_only}"
-    elif len(digits_only) > 10:  # Assumes it already has country code
-        return f"+{digits_only}"
-    else:
-        # Invalid phone number, but return it anyway
-        return f"+{digits_only}"
\ No newline at end of file
+    # Invalid phone number, but return it anyway
+    digits_only = ''.join(filter(str.isdigit, phone_number))
+    return f"+{digits_only}"
@@ -0,0 +1,147 @@
+"""
+Minimal Mapbox Vector Tile (v2) encoder.
+
+Only what the zone tiles need is supported: a list of layers whose features
+are points or polygons with string/number properties. The protobuf wire
+format is written by hand to avoid a protobuf dependency.
+"""
+
+import struct
+
+# Geometry types (vector_tile.proto GeomType)
+POINT = 1
+POLYGON = 3
+
+# Geometry commands
+_MOVE_TO = 1
+_LINE_TO = 2
+_CLOSE_PATH = 7
+
+# Protobuf wire types
+_VARINT = 0
+_FIXED64 = 1
+_LENGTH_DELIMITED = 2
+
+def _varint(value):
+    """Encode an unsigned integer as a protobuf varint."""
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def _key(field, wire_type):
+    """Encode a protobuf field key."""
+    return _varint((field << 3) | wire_type)
+
+def _bytes_field(field, payload):
+    """Encode a length-delimited protobuf field."""
+    return _key(field, _LENGTH_DELIMITED) + _varint(len(payload)) + payload
+
+def _packed_field(field, values):
+    """Encode a packed repeated uint32 protobuf field."""
+    return _bytes_field(field, b''.join(_varint(v) for v in values))
+
+def _zigzag(value):
+    """Zigzag-encode a signed integer."""
+    return (value << 1) ^ (value >> 31)
+
+def _command(command_id, count):
+    """Encode a geometry command integer."""
+    return (command_id & 0x7) | (count << 3)
+
+def _encode_value(value):
+    """Encode a tile property value message."""
+    if isinstance(value, bool):
+        return _key(7, _VARINT) + _varint(int(value))
+    if isinstance(value, int) and value >= 0:
+        return _key(5, _VARINT) + _varint(value)
+    if isinstance(value, (int, float)):
+        return _key(3, _FIXED64) + struct.pack('<d', float(value))
+    return _bytes_field(1, str(value).encode('utf-8'))
+
+def _encode_geometry(geom_type, coordinates):
+    """
+    Encode feature geometry as MVT commands.
+
+    Args:
+        geom_type (int): POINT or POLYGON
+        coordinates: (x, y) for a point, or a list of (x, y) ring vertices
+            (exterior ring, clockwise in tile coordinates, not closed)
+
+    Returns:
+        list: Geometry command integers
+    """
+    if geom_type == POINT:
+        x, y = coordinates
+        return [_command(_MOVE_TO, 1), _zigzag(x), _zigzag(y)]
+
+    geometry = []
+    cursor_x = cursor_y = 0
+    for i, (x, y) in enumerate(coordinates):
+        if i == 0:
+            geometry.append(_command(_MOVE_TO, 1))
+        elif i == 1:
+            geometry.append(_command(_LINE_TO, len(coordinates) - 1))
+        geometry.append(_zigzag(x - cursor_x))
+        geometry.append(_zigzag(y - cursor_y))
+        cursor_x, cursor_y = x, y
+    geometry.append(_command(_CLOSE_PATH, 1))
+    return geometry
+
+def encode_layer(name, features, extent=4096):
+    """
+    Encode one vector tile layer.
+
+    Args:
+        name (str): Layer name
+        features (list): Dicts with 'id', 'type' (POINT or POLYGON),
+            'geometry' (see _encode_geometry) and 'properties'
+        extent (int): Tile extent in integer coordinates
+
+    Returns:
+        bytes: Encoded layer message
+    """
+    keys = {}
+    values = {}
+    encoded_features = []
+
+    for feature in features:
+        tags = []
+        for key, value in feature['properties'].items():
+            if value is None:
+                continue
+            key_index = keys.setdefault(key, len(keys))
+            value_index = values.setdefault((type(value).__name__, value), len(values))
+            tags.extend((key_index, value_index))
+
+        message = _key(1, _VARINT) + _varint(feature['id'])
+        if tags:
+            message += _packed_field(2, tags)
+        message += _key(3, _VARINT) + _varint(feature['type'])
+        message += _packed_field(4, _encode_geometry(feature['type'], feature['geometry']))
+        encoded_features.append(_bytes_field(2, message))
+
+    layer = _key(15, _VARINT) + _varint(2)
+    layer += _bytes_field(1, name.encode('utf-8'))
+    layer += b''.join(encoded_features)
+    layer += b''.join(_bytes_field(3, key.encode('utf-8')) for key in keys)
+    layer += b''.join(_bytes_field(4, _encode_value(value)) for _, value in values)
+    layer += _key(5, _VARINT) + _varint(extent)
+    return layer
+
+def encode_tile(layers):
+    """
+    Encode a vector tile.
+
+    Args:
+        layers (list): Encoded layer messages from encode_layer
+
+    Returns:
+        bytes: Encoded tile
+    """
+    return b''.join(_bytes_field(3, layer) for layer in layers)
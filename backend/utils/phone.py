@@ -0,0 +1,213 @@
+"""
+Phone number normalization to E.164.
+
+Parsing is country-aware for the regions listed in ``REGIONS`` and falls back
+to generic E.164 length rules for other international numbers. Results are kept
+in a bounded LRU cache because the same numbers are normalized over and over by
+``/check`` pings, broadcasts and deduplication jobs.
+"""
+
+from functools import lru_cache
+
+# Maximum number of distinct (number, region) pairs kept in the normalization cache
+PHONE_CACHE_SIZE = 65536
+
+# E.164 allows at most 15 digits including the country calling code
+E164_MAX_DIGITS = 15
+E164_MIN_DIGITS = 8
+
+# Region code -> (country calling code, valid national number lengths, trunk prefix)
+REGIONS = {
+    'US': ('1', (10,), ''),
+    'CA': ('1', (10,), ''),
+    'GB': ('44', (9, 10), '0'),
+    'IE': ('353', (7, 8, 9), '0'),
+    'FR': ('33', (9,), '0'),
+    'DE': ('49', tuple(range(6, 14)), '0'),
+    'ES': ('34', (9,), ''),
+    'IT': ('39', tuple(range(6, 12)), ''),
+    'NL': ('31', (9,), '0'),
+    'MX': ('52', (10,), ''),
+    'BR': ('55', (10, 11), '0'),
+    'IN': ('91', (10,), '0'),
+    'PK': ('92', (9, 10), '0'),
+    'PH': ('63', (10,), '0'),
+    'JP': ('81', (9, 10), '0'),
+    'CN': ('86', (10, 11), '0'),
+    'AU': ('61', (9,), '0'),
+    'NZ': ('64', (8, 9, 10), '0'),
+    'ZA': ('27', (9,), '0'),
+    'NG': ('234', (8, 10), '0'),
+}
+
+# Country calling code -> valid national number lengths (union over regions sharing a code)
+_LENGTHS_BY_CODE = {}
+for _code, _lengths, _trunk in REGIONS.values():
+    _LENGTHS_BY_CODE[_code] = tuple(sorted(set(_LENGTHS_BY_CODE.get(_code, ())) | set(_lengths)))
+
+# Country calling code -> international dialing prefix standing in for a leading '+'
+# ('011' in the North American Numbering Plan, '00' in every other listed region)
+_INTERNATIONAL_PREFIXES = {'1': '011'}
+_DEFAULT_INTERNATIONAL_PREFIX = '00'
+
+# Prefixes accepted when no known region is given
+_ANY_INTERNATIONAL_PREFIX = ('011', '00')
+
+def _split_country_code(digits):
+    """
+    Split international digits into a known calling code and national number.
+
+    Args:
+        digits (str): Digits following the '+' sign
+
+    Returns:
+        tuple: (calling code, national number) or (None, digits) if the code is unknown
+    """
+    # Calling codes are prefix-free, so the first match is the only match
+    for size in (1, 2, 3):
+        code = digits[:size]
+        if code in _LENGTHS_BY_CODE:
+            return code, digits[size:]
+    return None, digits
+
+def _normalize_international(digits):
+    """
+    Normalize digits that already include a country calling code.
+
+    Args:
+        digits (str): Digits following the '+' sign or international prefix
+
+    Returns:
+        str: Number in E.164 format or None if invalid
+    """
+    code, national = _split_country_code(digits)
+
+    if code is None:
+        # Unknown country: apply only the generic E.164 length rules
+        if E164_MIN_DIGITS <= len(digits) <= E164_MAX_DIGITS:
+            return f"+{digits}"
+        return None
+
+    if len(national) not in _LENGTHS_BY_CODE[code]:
+        return None
+    return f"+{code}{national}"
+
+@lru_cache(maxsize=PHONE_CACHE_SIZE)
+def normalize_phone_number(phone_number, region='US'):
+    """
+    Normalize a phone number to E.164 format.
+
+    Numbers written with a leading '+' or the region's international dialing
+    prefix ('011' in NANP regions, '00' elsewhere) are parsed as international;
+    all others are read as national numbers of ``region``, with the trunk
+    prefix removed. The trunk form is tried first, so a British '0117 ...' is
+    a Bristol number rather than a call to +7. Without a known region only
+    international forms are accepted.
+
+    Args:
+        phone_number (str): Phone number in any format
+        region (str): Region code used for national numbers (e.g. 'US', 'GB'), or None
+
+    Returns:
+        str: Phone number in E.164 format or None if it is not valid
+    """
+    if not phone_number:
+        return None
+
+    phone_number = str(phone_number).strip()
+    digits = ''.join(ch for ch in phone_number if '0' <= ch <= '9')
+    if not digits:
+        return None
+
+    if phone_number.startswith('+'):
+        return _normalize_international(digits)
+
+    country = REGIONS.get(region.upper()) if region else None
+    if country is None:
+        for prefix in _ANY_INTERNATIONAL_PREFIX:
+            if digits.startswith(prefix):
+                return _normalize_international(digits[len(prefix):])
+        return None
+    code, lengths, trunk = country
+
+    # National significant numbers never start with the trunk prefix, which
+    # keeps '00 44 ...' from being read as a trunk-prefixed national number
+    national = digits[len(trunk):]
+    if trunk and digits.startswith(trunk) and not national.startswith(trunk) and len(national) in lengths:
+        return f"+{code}{national}"
+
+    prefix = _INTERNATIONAL_PREFIXES.get(code, _DEFAULT_INTERNATIONAL_PREFIX)
+    if digits.startswith(prefix):
+        return _normalize_international(digits[len(prefix):])
+
+    if digits.startswith(code) and len(digits) - len(code) in lengths:
+        # National number written with its country code but without the '+'
+        digits = digits[len(code):]
+
+    if len(digits) not in lengths:
+        return None
+    return f"+{code}{digits}"
+
+def normalize_phone_numbers(phone_numbers, region='US'):
+    """
+    Normalize a batch of phone numbers at once.
+
+    Each distinct value is parsed only once, which makes this considerably
+    faster than calling ``normalize_phone_number`` per item on columns with
+    many repeated numbers.
+
+    Args:
+        phone_numbers (iterable): Phone numbers (a list, tuple or column of values)
+        region (str): Region code used for national numbers
+
+    Returns:
+        list: E.164 numbers (or None for invalid entries) in input order
+    """
+    phone_numbers = list(phone_numbers)
+    normalized = {
+        value: normalize_phone_number(value, region)
+        for value in dict.fromkeys(phone_numbers)
+    }
+    return [normalized[value] for value in phone_numbers]
+
+def phone_key(e164_number):
+    """
+    Get the compact integer key of an E.164 number.
+
+    E.164 numbers have at most 15 digits, so the key fits in a 64-bit integer
+    and is far cheaper to index and join on than the string form.
+
+    Args:
+        e164_number (str): Number in E.164 format
+
+    Returns:
+        int: Integer key or None if no number was given
+    """
+    if not e164_number:
+        return None
+    return int(e164_number[1:])
+
+def phone_keys(phone_numbers, region='US'):
+    """
+    Normalize a batch of phone numbers and return their integer keys.
+
+    Args:
+        phone_numbers (iterable): Phone numbers in any format
+        region (str): Region code used for national numbers
+
+    Returns:
+        list: Integer keys (or None for invalid entries) in input order
+    """
+    return [phone_key(number) for number in normalize_phone_numbers(phone_numbers, region)]
+
+def phone_key_to_e164(key):
+    """
+    Convert an integer phone key back to E.164 format.
+
+    Args:
+        key (int): Integer key produced by ``phone_key``
+
+    Returns:
+        str: Number in E.164 format
+    """
+    return f"+{key}"
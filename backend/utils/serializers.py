@@ -0,0 +1,273 @@
+"""
+Bulk serializers for list and report endpoints.
+
+These work on plain row tuples selected with only the needed columns, resolve
+zone types from the in-memory zone index and addresses from the intern cache
+(one query per chunk at most), and stream JSON incrementally so large result
+sets are never materialized as one big list of dicts.
+
+Clients sending ``Accept: application/msgpack`` get MessagePack instead, with
+list items encoded as arrays in the order given by a ``fields`` list, so key
+names are not repeated per record. ``Accept: application/vnd.quickevac.columns+msgpack``
+selects a columnar layout: one array of values per field. Timestamps use the
+MessagePack timestamp extension. Binary records are built straight from the
+row tuples without intermediate dicts. Streamed lists are a sequence of
+MessagePack objects, a header map followed by one object per chunk, read
+with ``msgpack.Unpacker``.
+"""
+
+import json
+from datetime import datetime
+from flask import Response, jsonify, request
+from backend.services.address_service import address_service
+from backend.services.zone_index import zone_index
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+COLUMNS_MIMETYPE = 'application/vnd.quickevac.columns+msgpack'
+
+EPOCH = datetime(1970, 1, 1)
+
+# Columns selected for serialized user locations, in row tuple order
+USER_LOCATION_FIELDS = (
+    'id', 'phone_number', 'phone_e164', 'latitude', 'longitude',
+    'address_id', 'in_danger_zone', 'zone_id', 'created_at'
+)
+
+# Fields of binary user location records, in record order
+USER_LOCATION_RECORD_FIELDS = (
+    'id', 'phone_number', 'phone_e164', 'latitude', 'longitude', 'address_id', 'address',
+    'in_danger_zone', 'zone_id', 'zone_type', 'created_at'
+)
+
+# Columns selected for serialized zones, in row tuple order (also the binary record fields)
+ZONE_FIELDS = (
+    'id', 'name', 'type', 'latitude', 'longitude', 'radius', 'address_id', 'address',
+    'description', 'region', 'active_from', 'active_until', 'created_at', 'updated_at'
+)
+
+def json_dumps(value):
+    """
+    Encode a value as compact JSON bytes, using orjson when it is installed.
+
+    Args:
+        value: JSON-serializable value
+
+    Returns:
+        bytes: Encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def serialize_user_locations(rows):
+    """
+    Convert a chunk of user location rows into dictionaries.
+
+    The output matches ``UserLocation.to_dict`` without loading ORM objects or
+    firing per-row zone and address queries.
+
+    Args:
+        rows (list): Row tuples with the columns of USER_LOCATION_FIELDS
+
+    Returns:
+        list: User location dictionaries
+    """
+    addresses = address_service.resolve(row.address_id for row in rows)
+    serialized = []
+
+    for row in rows:
+        zone = zone_index.get(row.zone_id) if row.zone_id is not None else None
+        serialized.append({
+            'id': row.id,
+            'phone_number': row.phone_number,
+            'phone_e164': row.phone_e164,
+            'latitude': row.latitude,
+            'longitude': row.longitude,
+            'address_id': row.address_id,
+            'address': addresses.get(row.address_id),
+            'in_danger_zone': row.in_danger_zone,
+            'zone_id': row.zone_id,
+            'zone_type': zone.type if zone else None,
+            'created_at': row.created_at.isoformat() if row.created_at else None
+        })
+
+    return serialized
+
+def stream_json_list(key, chunks, serializer):
+    """
+    Stream a ``{"success": true, "<key>": [...]}`` JSON document.
+
+    Args:
+        key (str): Name of the list field
+        chunks (iterable): Lists of rows, e.g. from a keyset-paginated query
+        serializer (callable): Converts a chunk of rows into a list of dicts
+
+    Yields:
+        bytes: Consecutive pieces of the JSON document
+    """
+    yield b'{"success":true,"' + key.encode('utf-8') + b'":['
+    first = True
+
+    for chunk in chunks:
+        items = serializer(chunk)
+        if not items:
+            continue
+        body = b','.join(json_dumps(item) for item in items)
+        yield body if first else b',' + body
+        first = False
+
+    yield b']}'
+
+def negotiate():
+    """
+    Pick the response encoding from the request's Accept header.
+
+    JSON wins ties (including ``*/*``) and is always used when msgpack is not installed.
+
+    Returns:
+        str: JSON_MIMETYPE, MSGPACK_MIMETYPE or COLUMNS_MIMETYPE
+    """
+    if msgpack is None:
+        return JSON_MIMETYPE
+    return request.accept_mimetypes.best_match(
+        (JSON_MIMETYPE, MSGPACK_MIMETYPE, COLUMNS_MIMETYPE), default=JSON_MIMETYPE
+    )
+
+def _timestamp(value):
+    """Convert a naive UTC datetime to a MessagePack timestamp, passing None through."""
+    if value is None:
+        return None
+    delta = value - EPOCH
+    return msgpack.Timestamp(delta.days * 86400 + delta.seconds, delta.microseconds * 1000)
+
+def _pack_default(value):
+    """Encode values MessagePack does not support natively."""
+    if isinstance(value, datetime):
+        return _timestamp(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def msgpack_dumps(value):
+    """
+    Encode a value as MessagePack bytes.
+
+    Args:
+        value: Value made of dicts, lists, tuples, scalars and datetimes
+
+    Returns:
+        bytes: Encoded MessagePack
+    """
+    return msgpack.packb(value, use_bin_type=True, default=_pack_default)
+
+def user_location_records(rows):
+    """
+    Convert a chunk of user location rows into binary records.
+
+    Args:
+        rows (list): Row tuples with the columns of USER_LOCATION_FIELDS
+
+    Returns:
+        list: Tuples in USER_LOCATION_RECORD_FIELDS order
+    """
+    addresses = address_service.resolve(row.address_id for row in rows)
+    records = []
+
+    for (location_id, phone_number, phone_e164, latitude, longitude,
+         address_id, in_danger_zone, zone_id, created_at) in rows:
+        zone = zone_index.get(zone_id) if zone_id is not None else None
+        records.append((
+            location_id, phone_number, phone_e164, latitude, longitude, address_id,
+            addresses.get(address_id), in_danger_zone, zone_id, zone.type if zone else None,
+            _timestamp(created_at)
+        ))
+
+    return records
+
+def zone_records(rows):
+    """
+    Convert zone rows into binary records.
+
+    Args:
+        rows (list): Row tuples with the columns of ZONE_FIELDS
+
+    Returns:
+        list: Tuples in ZONE_FIELDS order
+    """
+    return [
+        row[:10] + (_timestamp(row[10]), _timestamp(row[11]), _timestamp(row[12]), _timestamp(row[13]))
+        for row in rows
+    ]
+
+def _layout(records, fields, mimetype):
+    """Lay records out as rows, or as one array per field for the columnar type."""
+    if mimetype != COLUMNS_MIMETYPE:
+        return records
+    if not records:
+        return {field: [] for field in fields}
+    return dict(zip(fields, (list(column) for column in zip(*records))))
+
+def msgpack_list(key, records, fields, mimetype):
+    """
+    Encode a ``{"success": true, "fields": [...], "<key>": ...}`` MessagePack document.
+
+    Args:
+        key (str): Name of the list field
+        records (list): Record tuples in ``fields`` order
+        fields (tuple): Field names
+        mimetype (str): MSGPACK_MIMETYPE (rows) or COLUMNS_MIMETYPE (columns)
+
+    Returns:
+        bytes: Encoded document
+    """
+    return msgpack_dumps({'success': True, 'fields': fields, key: _layout(records, fields, mimetype)})
+
+def stream_msgpack_list(key, chunks, recorder, fields, mimetype):
+    """
+    Stream a list as a header map followed by one MessagePack object per chunk.
+
+    Args:
+        key (str): Name of the list, given in the header
+        chunks (iterable): Lists of rows, e.g. from a keyset-paginated query
+        recorder (callable): Converts a chunk of rows into record tuples
+        fields (tuple): Field names of the records
+        mimetype (str): MSGPACK_MIMETYPE (rows) or COLUMNS_MIMETYPE (columns)
+
+    Yields:
+        bytes: Consecutive MessagePack objects
+    """
+    layout = 'columns' if mimetype == COLUMNS_MIMETYPE else 'rows'
+    yield msgpack_dumps({'success': True, 'list': key, 'fields': fields, 'layout': layout})
+
+    for chunk in chunks:
+        records = recorder(chunk)
+        if records:
+            yield msgpack_dumps(_layout(records, fields, mimetype))
+
+def negotiated_response(payload, status=200):
+    """
+    Build a response in the encoding the client accepts.
+
+    The columnar type only changes the layout of lists, so single objects
+    are sent as plain MessagePack to clients asking for it.
+
+    Args:
+        payload (dict): Response body
+        status (int): HTTP status code
+
+    Returns:
+        tuple: (Response, status)
+    """
+    mimetype = negotiate()
+    if mimetype == JSON_MIMETYPE:
+        return jsonify(payload), status
+    return Response(msgpack_dumps(payload), mimetype=MSGPACK_MIMETYPE), status
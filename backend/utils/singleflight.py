@@ -0,0 +1,206 @@
+"""
+Request coalescing ("single flight") for expensive idempotent calls.
+
+Concurrent callers asking for the same key share one in-flight call: the first
+caller runs it and the others wait for its result instead of issuing their own.
+With a lock directory, the leader of each worker also takes a file lock for
+the key, and reuses a result another worker stored within the last few
+seconds, so a burst is collapsed across the whole host. Keys share a fixed set
+of lock files, and result files are removed once they are too old to reuse,
+so the directory does not grow with the number of distinct keys.
+
+A lock file is only waited on for a bounded time: a slow call holding a
+stripe (for this key or another one hashed to it) makes the other workers
+fall back to calling directly rather than queueing behind it.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+_MISSING = object()
+
+# Lock files shared by all keys; a key maps to one by hash
+_LOCK_STRIPES = 256
+
+# Seconds between sweeps of expired result files
+_SWEEP_INTERVAL = 60
+
+# Longest pause (seconds) between attempts to take a held lock file
+_MAX_POLL_INTERVAL = 0.05
+
+class _Call:
+    """An in-flight call and its outcome."""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one.
+
+    Usage:
+        flight = SingleFlight()
+        address = flight.do(('geocode', lat, lon), lambda: geocode(lat, lon))
+    """
+
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._swept_at = 0.0
+        self.stats = Counter()
+
+    def do(self, key, fn, lock_dir=None, shared_ttl=0, lock_wait=1.0):
+        """
+        Run fn once for all concurrent callers with the same key.
+
+        Args:
+            key (tuple): Hashable key identifying the call
+            fn (callable): Function called without arguments by the leader
+            lock_dir (str, optional): Directory for cross-worker lock and result files
+            shared_ttl (float): Seconds a result stored by another worker may be reused
+            lock_wait (float): Seconds to wait for the key's lock file before calling directly
+
+        Returns:
+            The result of fn, possibly computed by another caller
+
+        Raises:
+            Exception: Whatever fn raised, re-raised in every waiting caller
+        """
+        with self._lock:
+            self.stats['calls'] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.stats['collapsed'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if lock_dir and fcntl is not None:
+                call.result = self._do_shared(key, fn, lock_dir, shared_ttl, lock_wait)
+            else:
+                call.result = self._execute(fn)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _execute(self, fn):
+        """Run the underlying call and count it."""
+        with self._lock:
+            self.stats['executed'] += 1
+        return fn()
+
+    def _do_shared(self, key, fn, lock_dir, shared_ttl, lock_wait):
+        """Run fn under the key's file lock, reusing a fresh result from another worker."""
+        name = hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).hexdigest()
+        result_path = os.path.join(lock_dir, f"{name}.json")
+        lock_path = os.path.join(lock_dir, f"stripe-{int(name, 16) % _LOCK_STRIPES:03d}.lock")
+        os.makedirs(lock_dir, exist_ok=True)
+        self._sweep(lock_dir, shared_ttl)
+
+        with open(lock_path, 'a') as lock_file:
+            deadline = time.monotonic() + lock_wait
+            delay = 0.005
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    pass
+                # The holder may be another worker running this very key
+                result = self._read_shared(result_path, shared_ttl)
+                if result is not _MISSING:
+                    with self._lock:
+                        self.stats['collapsed_shared'] += 1
+                    return result
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    with self._lock:
+                        self.stats['lock_timeouts'] += 1
+                    return self._execute(fn)
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 2, _MAX_POLL_INTERVAL)
+
+            try:
+                result = self._read_shared(result_path, shared_ttl)
+                if result is not _MISSING:
+                    with self._lock:
+                        self.stats['collapsed_shared'] += 1
+                    return result
+
+                result = self._execute(fn)
+                # Failures (None) are not shared, so the next burst retries
+                if result is not None:
+                    tmp_path = f"{result_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                    with open(tmp_path, 'w') as f:
+                        json.dump(result, f)
+                    os.replace(tmp_path, result_path)
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_shared(self, path, ttl):
+        """Read a result file stored less than ttl seconds ago, removing it if it is older."""
+        try:
+            if time.time() - os.path.getmtime(path) > ttl:
+                os.remove(path)
+                return _MISSING
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return _MISSING
+
+    def _sweep(self, lock_dir, ttl):
+        """Remove result files of keys nobody asked for again, at most every _SWEEP_INTERVAL seconds."""
+        now = time.time()
+        with self._lock:
+            if now - self._swept_at < _SWEEP_INTERVAL:
+                return
+            self._swept_at = now
+
+        for entry in os.scandir(lock_dir):
+            if not entry.name.endswith(('.json', '.tmp')):
+                continue
+            # A temporary file that old was left behind by a crashed writer
+            max_age = _SWEEP_INTERVAL if entry.name.endswith('.tmp') else ttl
+            try:
+                if now - entry.stat().st_mtime > max_age:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def snapshot(self):
+        """
+        Get coalescing counters.
+
+        Returns:
+            dict: calls, executed, collapsed (same worker), collapsed_shared
+                (other workers) and lock_timeouts counts, plus the number of calls in flight
+        """
+        with self._lock:
+            return {'in_flight': len(self._calls), **self.stats}
@@ -0,0 +1,112 @@
+"""
+Hierarchical timer wheel.
+
+Timers are bucketed by deadline tick into a few wheels of ``slots`` slots
+each; level L covers ``slots ** (L + 1)`` ticks. Scheduling is O(1), and
+advancing costs O(1) per tick plus the occasional cascade of a higher-level
+slot into the levels below. Deadlines beyond the top level wait in an
+overflow list until the top wheel comes round.
+"""
+
+class TimerWheel:
+    """
+    Hierarchical timer wheel keyed by wall-clock deadlines.
+
+    Usage:
+        wheel = TimerWheel(time.time())
+        wheel.schedule(deadline, item)
+        for item in wheel.advance(time.time()):
+            ...
+    """
+
+    def __init__(self, start, tick=1.0, slots=64, levels=4):
+        """
+        Initialize an empty wheel.
+
+        Args:
+            start (float): Current time in seconds
+            tick (float): Resolution in seconds
+            slots (int): Slots per wheel
+            levels (int): Number of wheels
+        """
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._current = int(start // tick)
+        self._wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self._overflow = []
+        self._due = []
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def schedule(self, deadline, item):
+        """
+        Schedule an item.
+
+        Args:
+            deadline (float): Time in seconds at which the item expires
+            item: Value returned by ``advance`` once the deadline has passed
+        """
+        self._count += 1
+        self._place(int(deadline // self.tick), item)
+
+    def _place(self, tick, item):
+        """Put an entry in the lowest wheel whose current rotation contains its tick."""
+        if tick <= self._current:
+            self._due.append(item)
+            return
+
+        span = 1
+        for level in range(self.levels):
+            # Same block of the next level up: the entry belongs in this wheel
+            if tick // (span * self.slots) == self._current // (span * self.slots):
+                self._wheels[level][(tick // span) % self.slots].append((tick, item))
+                return
+            span *= self.slots
+
+        self._overflow.append((tick, item))
+
+    def advance(self, now):
+        """
+        Move the wheel forward to the given time.
+
+        Args:
+            now (float): Current time in seconds
+
+        Returns:
+            list: Items whose deadline has passed, in deadline order per tick
+        """
+        target = int(now // self.tick)
+        expired, self._due = self._due, []
+
+        while self._current < target:
+            if self._count == len(expired):
+                # Nothing left in the wheels, so skip the idle ticks
+                self._current = target
+                break
+
+            self._current += 1
+
+            # Cascade from the top so entries settle into the lowest valid wheel
+            if self._current % (self.slots ** self.levels) == 0:
+                overflow, self._overflow = self._overflow, []
+                for tick, item in overflow:
+                    self._place(tick, item)
+            for level in range(self.levels - 1, 0, -1):
+                span = self.slots ** level
+                if self._current % span == 0:
+                    slot = (self._current // span) % self.slots
+                    entries, self._wheels[level][slot] = self._wheels[level][slot], []
+                    for tick, item in entries:
+                        self._place(tick, item)
+
+            slot = self._current % self.slots
+            entries, self._wheels[0][slot] = self._wheels[0][slot], []
+            expired.extend(item for _, item in entries)
+            expired.extend(self._due)
+            self._due = []
+
+        self._count -= len(expired)
+        return expired
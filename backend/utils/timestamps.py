@@ -0,0 +1,27 @@
+"""
+Timestamp parsing for request parameters.
+
+The database stores naive UTC datetimes, so timestamps given with an offset
+(``2024-05-01T12:00:00Z``, ``...+02:00``) are converted to naive UTC before
+they are compared with stored values.
+"""
+
+from datetime import datetime, timezone
+
+def parse_utc_timestamp(value):
+    """
+    Parse an ISO 8601 timestamp into a naive UTC datetime.
+
+    Args:
+        value (str): ISO timestamp, naive (taken as UTC) or with an offset
+
+    Returns:
+        datetime: Naive datetime in UTC
+
+    Raises:
+        ValueError: If the value is not a valid ISO timestamp
+    """
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
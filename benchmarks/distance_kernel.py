@@ -0,0 +1,64 @@
+"""
+Benchmark of the geofencing distance kernels in backend/utils/distance.py.
+
+Compares the approximate-then-exact containment test (``in_circle``) with
+computing the exact distance for every point/zone pair, for both distance
+methods, and checks that both give the same answers. Run it from the
+repository root:
+
+    python -m benchmarks.distance_kernel [zones] [points]
+"""
+
+import random
+import sys
+import time
+
+from backend.utils.distance import circle_fence, haversine, in_circle, vincenty
+
+EXACT = {'haversine': haversine, 'vincenty': vincenty}
+
+def make_zones(count, rng):
+    """Zones of 100 m to 5 km around the San Francisco Bay Area."""
+    return [
+        (rng.uniform(37.2, 38.2), rng.uniform(-122.8, -121.8), rng.uniform(0.1, 5.0))
+        for _ in range(count)
+    ]
+
+def make_points(count, rng):
+    return [(rng.uniform(37.2, 38.2), rng.uniform(-122.8, -121.8)) for _ in range(count)]
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+def run(zone_count=200, point_count=20000):
+    rng = random.Random(42)
+    zones = make_zones(zone_count, rng)
+    points = make_points(point_count, rng)
+    pairs = zone_count * point_count
+    print(f"{zone_count} zones x {point_count} points = {pairs} pairs")
+
+    for method, exact in EXACT.items():
+        fences = [circle_fence(latitude, longitude, radius, method) for latitude, longitude, radius in zones]
+
+        def naive():
+            return [
+                sum(exact(latitude, longitude, *point) <= radius for latitude, longitude, radius in zones)
+                for point in points
+            ]
+
+        def kernel():
+            return [sum(in_circle(fence, *point) for fence in fences) for point in points]
+
+        expected, naive_seconds = timed(naive)
+        actual, kernel_seconds = timed(kernel)
+        if actual != expected:
+            raise SystemExit(f"{method}: kernel and exact distance disagree")
+
+        print(f"{method:>9}: exact {naive_seconds / pairs * 1e6:.2f} us/pair, "
+              f"kernel {kernel_seconds / pairs * 1e6:.2f} us/pair "
+              f"({naive_seconds / kernel_seconds:.1f}x)")
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:3]))
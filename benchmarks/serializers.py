@@ -0,0 +1,130 @@
+"""
+Benchmark of the zone and location list encodings in backend/utils/serializers.py.
+
+Encodes the zone list and the location history as JSON (what the endpoints
+send by default), MessagePack records and MessagePack columns, then decodes
+each the way a client would, and reports the best time and the size of each.
+Every encoding must decode to the same number of items. Needs msgpack. Run
+it from the repository root:
+
+    python -m benchmarks.serializers [zones] [locations]
+"""
+
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+import msgpack
+
+from backend.models import db, UserLocation, Zone
+from backend.services.location_service import LocationService
+from backend.services.zone_service import ZoneService
+from backend.utils.helpers import create_app
+from backend.utils.serializers import (
+    COLUMNS_MIMETYPE, MSGPACK_MIMETYPE, USER_LOCATION_RECORD_FIELDS, ZONE_FIELDS, json_dumps, msgpack_list,
+    serialize_user_locations, stream_json_list, stream_msgpack_list, user_location_records, zone_records
+)
+
+LAYOUTS = {'msgpack rows': MSGPACK_MIMETYPE, 'msgpack columns': COLUMNS_MIMETYPE}
+
+def make_app(zone_count, location_count, rng):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    app = create_app('development', {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'CHANGE_FEED_DIR': tempfile.mkdtemp(),
+    })
+    app.logger.setLevel(logging.CRITICAL)
+    with app.app_context():
+        db.session.add_all([
+            Zone(name=f"Zone {i}", type=rng.choice(['RED', 'ORANGE', 'GREEN']),
+                 latitude=rng.uniform(37.2, 38.2), longitude=rng.uniform(-122.8, -121.8),
+                 radius=rng.uniform(0.1, 5.0), description='Evacuation zone')
+            for i in range(zone_count)
+        ])
+        db.session.flush()
+        db.session.add_all([
+            UserLocation(phone_number=f"+1415555{i % 900:04d}", phone_e164=f"+1415555{i % 900:04d}",
+                         phone_key=14155550000 + i % 900, latitude=rng.uniform(37.2, 38.2),
+                         longitude=rng.uniform(-122.8, -121.8), in_danger_zone=bool(i % 2),
+                         zone_id=1 if i % 2 else None)
+            for i in range(location_count)
+        ])
+        db.session.commit()
+    return app, path
+
+def best_of(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+def decode_stream(data):
+    unpacker = msgpack.Unpacker(timestamp=3)
+    unpacker.feed(data)
+    return list(unpacker)
+
+def count_streamed(objects):
+    """Count the items of a decoded MessagePack stream (header, then chunks)."""
+    header, chunks = objects[0], objects[1:]
+    if header['layout'] == 'columns':
+        return sum(len(chunk[header['fields'][0]]) for chunk in chunks)
+    return sum(len(chunk) for chunk in chunks)
+
+def report(name, encode, decode, count):
+    data, encode_seconds = best_of(encode)
+    items, decode_seconds = best_of(lambda: count(decode(data)))
+    print(f"  {name:>15}: encode {encode_seconds * 1000:7.1f} ms, decode {decode_seconds * 1000:7.1f} ms, "
+          f"{len(data):>9} bytes")
+    return items
+
+def run(zone_count=3000, location_count=20000):
+    app, path = make_app(zone_count, location_count, random.Random(42))
+    try:
+        with app.app_context():
+            zone_service = ZoneService()
+            location_service = LocationService()
+
+            print(f"zones ({zone_count})")
+            zones = zone_service.get_all_zones()
+            rows = zone_service.get_zone_rows()
+            counts = {report(
+                'json', lambda: json_dumps({'success': True, 'zones': [zone.to_dict() for zone in zones]}),
+                json.loads, lambda document: len(document['zones'])
+            )}
+            for name, mimetype in LAYOUTS.items():
+                counts.add(report(
+                    name, lambda: msgpack_list('zones', zone_records(rows), ZONE_FIELDS, mimetype),
+                    lambda data: msgpack.unpackb(data, timestamp=3),
+                    lambda document: len(document['zones']['id'] if isinstance(document['zones'], dict)
+                                         else document['zones'])
+                ))
+            if counts != {zone_count}:
+                raise SystemExit(f"zone encodings disagree: {sorted(counts)} items")
+
+            print(f"location history ({location_count})")
+            chunks = list(location_service.iter_locations())
+            counts = {report(
+                'json', lambda: b''.join(stream_json_list('locations', chunks, serialize_user_locations)),
+                json.loads, lambda document: len(document['locations'])
+            )}
+            for name, mimetype in LAYOUTS.items():
+                counts.add(report(
+                    name, lambda: b''.join(stream_msgpack_list(
+                        'locations', chunks, user_location_records, USER_LOCATION_RECORD_FIELDS, mimetype
+                    )),
+                    decode_stream, count_streamed
+                ))
+            if counts != {location_count}:
+                raise SystemExit(f"location encodings disagree: {sorted(counts)} items")
+    finally:
+        os.remove(path)
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,167 @@
+"""
+Benchmark of /api/location/check under concurrent clients, single-threaded vs threaded.
+
+Serves the app with the werkzeug server, once handling one request at a
+time and once with a thread per request, and sends the same location checks
+from concurrent clients. The Google Maps and Twilio clients are replaced by
+stand-ins that sleep like a network round trip, so the run shows how much
+of that wait the threaded server overlaps. It also reports errors and how
+many external clients were built, which must stay at one of each per run
+however many threads share the services. Run it from the repository root:
+
+    python -m benchmarks.threaded_checks [requests] [clients]
+"""
+
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from werkzeug.serving import make_server
+
+import backend.routes.location_routes as location_routes
+import backend.services.location_service as location_module
+import backend.services.sms_service as sms_module
+from backend.models import db, Zone
+from backend.services.location_service import LocationService
+from backend.services.sms_service import SMSService
+from backend.services.zone_service import ZoneService
+from backend.utils.helpers import create_app
+
+# Simulated latency of one external API call, in seconds
+NETWORK_DELAY = 0.05
+
+ZONES = [
+    ('Mission Fire', 'RED', 37.7749, -122.4194, 1.0),
+    ('North Beach Smoke', 'ORANGE', 37.8083, -122.4156, 1.2),
+    ('Golden Gate Park Shelter', 'GREEN', 37.7694, -122.4862, 1.5),
+]
+
+built = []
+
+class SlowMaps:
+    """Google Maps client stand-in answering after NETWORK_DELAY."""
+
+    def __init__(self, key=None):
+        built.append('googlemaps')
+        time.sleep(NETWORK_DELAY)
+
+    def reverse_geocode(self, latlng):
+        time.sleep(NETWORK_DELAY)
+        return [{'formatted_address': f"{latlng[0]:.3f}, {latlng[1]:.3f}"}]
+
+    def directions(self, **kwargs):
+        time.sleep(NETWORK_DELAY)
+        return []
+
+class SlowTwilio:
+    """Twilio client stand-in answering after NETWORK_DELAY."""
+
+    def __init__(self, *args):
+        built.append('twilio')
+        time.sleep(NETWORK_DELAY)
+        self.messages = self
+
+    def create(self, **kwargs):
+        time.sleep(NETWORK_DELAY)
+        return type('Message', (), {'sid': 'SM0'})
+
+def make_app():
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    app = create_app('development', {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'GOOGLE_MAPS_API_KEY': 'benchmark',
+        'TWILIO_ACCOUNT_SID': 'benchmark',
+        'TWILIO_AUTH_TOKEN': 'benchmark',
+        'TWILIO_PHONE_NUMBER': '+14155550000',
+        # Measure the server, not the admission limits
+        'ADMISSION_MAX_CONCURRENT': 64,
+        'ADMISSION_MAX_QUEUE': 256,
+        'ADMISSION_QUEUE_TIMEOUT': 30,
+        'ADMISSION_REPEAT_WINDOW': 0,
+        'CHANGE_FEED_DIR': tempfile.mkdtemp(),
+    })
+    app.logger.setLevel(logging.CRITICAL)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    with app.app_context():
+        for name, zone_type, latitude, longitude, radius in ZONES:
+            db.session.add(Zone(name=name, type=zone_type, latitude=latitude, longitude=longitude, radius=radius))
+        db.session.commit()
+    return app, path
+
+def send_checks(port, request_count, client_count, rng):
+    """Send location checks from concurrent clients; returns the errors."""
+    bodies = [
+        json.dumps({
+            'phone_number': f"+1415555{i % 50:04d}",
+            'latitude': 37.7749 + rng.uniform(-0.05, 0.05),
+            'longitude': -122.4194 + rng.uniform(-0.05, 0.05),
+        }).encode()
+        for i in range(request_count)
+    ]
+    pending = iter(bodies)
+    pending_lock = threading.Lock()
+    errors = []
+
+    def client():
+        while True:
+            with pending_lock:
+                body = next(pending, None)
+            if body is None:
+                return
+            request = urllib.request.Request(
+                f"http://127.0.0.1:{port}/api/location/check", data=body,
+                headers={'Content-Type': 'application/json'}
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    json.loads(response.read())
+            except Exception as e:
+                errors.append(repr(e))
+
+    clients = [threading.Thread(target=client) for _ in range(client_count)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return errors
+
+def run(request_count=160, client_count=16):
+    location_module.googlemaps.Client = SlowMaps
+    sms_module.Client = SlowTwilio
+    app, path = make_app()
+    print(f"{request_count} checks from {client_count} clients, {NETWORK_DELAY * 1000:.0f} ms per external call")
+
+    try:
+        for threaded in (False, True):
+            # Fresh services, so their clients are built lazily under this run's concurrency
+            location_routes.location_service = LocationService()
+            location_routes.zone_service = ZoneService()
+            location_routes.sms_service = SMSService()
+            built.clear()
+
+            server = make_server('127.0.0.1', 0, app, threaded=threaded)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            started = time.perf_counter()
+            errors = send_checks(server.server_port, request_count, client_count, random.Random(42))
+            elapsed = time.perf_counter() - started
+            server.shutdown()
+
+            clients_built = {name: built.count(name) for name in sorted(set(built))}
+            print(f"{'threaded' if threaded else 'single':>9}: {request_count / elapsed:6.1f} req/s, "
+                  f"{len(errors)} errors, clients built {clients_built}")
+            if errors:
+                print(f"           first error: {errors[0]}")
+            if any(count > 1 for count in clients_built.values()):
+                raise SystemExit("an external client was built more than once")
+    finally:
+        os.remove(path)
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:3]))
@@ -1,8 +1,10 @@
 import React, { useEffect, useRef } from 'react';
 import { Box, Typography, Paper } from '@mui/material';
+import { zonesApi } from '../services/api';
+import { createZoneTileLayer } from '../services/zoneTiles';
 
 /**
- * Component to display a Google Maps with the evacuation route
+ * Component to display a Google Maps with the zones and the evacuation route
  * 
  * @param {Object} props - Component props
  * @param {Object} props.locationData - Location data from API
@@ -16,7 +18,7 @@ const EvacuationMap = ({ locationData }) => {
       return;
     }
     
-    const { location, zone, evacuation } = locationData;
+    const { location, evacuation } = locationData;
     
     // Initialize map
     if (!mapInstance.current) {
@@ -31,8 +33,9 @@ const EvacuationMap = ({ locationData }) => {
     
     const map = mapInstance.current;
     
-    // Clear existing markers and circles
+    // Draw all zones from the backend's vector tiles
     map.overlayMapTypes.clear();
+    map.overlayMapTypes.push(createZoneTileLayer(zonesApi.getTileUrlTemplate()));
     
     // Add marker for user location
     new window.google.maps.Marker({
@@ -44,25 +47,6 @@ const EvacuationMap = ({ locationData }) => {
       },
     });
     
-    // Add circle for danger zone if in one
-    if (locationData.in_danger_zone && zone) {
-      const zoneColors = {
-        RED: '#ff0000',
-        ORANGE: '#ff9800',
-        GREEN: '#4caf50',
-      };
-      
-      new window.google.maps.Circle({
-        center: { lat: zone.latitude, lng: zone.longitude },
-        radius: zone.radius * 1000, // Convert km to m
-        map: map,
-        fillColor: zoneColors[zone.type] || '#ff0000',
-        fillOpacity: 0.3,
-        strokeColor: zoneColors[zone.type] || '#ff0000',
-        strokeWeight: 1,
-      });
-    }
-    
     // Add safe zone marker and route if evacuation info is available
     if (evacuation && evacuation.safe_zone) {
       // Add marker for safe zone
@@ -78,20 +62,6 @@ const EvacuationMap = ({ locationData }) => {
         },
       });
       
-      // Add circle for safe zone
-      new window.google.maps.Circle({
-        center: { 
-          lat: evacuation.safe_zone.latitude, 
-          lng: evacuation.safe_zone.longitude 
-        },
-        radius: evacuation.safe_zone.radius * 1000, // Convert km to m
-        map: map,
-        fillColor: '#4caf50',
-        fillOpacity: 0.3,
-        strokeColor: '#4caf50',
-        strokeWeight: 1,
-      });
-      
       // Draw route if directions are available
       if (evacuation.directions) {
         const directionsService = new window.google.maps.DirectionsService();
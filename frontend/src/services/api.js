@@ -66,6 +66,13 @@ export const zonesApi = {
    * @returns {Promise} - API response
    */
   deleteZone: (id) => api.delete(`/zone/${id}`),
+  
+  /**
+   * URL template of the zone vector tiles (Mapbox Vector Tile format)
+   * 
+   * @returns {string} - Tile URL with {z}/{x}/{y} placeholders
+   */
+  getTileUrlTemplate: () => `${API_URL}/zone/tiles/{z}/{x}/{y}.mvt`,
 };
 
 export default api;
\ No newline at end of file
@@ -0,0 +1,264 @@
+/**
+ * Zone vector tiles on a Google Map
+ *
+ * The backend serves the zones as Mapbox Vector Tiles (see
+ * backend/services/tile_service.py). Google Maps has no vector tile layer, so
+ * each tile is fetched, decoded and drawn on a canvas by a custom overlay map
+ * type. Only what the backend encoder writes is decoded: layers of point and
+ * polygon features with string/number properties.
+ */
+
+// Zone fill and stroke colors by zone type
+export const ZONE_COLORS = {
+  RED: '#ff0000',
+  ORANGE: '#ff9800',
+  GREEN: '#4caf50',
+};
+
+// Geometry types (vector_tile.proto GeomType)
+const POINT = 1;
+const POLYGON = 3;
+
+// Canvas size of a tile in CSS pixels
+const TILE_SIZE = 256;
+
+/**
+ * Minimal protobuf reader over a byte array
+ */
+class Reader {
+  constructor(bytes, start = 0, end = bytes.length) {
+    this.bytes = bytes;
+    this.pos = start;
+    this.end = end;
+  }
+
+  varint() {
+    let value = 0;
+    let shift = 0;
+    let byte;
+    do {
+      byte = this.bytes[this.pos++];
+      // Multiply rather than shift, values may exceed 32 bits
+      value += (byte & 0x7f) * 2 ** shift;
+      shift += 7;
+    } while (byte & 0x80);
+    return value;
+  }
+
+  double() {
+    const view = new DataView(this.bytes.buffer, this.bytes.byteOffset + this.pos, 8);
+    this.pos += 8;
+    return view.getFloat64(0, true);
+  }
+
+  /**
+   * Read a length-delimited field as a sub-reader
+   */
+  message() {
+    const length = this.varint();
+    const start = this.pos;
+    this.pos += length;
+    return new Reader(this.bytes, start, this.pos);
+  }
+
+  string() {
+    const message = this.message();
+    return new TextDecoder().decode(this.bytes.subarray(message.pos, message.end));
+  }
+
+  packed() {
+    const message = this.message();
+    const values = [];
+    while (message.pos < message.end) {
+      values.push(message.varint());
+    }
+    return values;
+  }
+
+  skip(wireType) {
+    if (wireType === 0) this.varint();
+    else if (wireType === 1) this.pos += 8;
+    else if (wireType === 2) this.pos += this.varint();
+    else if (wireType === 5) this.pos += 4;
+    else throw new Error(`Unsupported protobuf wire type ${wireType}`);
+  }
+
+  /**
+   * Call a handler with (field number, wire type) for each field of the message
+   */
+  fields(handler) {
+    while (this.pos < this.end) {
+      const key = this.varint();
+      handler(Math.floor(key / 8), key & 0x7);
+    }
+  }
+}
+
+const zigzag = (value) => (value % 2 === 1 ? -(value + 1) / 2 : value / 2);
+
+const decodeValue = (reader) => {
+  let value = null;
+  reader.fields((field, wireType) => {
+    if (field === 1) value = reader.string();
+    else if (field === 3) value = reader.double();
+    else if (field === 5) value = reader.varint();
+    else if (field === 7) value = reader.varint() === 1;
+    else reader.skip(wireType);
+  });
+  return value;
+};
+
+/**
+ * Turn geometry commands into rings of [x, y] vertices
+ */
+const decodeGeometry = (commands) => {
+  const rings = [];
+  let ring = null;
+  let x = 0;
+  let y = 0;
+  let i = 0;
+  while (i < commands.length) {
+    const command = commands[i] & 0x7;
+    const count = commands[i] >> 3;
+    i += 1;
+    if (command === 7) {
+      continue;
+    }
+    for (let n = 0; n < count; n += 1) {
+      x += zigzag(commands[i]);
+      y += zigzag(commands[i + 1]);
+      i += 2;
+      if (command === 1) {
+        ring = [];
+        rings.push(ring);
+      }
+      ring.push([x, y]);
+    }
+  }
+  return rings;
+};
+
+/**
+ * Decode the layers of a vector tile
+ *
+ * @param {ArrayBuffer} buffer - Encoded tile
+ * @returns {Object} - Layers by name, each { extent, features: [{ id, type, rings, properties }] }
+ */
+export const decodeTile = (buffer) => {
+  const layers = {};
+  const tile = new Reader(new Uint8Array(buffer));
+  tile.fields((field, wireType) => {
+    if (field !== 3) {
+      tile.skip(wireType);
+      return;
+    }
+    const reader = tile.message();
+    const layer = { name: '', extent: 4096, features: [] };
+    const keys = [];
+    const values = [];
+    const rawFeatures = [];
+    reader.fields((layerField, layerWireType) => {
+      if (layerField === 1) layer.name = reader.string();
+      else if (layerField === 2) rawFeatures.push(reader.message());
+      else if (layerField === 3) keys.push(reader.string());
+      else if (layerField === 4) values.push(decodeValue(reader.message()));
+      else if (layerField === 5) layer.extent = reader.varint();
+      else reader.skip(layerWireType);
+    });
+
+    // Features refer to the key and value tables, which follow them
+    rawFeatures.forEach((featureReader) => {
+      const feature = { id: null, type: 0, rings: [], properties: {} };
+      featureReader.fields((featureField, featureWireType) => {
+        if (featureField === 1) {
+          feature.id = featureReader.varint();
+        } else if (featureField === 2) {
+          const tags = featureReader.packed();
+          for (let t = 0; t + 1 < tags.length; t += 2) {
+            feature.properties[keys[tags[t]]] = values[tags[t + 1]];
+          }
+        } else if (featureField === 3) {
+          feature.type = featureReader.varint();
+        } else if (featureField === 4) {
+          feature.rings = decodeGeometry(featureReader.packed());
+        } else {
+          featureReader.skip(featureWireType);
+        }
+      });
+      layer.features.push(feature);
+    });
+    layers[layer.name] = layer;
+  });
+  return layers;
+};
+
+/**
+ * Draw the zones layer of a decoded tile on a canvas
+ */
+const drawZones = (canvas, layer) => {
+  const context = canvas.getContext('2d');
+  const scale = TILE_SIZE / layer.extent;
+  layer.features.forEach((feature) => {
+    const color = ZONE_COLORS[feature.properties.type] || ZONE_COLORS.RED;
+    context.fillStyle = color;
+    context.strokeStyle = color;
+    context.lineWidth = 1;
+    context.beginPath();
+    if (feature.type === POLYGON) {
+      feature.rings.forEach((ring) => {
+        ring.forEach(([x, y], index) => {
+          if (index === 0) context.moveTo(x * scale, y * scale);
+          else context.lineTo(x * scale, y * scale);
+        });
+        context.closePath();
+      });
+      context.globalAlpha = 0.3;
+      context.fill();
+      context.globalAlpha = 1;
+      context.stroke();
+    } else if (feature.type === POINT) {
+      const [[x, y]] = feature.rings[0];
+      context.arc(x * scale, y * scale, 3, 0, 2 * Math.PI);
+      context.fill();
+    }
+  });
+};
+
+/**
+ * Create a Google Maps overlay map type drawing the zone vector tiles
+ *
+ * @param {string} urlTemplate - Tile URL with {z}/{x}/{y} placeholders
+ * @returns {Object} - Map type to push onto map.overlayMapTypes
+ */
+export const createZoneTileLayer = (urlTemplate) => ({
+  tileSize: new window.google.maps.Size(TILE_SIZE, TILE_SIZE),
+  name: 'Zones',
+
+  getTile(coord, zoom, ownerDocument) {
+    const canvas = ownerDocument.createElement('canvas');
+    canvas.width = TILE_SIZE;
+    canvas.height = TILE_SIZE;
+
+    const n = 2 ** zoom;
+    if (coord.y < 0 || coord.y >= n) {
+      return canvas;
+    }
+    // Wrap around the antimeridian
+    const x = ((coord.x % n) + n) % n;
+    const url = urlTemplate.replace('{z}', zoom).replace('{x}', x).replace('{y}', coord.y);
+
+    fetch(url)
+      .then((response) => (response.ok ? response.arrayBuffer() : null))
+      .then((buffer) => {
+        const layer = buffer && buffer.byteLength ? decodeTile(buffer).zones : null;
+        if (layer) {
+          drawZones(canvas, layer);
+        }
+      })
+      .catch((error) => console.error('Error loading zone tile:', error));
+
+    return canvas;
+  },
+
+  releaseTile() {},
+});
@@ -0,0 +1,40 @@
+"""
+Gunicorn settings for running the Quick Evac backend in production.
+
+Usage:
+    gunicorn -c gunicorn.conf.py backend.app:app
+
+Every setting can be overridden with the matching GUNICORN_* environment variable.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Threaded workers overlap the I/O-bound Google Maps and Twilio calls. The app derives
+# its admission limits from GUNICORN_THREADS (see backend/config.py), so set the
+# thread count through the variable rather than --threads.
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', '12'))
+
+# Build the app (and its zone index) once in the master, then fork
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+# Recycle workers periodically to bound memory growth, staggered to avoid restarts in lockstep
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '10000'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '1000'))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.environ.get('GUNICORN_ERROR_LOG', '-')
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+def post_worker_init(worker):
+    """Open the worker's ingest log slot so logs left by a crashed worker are replayed right away."""
+    from backend.services.ingest_log import ingest_log
+    ingest_log.start(worker.wsgi)
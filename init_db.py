@@ -5,7 +5,9 @@ Run this script after setting up the application to create test zones.
 
 from backend.utils.helpers import create_app
 from backend.models import db, Zone
+from backend.services.address_service import address_service
 from backend.services.location_service import LocationService
+from backend.services.zone_service import auto_region
 
 def init_db():
     print("Initializing database with sample data...")
@@ -93,8 +95,9 @@ def init_db():
                 latitude=zone_data['latitude'],
                 longitude=zone_data['longitude'],
                 radius=zone_data['radius'],
-                address=address,
-                description=zone_data['description']
+                address_id=address_service.intern(address),
+                description=zone_data['description'],
+                region=auto_region(zone_data['latitude'], zone_data['longitude'])
             )
             
             db.session.add(zone)
@@ -0,0 +1,147 @@
+"""
+Script to upgrade an existing database to the current schema in place.
+Run it once after deploying, before starting the web workers. It is safe to
+run again: every step only touches what is still missing.
+
+It creates the new tables (addresses, ingest_checkpoints), adds the new
+columns and indexes of zones and user_locations, and backfills them:
+address texts are interned into addresses, phone numbers get their E.164 form
+and key, and zones get their automatic region. The old address text columns
+are left in place (unused) so the upgrade never rewrites a table.
+"""
+
+from sqlalchemy import inspect, text
+from backend.utils.helpers import create_app
+from backend.models import db, Address, UserLocation, Zone
+from backend.models.address import address_hash
+from backend.services.zone_service import auto_region
+from backend.utils.phone import normalize_phone_numbers, phone_key
+
+# Rows backfilled per statement batch
+BATCH_SIZE = 5000
+
+def _add_missing_columns(connection, model):
+    """Add the model's columns (and their indexes) that the existing table lacks."""
+    table = model.__table__
+    inspector = inspect(connection)
+    existing = {column['name'] for column in inspector.get_columns(table.name)}
+    added = []
+
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        definition = f"{column.name} {column.type.compile(dialect=connection.dialect)}"
+        for foreign_key in column.foreign_keys:
+            definition += f" REFERENCES {foreign_key.column.table.name} ({foreign_key.column.name})"
+        connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {definition}"))
+        added.append(column.name)
+
+    indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name not in indexes:
+            index.create(connection)
+
+    return added
+
+def _backfill_addresses(connection, table_name):
+    """Point rows with a legacy address text at their interned address."""
+    columns = {column['name'] for column in inspect(connection).get_columns(table_name)}
+    if 'address' not in columns:
+        return 0
+
+    texts = {
+        value[:255] for value, in connection.execute(text(
+            f"SELECT DISTINCT address FROM {table_name} WHERE address IS NOT NULL AND address_id IS NULL"
+        ))
+        if value
+    }
+    known = {
+        (row.text_hash, row.text)
+        for row in connection.execute(Address.__table__.select().with_only_columns(
+            Address.text_hash, Address.text
+        ))
+    }
+    new = [
+        {'text_hash': address_hash(value), 'text': value}
+        for value in texts if (address_hash(value), value) not in known
+    ]
+    for i in range(0, len(new), BATCH_SIZE):
+        connection.execute(Address.__table__.insert(), new[i:i + BATCH_SIZE])
+
+    # One correlated update, with a temporary index so each lookup is a seek
+    connection.execute(text("CREATE INDEX IF NOT EXISTS tmp_addresses_text ON addresses (text)"))
+    result = connection.execute(text(
+        f"UPDATE {table_name} SET address_id = "
+        f"(SELECT addresses.id FROM addresses WHERE addresses.text = substr({table_name}.address, 1, 255)) "
+        f"WHERE address IS NOT NULL AND address != '' AND address_id IS NULL"
+    ))
+    connection.execute(text("DROP INDEX tmp_addresses_text"))
+    return result.rowcount
+
+def _backfill_phones(connection, region):
+    """Store the E.164 form and key of location phone numbers that lack them."""
+    table = UserLocation.__table__
+    updated = 0
+    last_id = 0
+
+    while True:
+        rows = connection.execute(
+            table.select()
+            .with_only_columns(table.c.id, table.c.phone_number)
+            .where(table.c.id > last_id, table.c.phone_e164.is_(None))
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return updated
+        last_id = rows[-1].id
+
+        values = [
+            {'row_id': row.id, 'e164': e164, 'key': phone_key(e164)}
+            for row, e164 in zip(rows, normalize_phone_numbers([row.phone_number for row in rows], region))
+            if e164
+        ]
+        if values:
+            connection.execute(
+                text("UPDATE user_locations SET phone_e164 = :e164, phone_key = :key WHERE id = :row_id"), values
+            )
+        updated += len(values)
+
+def _backfill_regions(connection):
+    """Give zones without a region their automatic one."""
+    table = Zone.__table__
+    rows = connection.execute(
+        table.select().with_only_columns(table.c.id, table.c.latitude, table.c.longitude).where(table.c.region.is_(None))
+    ).all()
+    if rows:
+        connection.execute(
+            text("UPDATE zones SET region = :region WHERE id = :zone_id"),
+            [{'zone_id': row.id, 'region': auto_region(row.latitude, row.longitude)} for row in rows]
+        )
+    return len(rows)
+
+def migrate_db():
+    print("Migrating database to the current schema...")
+
+    # The zone index cannot load until the zone columns exist
+    app = create_app(test_config={'PRELOAD_ZONE_INDEX': False})
+
+    with app.app_context():
+        # New tables only; existing tables are altered below
+        db.create_all()
+
+        with db.engine.begin() as connection:
+            for model in (Zone, UserLocation):
+                added = _add_missing_columns(connection, model)
+                if added:
+                    print(f"  Added {model.__tablename__} columns: {', '.join(added)}")
+
+            for table_name in ('zones', 'user_locations'):
+                print(f"  Linked {_backfill_addresses(connection, table_name)} {table_name} rows to addresses")
+            print(f"  Normalized {_backfill_phones(connection, app.config['DEFAULT_PHONE_REGION'])} phone numbers")
+            print(f"  Assigned regions to {_backfill_regions(connection)} zones")
+
+    print("Database migration complete!")
+
+if __name__ == "__main__":
+    migrate_db()
@@ -0,0 +1,33 @@
+"""
+Script to compact the user location history.
+Run it once (e.g. from cron) or with --loop to keep running retention passes
+in the background, separately from the web workers. This is the only place
+retention runs: create_app never starts a RetentionWorker.
+"""
+
+import sys
+from backend.utils.helpers import create_app
+from backend.services.retention_service import RetentionService, RetentionWorker
+
+def run_retention(loop=False):
+    app = create_app()
+    
+    if loop:
+        print(f"Running retention every {app.config['RETENTION_INTERVAL']} seconds...")
+        worker = RetentionWorker(app)
+        worker.start()
+        try:
+            worker.join()
+        except KeyboardInterrupt:
+            worker.stop()
+        return
+    
+    with app.app_context():
+        stats = RetentionService().compact()
+        print(f"Scanned {stats['scanned']} rows: "
+              f"{stats['deduplicated']} duplicates dropped, "
+              f"{stats['downsampled']} downsampled, "
+              f"{stats['archived']} archived")
+
+if __name__ == "__main__":
+    run_retention(loop='--loop' in sys.argv)
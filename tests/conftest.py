@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from backend.models import db, Zone
+from backend.services.zone_index import zone_index
+from backend.utils.helpers import create_app
+
+# (name, type, latitude, longitude, radius in km) of the zones every test starts with
+ZONES = [
+    ('Mission Fire', 'RED', 37.7749, -122.4194, 1.0),
+    ('North Beach Smoke', 'ORANGE', 37.8083, -122.4156, 1.2),
+    ('Golden Gate Park Shelter', 'GREEN', 37.7694, -122.4862, 1.5),
+]
+
+@pytest.fixture(scope='session')
+def app():
+    """Application on a temporary SQLite database seeded with ZONES."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    feed_dir = tempfile.mkdtemp()
+    app = create_app('development', {
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'GOOGLE_MAPS_API_KEY': 'test-key',
+        'TWILIO_ACCOUNT_SID': 'test-sid',
+        'TWILIO_AUTH_TOKEN': 'test-token',
+        'TWILIO_PHONE_NUMBER': '+14155550000',
+        'CHANGE_FEED_DIR': feed_dir,
+    })
+    with app.app_context():
+        for name, zone_type, latitude, longitude, radius in ZONES:
+            db.session.add(Zone(name=name, type=zone_type, latitude=latitude, longitude=longitude, radius=radius))
+        db.session.commit()
+    # Module-level services outlive the app, drop anything cached from another database
+    zone_index.invalidate()
+
+    yield app
+
+    os.remove(path)
+    shutil.rmtree(feed_dir)
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def zones(app):
+    """Seeded zones by type."""
+    with app.app_context():
+        return {zone.type: zone.to_dict() for zone in Zone.query.all()}
@@ -0,0 +1,32 @@
+"""
+Tests of address interning in backend/services/address_service.py.
+"""
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from backend.models import db, Address
+from backend.models.address import address_hash
+from backend.services.address_service import AddressService
+
+def test_intern_reuses_rows_and_survives_a_cold_cache(app):
+    service = AddressService()
+    with app.app_context():
+        first = service.intern('10 Intern St')
+        db.session.commit()
+        assert service.intern('10 Intern St') == first
+        assert AddressService().intern('10 Intern St') == first
+        db.session.rollback()
+
+def test_unrelated_integrity_error_is_not_taken_for_an_address_race(app):
+    service = AddressService()
+    with app.app_context():
+        service.intern('11 Taken St')
+        db.session.commit()
+        # A pending duplicate of the caller's own, unrelated to the address being interned
+        db.session.add(Address(text_hash=address_hash('11 Taken St'), text='11 Taken St'))
+        # Without autoflush, the address lookup does not flush it first
+        with db.session.no_autoflush, pytest.raises(IntegrityError):
+            service.intern('12 Fresh St')
+        db.session.rollback()
+        assert db.session.query(Address).filter_by(text='12 Fresh St').count() == 0
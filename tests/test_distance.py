@@ -0,0 +1,103 @@
+"""
+Tests of the approximate-then-exact containment kernel in backend/utils/distance.py.
+
+Points are placed just inside, on and just outside zone edges, where the flat
+bounds are closest to failing, and every decision is compared with the plain
+exact formula.
+"""
+
+import math
+import random
+
+import pytest
+
+from backend.utils.distance import (
+    EARTH_RADIUS_KM, circle_fence, haversine, in_circle, in_circle_batch, np, vincenty
+)
+
+CENTERS = [
+    (0.0, 0.0),
+    (37.7749, -122.4194),
+    (-33.8688, 151.2093),
+    (64.1466, -21.9426),
+    (78.2232, 15.6267),
+    (-89.5, 45.0),
+    (12.5, 179.999),
+]
+RADII = [0.05, 1.0, 25.0, 500.0]
+OFFSETS = [-1e-3, -1e-6, -1e-9, 0.0, 1e-9, 1e-6, 1e-3]
+
+EXACT = {'haversine': haversine, 'vincenty': vincenty}
+
+def destination(latitude, longitude, bearing, distance):
+    """Point at a distance (km) and bearing (radians) from a start point on the sphere."""
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    angle = distance / EARTH_RADIUS_KM
+    lat2 = math.asin(math.sin(lat1) * math.cos(angle) + math.cos(lat1) * math.sin(angle) * math.cos(bearing))
+    lon2 = lon1 + math.atan2(
+        math.sin(bearing) * math.sin(angle) * math.cos(lat1),
+        math.cos(angle) - math.sin(lat1) * math.sin(lat2)
+    )
+    return math.degrees(lat2), (math.degrees(lon2) + 540) % 360 - 180
+
+def boundary_points(latitude, longitude, radius, rng, bearings=24):
+    """Points around a circle's edge, at small relative offsets of the radius."""
+    points = []
+    for i in range(bearings):
+        bearing = 2 * math.pi * i / bearings + rng.uniform(0, 0.1)
+        for offset in OFFSETS:
+            points.append(destination(latitude, longitude, bearing, radius * (1 + offset)))
+    return points
+
+def edge_cases():
+    rng = random.Random(20240601)
+    for latitude, longitude in CENTERS:
+        for radius in RADII:
+            yield latitude, longitude, radius, boundary_points(latitude, longitude, radius, rng)
+
+@pytest.mark.parametrize('method', ['haversine', 'vincenty'])
+def test_in_circle_matches_exact_distance_at_the_edge(method):
+    exact = EXACT[method]
+    checked = 0
+    for latitude, longitude, radius, points in edge_cases():
+        fence = circle_fence(latitude, longitude, radius, method)
+        for point in points:
+            expected = exact(latitude, longitude, *point) <= radius
+            assert in_circle(fence, *point) == expected, (method, latitude, longitude, radius, point)
+            checked += 1
+    assert checked == len(CENTERS) * len(RADII) * 24 * len(OFFSETS)
+
+@pytest.mark.parametrize('method', ['haversine', 'vincenty'])
+def test_in_circle_matches_exact_distance_near_the_edge(method):
+    # Random points in a ring around the edge, for both method's bounds
+    exact = EXACT[method]
+    rng = random.Random(7)
+    for _ in range(200):
+        latitude, longitude = rng.uniform(-85, 85), rng.uniform(-180, 180)
+        radius = 10 ** rng.uniform(-1.5, 2.5)
+        fence = circle_fence(latitude, longitude, radius, method)
+        for _ in range(50):
+            point = destination(latitude, longitude, rng.uniform(0, 2 * math.pi), radius * rng.uniform(0.99, 1.01))
+            assert in_circle(fence, *point) == (exact(latitude, longitude, *point) <= radius)
+
+def test_flat_bounds_settle_most_points():
+    # Only points within the error margin of the radius reach the exact formula
+    fence = circle_fence(37.7749, -122.4194, 1.0)
+    assert math.sqrt(fence.inner_sq) * EARTH_RADIUS_KM > 0.999
+    assert math.sqrt(fence.outer_sq) * EARTH_RADIUS_KM < 1.001
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        circle_fence(0.0, 0.0, 1.0, 'manhattan')
+
+@pytest.mark.skipif(np is None, reason='numpy is not installed')
+@pytest.mark.parametrize('method', ['haversine', 'vincenty'])
+def test_in_circle_batch_matches_scalar_kernel(method):
+    exact = EXACT[method]
+    for latitude, longitude, radius, points in edge_cases():
+        # Points exactly on the edge can round either way between the scalar and NumPy formulas
+        points = [point for point in points if abs(exact(latitude, longitude, *point) - radius) > 1e-12 * radius]
+        fence = circle_fence(latitude, longitude, radius, method)
+        latitudes, longitudes = zip(*points)
+        expected = [in_circle(fence, *point) for point in points]
+        assert in_circle_batch(fence, latitudes, longitudes).tolist() == expected
@@ -0,0 +1,143 @@
+"""
+Tests of the ingest log's crash recovery.
+
+A "crash" drops a log without closing it cleanly: its slot lock is released
+and its segment may end in a torn frame. A new log in the same directory must
+replay every complete record exactly once.
+"""
+
+import fcntl
+import os
+from datetime import datetime
+
+import pytest
+
+import backend.services.ingest_log as ingest_module
+from backend.models import db, IngestCheckpoint, UserLocation
+from backend.services.ingest_log import IngestLog, _read_marker, _segments
+
+def record(i, phone):
+    return {
+        'phone_number': phone,
+        'phone_e164': phone,
+        'phone_key': int(phone[1:]),
+        'latitude': 37.7749,
+        'longitude': -122.4194,
+        'address': f"{i} Mission St",
+        'in_danger_zone': True,
+        'zone_id': None,
+        'created_at': datetime.utcnow().isoformat(),
+    }
+
+def crash(log):
+    """Drop a log as a killed worker would: only its slot lock goes away."""
+    log._file.close()
+    fcntl.flock(log._lock_file, fcntl.LOCK_UN)
+    log._lock_file.close()
+
+def saved(app, phone):
+    with app.app_context():
+        return UserLocation.query.filter_by(phone_e164=phone).count()
+
+@pytest.fixture
+def log_dir(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'INGEST_LOG_DIR', str(tmp_path))
+    # The tests drive replay themselves
+    monkeypatch.setattr(ingest_module.IngestApplier, 'start', lambda self: None)
+    yield tmp_path
+    with app.app_context():
+        IngestCheckpoint.query.delete()
+        db.session.commit()
+
+def test_replay_after_crash_skips_torn_frame(app, log_dir):
+    phone = '+14155550301'
+    first = IngestLog()
+    with app.app_context():
+        for i in range(5):
+            first.append(record(i, phone))
+    # A write cut short by the crash
+    with open(os.path.join(first._slot_dir, '0000000000.seg'), 'ab') as f:
+        f.write(ingest_module.FRAME.pack(100, 0) + b'{"phone')
+    crash(first)
+
+    second = IngestLog()
+    second.start(app)
+    assert second._slot == 'slot-0'
+    # The writer never appends after a torn frame
+    assert second._segment == 1
+    with app.app_context():
+        second.append(record(5, phone))
+        assert second.apply_pending() == 6
+        assert second.apply_pending() == 0
+    assert saved(app, phone) == 6
+    assert _segments(str(log_dir / 'slot-0')) == [1]
+    assert _read_marker(str(log_dir / 'slot-0')) == 1
+    crash(second)
+
+def test_crash_between_checkpoint_and_removal_applies_once(app, log_dir, monkeypatch):
+    phone = '+14155550302'
+    first = IngestLog()
+    with app.app_context():
+        for i in range(3):
+            first.append(record(i, phone))
+    crash(first)
+
+    # The applier dies after committing the checkpoint but before removing the segment
+    second = IngestLog()
+    second.start(app)
+    with monkeypatch.context() as patch, app.app_context():
+        patch.setattr(ingest_module.os, 'remove', lambda path: None)
+        assert second.apply_pending() == 3
+    crash(second)
+
+    third = IngestLog()
+    third.start(app)
+    assert third._segment == 2
+    with app.app_context():
+        assert third.apply_pending() == 0
+    assert saved(app, phone) == 3
+    assert _segments(str(log_dir / 'slot-0')) == [2]
+    crash(third)
+
+def test_open_does_not_need_the_database(app, log_dir, monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise RuntimeError('database is down')
+    monkeypatch.setattr(db.session, 'get', unavailable)
+
+    log = IngestLog()
+    log.start(app)
+    with app.app_context():
+        log.append(record(0, '+14155550303'))
+        with pytest.raises(RuntimeError):
+            log.apply_pending()
+    assert log.snapshot()['appended'] == 1
+    crash(log)
+
+def test_failed_open_releases_the_slot(app, log_dir, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(ingest_module, '_segment_path', lambda slot_dir, number: str(log_dir / 'missing' / 'x.seg'))
+        with pytest.raises(FileNotFoundError):
+            IngestLog().start(app)
+
+    log = IngestLog()
+    log.start(app)
+    assert log._slot == 'slot-0'
+    assert sorted(os.listdir(log_dir)) == ['slot-0']
+    crash(log)
+
+def test_checkpoint_ahead_of_wiped_slot_replays_new_segments(app, log_dir):
+    phone = '+14155550304'
+    with app.app_context():
+        db.session.add(IngestCheckpoint(slot='slot-0', segment=7, offset=0))
+        db.session.commit()
+
+    log = IngestLog()
+    log.start(app)
+    assert log._segment == 0
+    with app.app_context():
+        log.append(record(0, phone))
+        log._roll()
+        assert log.apply_pending() == 1
+        assert db.session.get(IngestCheckpoint, 'slot-0').segment == 1
+    assert saved(app, phone) == 1
+    crash(log)
@@ -0,0 +1,78 @@
+"""
+Tests of the occupancy counters' reconciliation with the database.
+"""
+
+import threading
+import time
+
+from sqlalchemy import event
+
+from backend.models import db
+from backend.services.occupancy_service import OccupancyTracker
+
+def during_next_query(action):
+    """Run an action once, when the next SQL statement is about to execute."""
+    done = []
+    def hook(*args):
+        if not done:
+            done.append(True)
+            action()
+    event.listen(db.engine, 'before_cursor_execute', hook)
+    return lambda: event.remove(db.engine, 'before_cursor_execute', hook)
+
+def test_pings_recorded_during_a_rebuild_are_kept(app):
+    tracker = OccupancyTracker()
+    with app.app_context():
+        tracker.rebuild()
+
+        # A ping handled while the rebuild queries; its row is not in the database yet
+        remove = during_next_query(lambda: tracker.record(9001, 42, 37.7749, -122.4194))
+        tracker.rebuild()
+        remove()
+
+        assert tracker.zone_occupancy(42) == 1
+        assert sum(tracker._cell_counts[tracker._precisions[0]].values()) >= 1
+
+def test_zones_deleted_during_a_rebuild_stay_forgotten(app):
+    tracker = OccupancyTracker()
+    with app.app_context():
+        tracker.rebuild()
+
+        def ping_then_delete():
+            tracker.record(9002, 43, 37.7749, -122.4194)
+            tracker.forget_zone(43)
+        remove = during_next_query(ping_then_delete)
+        tracker.rebuild()
+        remove()
+
+        assert tracker.zone_occupancy(43) == 0
+        assert tracker._phones[9002][0] is None
+
+def test_reconciliation_runs_in_the_background(app, monkeypatch):
+    tracker = OccupancyTracker()
+    monkeypatch.setitem(app.config, 'OCCUPANCY_RECONCILE_INTERVAL', 1)
+    with app.app_context():
+        tracker.rebuild()
+        tracker.record(9003, 44, 37.7749, -122.4194)
+
+        started = threading.Event()
+        release = threading.Event()
+        def block(*args):
+            if threading.current_thread().name == 'occupancy-reconcile':
+                started.set()
+                release.wait(5)
+        event.listen(db.engine, 'before_cursor_execute', block)
+
+        tracker._built_at -= 10
+        # Served from the live counters while the reconciliation queries
+        assert tracker.zone_occupancy(44) == 1
+        assert started.wait(5)
+        tracker.record(9003, 45, 37.7749, -122.4194)
+        release.set()
+
+        deadline = time.monotonic() + 5
+        while tracker._rebuild_lock.locked() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        event.remove(db.engine, 'before_cursor_execute', block)
+        assert tracker.zone_occupancy(44) == 0
+        assert tracker.zone_occupancy(45) == 1
@@ -0,0 +1,38 @@
+"""
+Tests of phone number normalization in backend/utils/phone.py.
+
+National numbers whose trunk form looks like an international dialing prefix
+('011', '00') must stay national in regions that do not dial that prefix.
+"""
+
+import pytest
+
+from backend.utils.phone import normalize_phone_number
+
+@pytest.mark.parametrize('number, region, expected', [
+    # Trunk-prefixed national numbers starting like '011'
+    ('0117 496 0123', 'GB', '+441174960123'),
+    ('0113 496 0000', 'GB', '+441134960000'),
+    ('011 2345 6789', 'IN', '+911123456789'),
+    # Each region's own international prefix
+    ('011 44 20 7946 0018', 'US', '+442079460018'),
+    ('00 44 20 7946 0018', 'GB', '+442079460018'),
+    ('00 1 415 555 0100', 'DE', '+14155550100'),
+    ('0049 30 1234567', 'DE', '+49301234567'),
+    # '00' is not an international prefix in NANP regions
+    ('00 44 20 7946 0018', 'US', None),
+    # Plain national and '+' forms
+    ('(415) 555-0100', 'US', '+14155550100'),
+    ('1 415 555 0100', 'CA', '+14155550100'),
+    ('020 7946 0018', 'gb', '+442079460018'),
+    ('+44 20 7946 0018', 'US', '+442079460018'),
+])
+def test_normalize(number, region, expected):
+    assert normalize_phone_number(number, region) == expected
+
+@pytest.mark.parametrize('region', [None, '', 'XX'])
+def test_without_known_region_only_international_forms_parse(region):
+    assert normalize_phone_number('+44 20 7946 0018', region) == '+442079460018'
+    assert normalize_phone_number('011 44 20 7946 0018', region) == '+442079460018'
+    assert normalize_phone_number('00 44 20 7946 0018', region) == '+442079460018'
+    assert normalize_phone_number('020 7946 0018', region) is None
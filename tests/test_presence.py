@@ -0,0 +1,73 @@
+"""
+Tests of the zone presence endpoint and the presence index behind it.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.models import db, UserLocation
+from backend.services.presence_index import presence_index
+
+@pytest.fixture
+def pings(app, zones):
+    """One recent and one ten-day-old ping inside the RED zone."""
+    red = zones['RED']
+    now = datetime.utcnow()
+    with app.app_context():
+        rows = [
+            UserLocation(phone_number=phone, phone_e164=phone, phone_key=int(phone[1:]),
+                         latitude=red['latitude'], longitude=red['longitude'], created_at=created_at)
+            for phone, created_at in (('+14155550401', now - timedelta(minutes=5)),
+                                      ('+14155550402', now - timedelta(days=10)))
+        ]
+        db.session.add_all(rows)
+        db.session.commit()
+        ids = [row.id for row in rows]
+    yield red
+    with app.app_context():
+        UserLocation.query.filter(UserLocation.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+def presence(client, zone_id, **params):
+    return client.get(f'/api/zone/{zone_id}/presence', query_string=params)
+
+def test_recent_window_with_utc_offsets(client, pings):
+    since = (datetime.utcnow() - timedelta(hours=1)).isoformat()
+    for suffix in ('Z', '+00:00'):
+        response = presence(client, pings['id'], since=since + suffix)
+        assert response.status_code == 200, response.json
+        assert '+14155550401' in response.json['phones']
+        assert '+14155550402' not in response.json['phones']
+
+    # 14:00+02:00 is 12:00 UTC
+    response = presence(client, pings['id'], since='2024-05-01T14:00:00+02:00', until='2024-05-01T15:00:00+02:00')
+    assert response.json['since'] == '2024-05-01T12:00:00'
+
+def test_empty_or_reversed_window_is_rejected(client, pings):
+    response = presence(client, pings['id'], since='2024-05-02T00:00:00', until='2024-05-01T00:00:00')
+    assert response.status_code == 400
+    assert presence(client, pings['id'], since='2024-05-01T00:00:00', until='2024-05-01T00:00:00').status_code == 400
+
+def test_window_older_than_retention_reads_stored_pings(client, pings):
+    since = (datetime.utcnow() - timedelta(days=11)).isoformat()
+    response = presence(client, pings['id'], since=since)
+    assert response.status_code == 200
+    assert {'+14155550401', '+14155550402'} <= set(response.json['phones'])
+    assert response.json['index']['scanned'] >= 1
+
+def test_catch_up_rereads_rows_committed_out_of_id_order(app, pings):
+    with app.app_context():
+        presence_index.catch_up()
+        # Later ids were already read when a slower concurrent transaction commits its row
+        presence_index._watermark += 10
+        row = UserLocation(phone_number='+14155550403', phone_e164='+14155550403', phone_key=14155550403,
+                           latitude=pings['latitude'], longitude=pings['longitude'])
+        db.session.add(row)
+        db.session.commit()
+        assert row.id < presence_index._watermark
+        result = presence_index.query(pings['latitude'], pings['longitude'], pings['radius'],
+                                      datetime.utcnow() - timedelta(hours=1), datetime.utcnow())
+        db.session.delete(row)
+        db.session.commit()
+    assert 14155550403 in result['phone_keys']
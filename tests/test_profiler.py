@@ -0,0 +1,65 @@
+"""
+Tests of the admin token gating the profiler endpoints and per-request profiling.
+"""
+
+import pytest
+
+import backend.routes.debug_routes as debug_routes
+from backend.routes.debug_routes import TOKEN_HEADER
+from backend.services.profiler_service import profiler
+
+TOKEN = 'profiler-secret'
+
+@pytest.fixture
+def attached(monkeypatch):
+    """Labels of the requests the profiler was attached to (without sampling them)."""
+    labels = []
+    monkeypatch.setattr(debug_routes.profiler, 'attach', labels.append)
+    monkeypatch.setattr(debug_routes.profiler, 'detach', lambda: None)
+    return labels
+
+@pytest.fixture
+def token(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'PROFILER_TOKEN', TOKEN)
+    yield TOKEN
+    with app.app_context():
+        profiler.disable()
+
+def test_endpoints_are_hidden_without_a_configured_token(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'PROFILER_TOKEN', None)
+    for method in ('get', 'post', 'delete'):
+        response = getattr(client, method)('/debug/profile', headers={TOKEN_HEADER: 'anything'})
+        assert response.status_code == 404
+        assert response.json['success'] is False
+
+@pytest.mark.parametrize('headers', [{}, {TOKEN_HEADER: ''}, {TOKEN_HEADER: 'wrong'}, {TOKEN_HEADER: TOKEN + 'x'}])
+def test_endpoints_reject_a_missing_or_wrong_token(client, token, headers):
+    for method in ('get', 'post', 'delete'):
+        response = getattr(client, method)('/debug/profile', headers=headers)
+        assert response.status_code == 403
+
+def test_window_is_opened_and_closed_with_the_token(app, client, token):
+    headers = {TOKEN_HEADER: token}
+    assert client.post('/debug/profile', json={'seconds': 'soon'}, headers=headers).status_code == 400
+
+    response = client.post('/debug/profile', json={'seconds': 5, 'path': '/api/zone'}, headers=headers)
+    assert response.status_code == 200, response.json
+    assert profiler.wants('/api/zone/1')
+    assert not profiler.wants('/api/location/check')
+
+    assert client.get('/debug/profile', headers=headers).mimetype == 'text/plain'
+    assert client.delete('/debug/profile', headers=headers).status_code == 200
+    assert not profiler.wants('/api/zone/1')
+
+def test_only_requests_with_the_right_token_are_profiled(client, token, attached):
+    client.get('/api/zone/')
+    client.get('/api/zone/', headers={TOKEN_HEADER: 'wrong'})
+    assert attached == []
+
+    client.get('/api/zone/', headers={TOKEN_HEADER: token})
+    assert attached == ['GET /api/zone/']
+
+def test_token_is_ignored_when_profiling_is_off(app, client, attached, monkeypatch):
+    monkeypatch.setitem(app.config, 'PROFILER_TOKEN', '')
+    client.get('/api/zone/', headers={TOKEN_HEADER: ''})
+    assert attached == []
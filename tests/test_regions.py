@@ -0,0 +1,89 @@
+"""
+Tests of the regional zone index: routing coordinates to regions and evicting
+regions over the ZONE_REGION_CACHE_ZONES budget.
+
+The zones here have explicit region keys, so the regions and their zone
+counts do not depend on the other zones in the database.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.models import db, Zone
+from backend.services.zone_index import RegionalZoneIndex, zone_index
+
+# Geohash cells at the default precision (3) have edges at multiples of
+# 1.40625 degrees; -120.9375 is one, east of Sacramento and away from the other test zones
+CELL_EDGE_LON = -120.9375
+FOOTHILLS = (38.5, CELL_EDGE_LON - 0.01)
+NEW_YORK = (40.7128, -74.0060)
+
+@pytest.fixture
+def regions(app):
+    """Two single-zone regions far apart; returns their zone IDs by region key."""
+    with app.app_context():
+        zones = {
+            'test-foothills': Zone(name='Foothills Fire', type='RED', latitude=FOOTHILLS[0], longitude=FOOTHILLS[1],
+                                    radius=5.0, region='test-foothills'),
+            'test-ny': Zone(name='Lower Manhattan', type='ORANGE', latitude=NEW_YORK[0], longitude=NEW_YORK[1],
+                            radius=2.0, region='test-ny'),
+        }
+        db.session.add_all(zones.values())
+        db.session.commit()
+        ids = {key: zone.id for key, zone in zones.items()}
+    zone_index.invalidate()
+    yield ids
+    with app.app_context():
+        Zone.query.filter(Zone.region.like('test-%')).delete(synchronize_session=False)
+        db.session.commit()
+    zone_index.invalidate()
+
+def test_coordinates_are_routed_to_the_regions_that_can_contain_them(app, regions):
+    index = RegionalZoneIndex()
+    # East of the cell edge, but within the zone centered just west of it
+    across = (FOOTHILLS[0], CELL_EDGE_LON + 0.01)
+    with app.app_context():
+        assert 'test-foothills' in index.regions_at(*FOOTHILLS)
+        assert 'test-foothills' in index.regions_at(*across)
+        assert 'test-ny' not in index.regions_at(*across)
+        assert [zone.id for zone in index.zones_at(*across)] == [regions['test-foothills']]
+
+        assert index.regions_at(*NEW_YORK) == ('test-ny',)
+        assert [zone.id for zone in index.zones_at(*NEW_YORK)] == [regions['test-ny']]
+        # Routing only loaded the regions that were asked for
+        assert sorted(index.snapshot()['loaded_regions']) == ['test-foothills', 'test-ny']
+
+def test_least_recently_used_region_is_evicted_and_reloaded(app, regions, monkeypatch):
+    monkeypatch.setitem(app.config, 'ZONE_REGION_CACHE_ZONES', 1)
+    index = RegionalZoneIndex()
+    with app.app_context():
+        index.zones_at(*FOOTHILLS)
+        index.zones_at(*NEW_YORK)
+        snapshot = index.snapshot()
+        assert snapshot['loaded_regions'] == ['test-ny']
+        assert snapshot['loaded_zones'] == 1
+        assert snapshot['evictions'] == 1
+
+        # The evicted region loads again on its next lookup
+        assert [zone.id for zone in index.zones_at(*FOOTHILLS)] == [regions['test-foothills']]
+        snapshot = index.snapshot()
+        assert snapshot['loaded_regions'] == ['test-foothills']
+        assert snapshot['loads'] == 3
+        assert snapshot['evictions'] == 2
+
+def test_regions_with_pending_transitions_stay_loaded(app, regions, monkeypatch):
+    monkeypatch.setitem(app.config, 'ZONE_REGION_CACHE_ZONES', 1)
+    with app.app_context():
+        zone = db.session.get(Zone, regions['test-foothills'])
+        zone.active_until = datetime.utcnow() + timedelta(hours=1)
+        db.session.commit()
+
+    index = RegionalZoneIndex()
+    with app.app_context():
+        index.zones_at(*FOOTHILLS)
+        index.zones_at(*NEW_YORK)
+        snapshot = index.snapshot()
+        # The expiry must fire on time, so the foothills region is kept over the budget
+        assert snapshot['loaded_regions'] == ['test-foothills', 'test-ny']
+        assert 'evictions' not in snapshot
@@ -0,0 +1,78 @@
+"""
+Tests of the history retention pass: deduplication, downsampling and archiving.
+
+Rows are created at fixed times before NOW with the default settings:
+deduplicated after 60 minutes, downsampled to 15 minute buckets after 24
+hours and archived after 30 days.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.models import db, UserLocation
+from backend.services.address_service import address_service
+from backend.services.retention_service import RetentionService, scan_archive
+
+NOW = datetime(2024, 1, 3)
+MOVING = 14155550701
+ARCHIVED = 14155550702
+
+@pytest.fixture
+def history(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'RETENTION_ARCHIVE_DIR', str(tmp_path))
+    # Several chunks, without pausing between them
+    monkeypatch.setitem(app.config, 'RETENTION_CHUNK_SIZE', 4)
+    monkeypatch.setitem(app.config, 'RETENTION_CHUNK_PAUSE', 0)
+    with app.app_context():
+        # The pass walks the whole table
+        UserLocation.query.delete()
+        db.session.commit()
+    yield tmp_path
+    with app.app_context():
+        UserLocation.query.delete()
+        db.session.commit()
+
+def add(phone_key, age, latitude, longitude, address_id=None):
+    db.session.add(UserLocation(
+        phone_number=f"+{phone_key}", phone_e164=f"+{phone_key}", phone_key=phone_key,
+        latitude=latitude, longitude=longitude, address_id=address_id,
+        in_danger_zone=False, zone_id=None, created_at=NOW - age
+    ))
+
+def test_compact_dedups_downsamples_and_archives(app, history):
+    with app.app_context():
+        address_id = address_service.intern('1 Archive Way')
+        # Oldest first, as rows are inserted in time order
+        add(ARCHIVED, timedelta(days=40), 37.70, -122.40, address_id)
+        add(ARCHIVED, timedelta(days=40, minutes=-1), 37.70, -122.40, address_id)  # duplicate
+        add(ARCHIVED, timedelta(days=40, minutes=-30), 37.71, -122.41)
+        add(MOVING, timedelta(days=2), 37.80, -122.40)
+        add(MOVING, timedelta(days=2, minutes=-1), 37.80, -122.40)  # duplicate
+        add(MOVING, timedelta(days=2, minutes=-2), 37.81, -122.40)  # same 15 minute bucket
+        add(MOVING, timedelta(days=2, minutes=-20), 37.81, -122.40)
+        add(MOVING, timedelta(hours=2), 37.81, -122.40)  # duplicate of the previous kept row
+        add(MOVING, timedelta(hours=2, minutes=-1), 37.82, -122.40)  # recent enough to keep every point
+        add(MOVING, timedelta(hours=1, minutes=-50), 37.83, -122.40)  # not yet eligible
+        db.session.commit()
+
+        stats = RetentionService().compact(now=NOW)
+
+        assert stats == {'scanned': 9, 'deduplicated': 3, 'downsampled': 1, 'archived': 2}
+        kept = UserLocation.query.filter_by(phone_key=MOVING).order_by(UserLocation.id).all()
+        assert [row.created_at for row in kept] == [
+            NOW - timedelta(days=2), NOW - timedelta(days=2, minutes=-20),
+            NOW - timedelta(hours=2, minutes=-1), NOW - timedelta(hours=1, minutes=-50),
+        ]
+        assert UserLocation.query.filter_by(phone_key=ARCHIVED).count() == 0
+
+        archived = list(scan_archive(str(history), phone_key=ARCHIVED))
+        assert [(row['latitude'], row['address'], row['created_at']) for row in archived] == [
+            (37.70, '1 Archive Way', NOW - timedelta(days=40)),
+            (37.71, None, NOW - timedelta(days=40, minutes=-30)),
+        ]
+        assert list(scan_archive(str(history), start=NOW - timedelta(days=40, minutes=-10))) == archived[1:]
+
+        # A second pass finds nothing more to do
+        assert RetentionService().compact(now=NOW)['archived'] == 0
+        assert len(list(scan_archive(str(history)))) == 2
@@ -0,0 +1,96 @@
+"""
+Tests of the MessagePack encodings negotiated by the zone and location APIs.
+
+Both binary layouts, records (one array per item, in ``fields`` order) and
+columns (one array per field), must decode to exactly what the JSON payload
+holds.
+"""
+
+from datetime import datetime
+
+import pytest
+
+from backend.utils.serializers import COLUMNS_MIMETYPE, MSGPACK_MIMETYPE
+
+msgpack = pytest.importorskip('msgpack')
+
+RECORDS = {'Accept': MSGPACK_MIMETYPE}
+COLUMNS = {'Accept': COLUMNS_MIMETYPE}
+
+def as_json(value):
+    """Convert a decoded MessagePack value to what the JSON payload holds."""
+    if isinstance(value, datetime):
+        # Timestamps decode as aware UTC datetimes; JSON has naive ISO strings
+        return value.replace(tzinfo=None).isoformat()
+    if isinstance(value, dict):
+        return {key: as_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [as_json(item) for item in value]
+    return value
+
+def unpack(data):
+    return msgpack.unpackb(data, timestamp=3)
+
+def unpack_stream(data):
+    unpacker = msgpack.Unpacker(timestamp=3)
+    unpacker.feed(data)
+    return list(unpacker)
+
+def from_records(fields, records):
+    return [dict(zip(fields, record)) for record in records]
+
+def from_columns(fields, columns):
+    assert list(columns) == list(fields)
+    return [dict(zip(fields, values)) for values in zip(*(columns[field] for field in fields))]
+
+@pytest.fixture
+def locations(app, client, zones):
+    """Pings inside each seeded zone and outside all of them."""
+    points = [(zone['latitude'], zone['longitude']) for zone in zones.values()] + [(37.70, -122.30)]
+    for i, (latitude, longitude) in enumerate(points):
+        response = client.post('/api/location/check', json={
+            'phone_number': f"41555540{i:02d}", 'latitude': latitude, 'longitude': longitude
+        })
+        assert response.status_code == 200
+
+def test_zone_list_layouts_match_json(client, zones):
+    expected = client.get('/api/zone/').get_json()['zones']
+    assert len(expected) >= len(zones)
+
+    records = client.get('/api/zone/', headers=RECORDS)
+    columns = client.get('/api/zone/', headers=COLUMNS)
+    assert records.mimetype == MSGPACK_MIMETYPE
+    assert columns.mimetype == COLUMNS_MIMETYPE
+
+    records, columns = unpack(records.data), unpack(columns.data)
+    assert records['success'] and columns['success']
+    assert as_json(from_records(records['fields'], records['zones'])) == expected
+    assert as_json(from_columns(columns['fields'], columns['zones'])) == expected
+
+@pytest.mark.parametrize('path', ['/api/location/history', '/api/location/report'])
+def test_streamed_location_layouts_match_json(client, locations, path):
+    expected = client.get(path).get_json()['locations']
+    assert expected
+
+    header, *chunks = unpack_stream(client.get(path, headers=RECORDS).data)
+    assert header['layout'] == 'rows' and header['list'] == 'locations'
+    decoded = [record for chunk in chunks for record in from_records(header['fields'], chunk)]
+    assert as_json(decoded) == expected
+
+    header, *chunks = unpack_stream(client.get(path, headers=COLUMNS).data)
+    assert header['layout'] == 'columns'
+    decoded = [record for chunk in chunks for record in from_columns(header['fields'], chunk)]
+    assert as_json(decoded) == expected
+
+def test_check_response_matches_json(client, zones):
+    body = {'phone_number': '4155554100', 'latitude': zones['RED']['latitude'], 'longitude': zones['RED']['longitude']}
+    expected = client.post('/api/location/check', json=body).get_json()
+
+    for headers in (RECORDS, COLUMNS):
+        response = client.post('/api/location/check', json=body, headers=headers)
+        # Single objects have no list to lay out, so both types get plain MessagePack
+        assert response.mimetype == MSGPACK_MIMETYPE
+        assert as_json(unpack(response.data)) == expected
+
+def test_json_is_the_default(client):
+    assert client.get('/api/zone/', headers={'Accept': '*/*'}).mimetype == 'application/json'
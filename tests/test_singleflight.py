@@ -0,0 +1,51 @@
+"""
+Tests of cross-worker coalescing in backend/utils/singleflight.py.
+
+Other workers are stood in for by separate SingleFlight instances or open
+file descriptions, which flock treats as separate owners.
+"""
+
+import fcntl
+import threading
+import time
+
+import pytest
+
+import backend.utils.singleflight as singleflight_module
+from backend.utils.singleflight import SingleFlight
+
+@pytest.fixture
+def held_stripe(tmp_path, monkeypatch):
+    """Hold the only lock stripe, as a slow call in another worker would."""
+    monkeypatch.setattr(singleflight_module, '_LOCK_STRIPES', 1)
+    with open(tmp_path / 'stripe-000.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield tmp_path
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def test_held_lock_falls_back_to_a_direct_call(held_stripe):
+    flight = SingleFlight()
+    started = time.monotonic()
+    assert flight.do(('geocode', 1), lambda: 'direct', str(held_stripe), shared_ttl=5, lock_wait=0.1) == 'direct'
+    assert time.monotonic() - started < 1
+    assert flight.snapshot()['lock_timeouts'] == 1
+
+def test_waiter_reuses_result_of_the_worker_holding_the_lock(tmp_path):
+    flight = SingleFlight()
+    other = SingleFlight()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        time.sleep(0.2)
+        return 'shared'
+
+    thread = threading.Thread(target=other.do, args=(('geocode', 2), slow, str(tmp_path), 5, 2))
+    thread.start()
+    started.wait()
+    result = flight.do(('geocode', 2), lambda: 'direct', str(tmp_path), shared_ttl=5, lock_wait=2)
+    thread.join()
+
+    assert result == 'shared'
+    assert flight.snapshot()['collapsed_shared'] == 1
+    assert 'executed' not in flight.snapshot()
@@ -0,0 +1,48 @@
+"""
+Tests of the broadcast estimate endpoint's request validation.
+"""
+
+import pytest
+
+DIRECTIONS = {
+    'end_address': 'Golden Gate Park, San Francisco, CA',
+    'distance': '5.2 km',
+    'duration': '12 mins',
+    'steps': [{'instruction': 'Head <b>west</b> on Market St', 'distance': '0.4 km'}],
+}
+
+def estimate(client, **fields):
+    return client.post('/api/sms/estimate', json={'zone_type': 'RED', 'recipients': 1000, **fields})
+
+def test_estimate_with_directions(client):
+    response = estimate(client, address='1 Market St', directions=DIRECTIONS)
+    assert response.status_code == 200, response.json
+    assert response.json['estimate']['recipients'] == 1000
+
+@pytest.mark.parametrize('directions', [
+    {key: value for key, value in DIRECTIONS.items() if key != 'steps'},
+    {**DIRECTIONS, 'steps': 'west'},
+    {**DIRECTIONS, 'steps': [{'instruction': 'Head west', 'distance': 400}]},
+    {**DIRECTIONS, 'steps': [{'instruction': ['Head west'], 'distance': '0.4 km'}]},
+    {**DIRECTIONS, 'steps': ['Head west']},
+    {**DIRECTIONS, 'distance': 5.2},
+    'west',
+])
+def test_malformed_directions_are_rejected(client, directions):
+    response = estimate(client, directions=directions)
+    assert response.status_code == 400
+    assert response.json['success'] is False
+
+@pytest.mark.parametrize('recipients', ['many', -5, 2.5, True, None, [100]])
+def test_invalid_recipients_are_rejected(client, recipients):
+    response = estimate(client, recipients=recipients)
+    assert response.status_code == 400
+    assert response.json['success'] is False
+
+def test_numeric_recipient_strings_are_accepted(client):
+    response = estimate(client, recipients='250')
+    assert response.status_code == 200
+    assert response.json['estimate']['recipients'] == 250
+
+def test_non_object_body_is_rejected(client):
+    assert client.post('/api/sms/estimate', json=[1, 2]).status_code == 400
@@ -0,0 +1,215 @@
+"""
+Tests of the services shared by the threads of a gthread worker.
+
+Many threads hit them at once, released together by a barrier, to check that
+lazily built clients are built once and that no update is lost.
+"""
+
+import threading
+import time
+
+import pytest
+
+import backend.routes.location_routes as location_routes
+import backend.services.location_service as location_module
+import backend.services.sms_service as sms_module
+from backend.models import UserLocation
+from backend.services.admission_service import AdmissionController, AdmissionRejected, PRIORITY_NORMAL
+from backend.services.location_service import LocationService
+from backend.services.occupancy_service import occupancy_tracker
+from backend.services.sms_service import SMSService
+from backend.services.zone_index import zone_index
+from backend.services.zone_service import ZoneService
+
+THREADS = 32
+
+def run_threads(target, count=THREADS):
+    """Run target(i) in count threads started together; re-raise the first error."""
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def run(i):
+        barrier.wait()
+        try:
+            target(i)
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+class FakeGmaps:
+    """Google Maps client counting its instances; slow to build to widen any race."""
+
+    instances = []
+
+    def __init__(self, key=None):
+        time.sleep(0.05)
+        FakeGmaps.instances.append(self)
+
+    def reverse_geocode(self, latlng):
+        return [{'formatted_address': f"{latlng[0]:.4f}, {latlng[1]:.4f}"}]
+
+    def directions(self, *args, **kwargs):
+        return []
+
+class FakeTwilio:
+    """Twilio client counting its instances and sent messages."""
+
+    instances = []
+
+    def __init__(self, sid, token):
+        time.sleep(0.05)
+        FakeTwilio.instances.append(self)
+        self.sent = []
+        self.messages = self
+
+    def create(self, body, from_, to):
+        self.sent.append(to)
+        return type('Message', (), {'sid': f"SM{len(self.sent)}"})()
+
+@pytest.fixture
+def fake_clients(monkeypatch):
+    FakeGmaps.instances = []
+    FakeTwilio.instances = []
+    monkeypatch.setattr(location_module.googlemaps, 'Client', FakeGmaps)
+    monkeypatch.setattr(sms_module, 'Client', FakeTwilio)
+
+def test_concurrent_checks_share_one_client_and_count_every_phone(app, client, zones, monkeypatch, fake_clients):
+    # Fresh services, so the lazy client initialization runs under contention
+    monkeypatch.setattr(location_routes, 'location_service', LocationService())
+    monkeypatch.setattr(location_routes, 'zone_service', ZoneService())
+    monkeypatch.setitem(app.config, 'ADMISSION_MAX_CONCURRENT', THREADS)
+    monkeypatch.setitem(app.config, 'ADMISSION_DEGRADE_RATIO', 2.0)
+
+    red = zones['RED']
+    phones = [f"41555520{i:02d}" for i in range(THREADS)]
+    with app.app_context():
+        before = occupancy_tracker.zone_occupancy(red['id'])
+
+    statuses = [None] * THREADS
+
+    def check(i):
+        response = client.post('/api/location/check', json={
+            'phone_number': phones[i],
+            # Distinct positions (so geocoding is not coalesced), all inside the zone
+            'latitude': red['latitude'] + i * 2e-4,
+            'longitude': red['longitude']
+        })
+        statuses[i] = response.status_code
+
+    run_threads(check)
+
+    assert statuses == [200] * THREADS
+    assert len(FakeGmaps.instances) == 1
+    with app.app_context():
+        assert UserLocation.query.filter(UserLocation.phone_number.in_(phones)).count() == THREADS
+        assert occupancy_tracker.zone_occupancy(red['id']) - before == THREADS
+
+def test_concurrent_alerts_share_one_twilio_client(app, fake_clients):
+    service = SMSService()
+    sids = [None] * THREADS
+
+    def send(i):
+        with app.app_context():
+            sids[i] = service.send_evacuation_alert(f"+141555530{i:02d}", 'RED', '1 Market St')
+
+    run_threads(send)
+
+    assert len(FakeTwilio.instances) == 1
+    assert sorted(FakeTwilio.instances[0].sent) == sorted(f"+141555530{i:02d}" for i in range(THREADS))
+    assert all(sids)
+
+def test_lookups_never_see_a_partial_zone_index(app, zones):
+    red = zones['RED']
+    stop = threading.Event()
+
+    def invalidate():
+        while not stop.is_set():
+            zone_index.invalidate()
+            time.sleep(0.001)
+
+    invalidator = threading.Thread(target=invalidate)
+    invalidator.start()
+    found = []
+
+    def lookup(i):
+        with app.app_context():
+            for _ in range(20):
+                in_zone, zone = ZoneService().is_in_zone(red['latitude'], red['longitude'])
+                found.append(in_zone and zone.id == red['id'])
+
+    try:
+        run_threads(lookup)
+    finally:
+        stop.set()
+        invalidator.join()
+
+    assert len(found) == THREADS * 20
+    assert all(found)
+
+def test_admission_counters_balance(app, monkeypatch):
+    controller = AdmissionController()
+    monkeypatch.setitem(app.config, 'ADMISSION_MAX_QUEUE', THREADS)
+    monkeypatch.setitem(app.config, 'ADMISSION_QUEUE_TIMEOUT', 30)
+
+    def admit(i):
+        with app.app_context():
+            with controller.admit(PRIORITY_NORMAL):
+                time.sleep(0.001)
+
+    run_threads(admit)
+
+    snapshot = controller.snapshot()
+    assert snapshot['admitted'] == THREADS
+    assert snapshot['in_flight'] == 0 and snapshot['queued'] == 0
+
+def test_admission_queue_engages_with_shipped_defaults(app):
+    config = app.config
+    # Waiting requests hold threads, so the limit must leave some for the queue
+    assert config['ADMISSION_MAX_CONCURRENT'] < config['WORKER_THREADS']
+    assert config['ADMISSION_MAX_CONCURRENT'] + config['ADMISSION_MAX_QUEUE'] < config['WORKER_THREADS']
+
+    controller = AdmissionController()
+    release = threading.Event()
+    peak = []
+    shed = []
+
+    def admit(i):
+        with app.app_context():
+            try:
+                with controller.admit(PRIORITY_NORMAL):
+                    peak.append(controller.snapshot()['in_flight'])
+                    release.wait(5)
+            except AdmissionRejected:
+                shed.append(i)
+
+    # Every thread of a worker busy with checks at once
+    threads = [threading.Thread(target=admit, args=(i,)) for i in range(config['WORKER_THREADS'])]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and controller.snapshot()['queued'] + len(shed) < \
+            config['WORKER_THREADS'] - config['ADMISSION_MAX_CONCURRENT']:
+        time.sleep(0.01)
+    snapshot = controller.snapshot()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert snapshot['in_flight'] == config['ADMISSION_MAX_CONCURRENT']
+    assert snapshot['queued'] == config['ADMISSION_MAX_QUEUE']
+    assert len(shed) == config['ADMISSION_RESERVED_THREADS']
+    assert max(peak) <= config['ADMISSION_MAX_CONCURRENT']
+    assert controller.snapshot()['admitted'] == config['WORKER_THREADS'] - len(shed)
+
+def test_admission_does_not_degrade_below_the_limit(app):
+    controller = AdmissionController()
+    with app.app_context():
+        with controller.admit(PRIORITY_NORMAL):
+            assert not controller.should_degrade()
@@ -0,0 +1,124 @@
+"""
+Tests of the zone vector tiles: encoding, degenerate features and cache invalidation.
+"""
+
+import math
+import os
+
+import pytest
+
+from backend.services.tile_service import TileService, tile_service
+from backend.utils import mvt
+from backend.utils.change_feed import zone_changes
+
+# Mission Fire (RED) in the conftest zones
+RED = (37.7749, -122.4194, 1.0)
+
+def tile_of(latitude, longitude, z):
+    n = 1 << z
+    lat_rad = math.radians(latitude)
+    x = int((longitude + 180.0) / 360.0 * n)
+    y = int((1.0 - math.log(math.tan(lat_rad) + 1.0 / math.cos(lat_rad)) / math.pi) / 2.0 * n)
+    return x, y
+
+class Zone:
+    def __init__(self, latitude, longitude, radius):
+        self.id = 1
+        self.name = 'Zone'
+        self.type = 'RED'
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radius = radius
+
+@pytest.fixture
+def cache_dir(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'TILE_CACHE_DIR', str(tmp_path))
+    tile_service.clear()
+    yield tmp_path
+    tile_service.clear()
+
+def test_encode_polygon_geometry():
+    # MoveTo(1) 2,2, LineTo(2) +2,0 and 0,+2, ClosePath
+    assert mvt._encode_geometry(mvt.POLYGON, [(2, 2), (4, 2), (4, 4)]) == [9, 4, 4, 18, 4, 0, 0, 4, 15]
+    assert mvt._encode_geometry(mvt.POINT, (-1, 3)) == [9, 1, 6]
+
+def test_encode_layer_fields():
+    layer = mvt.encode_layer('zones', [
+        {'id': 7, 'type': mvt.POINT, 'geometry': (1, 1), 'properties': {'type': 'RED', 'radius': 1.5}},
+    ], 4096)
+    # Version 2, then the name
+    assert layer.startswith(b'\x78\x02\x0a\x05zones')
+    assert b'RED' in layer and b'radius' in layer
+    assert layer.endswith(b'\x28\x80\x20')
+    tile = mvt.encode_tile([layer])
+    assert tile.startswith(b'\x1a') and tile.endswith(layer)
+
+def test_render_tile_draws_the_zone(app):
+    x, y = tile_of(RED[0], RED[1], 14)
+    with app.app_context():
+        tile = TileService().render_tile(14, x, y)
+    assert b'Mission Fire' in tile
+    with app.app_context():
+        assert TileService().render_tile(14, 0, 0) == b''
+
+def test_zone_beyond_the_buffer_is_dropped():
+    service = TileService()
+    x, y = tile_of(37.7749, -122.4194, 16)
+    # A zone a few tiles west of the tile clamps onto the buffer's west edge
+    west = Zone(37.7749, -122.4194 - 0.03, 1.0)
+    assert service._zone_feature(west, 16, x, y) is None
+    inside = Zone(37.7749, -122.4194, 0.05)
+    feature = service._zone_feature(inside, 16, x, y)
+    assert feature['type'] == mvt.POLYGON and len(feature['geometry']) >= 8
+
+def test_invalidate_zone_removes_only_the_tiles_it_covers(app, cache_dir):
+    near = tile_of(RED[0], RED[1], 14)
+    far = (near[0] + 50, near[1])
+    with app.app_context():
+        for x, y in (near, far):
+            tile_service.get_tile(14, x, y)
+        near_path = cache_dir / '14' / str(near[0]) / f'{near[1]}.mvt'
+        far_path = cache_dir / '14' / str(far[0]) / f'{far[1]}.mvt'
+        assert near_path.exists() and far_path.exists()
+
+        tile_service.invalidate_zone(*RED)
+
+        assert not near_path.exists()
+        assert far_path.exists()
+        assert (14,) + far in tile_service._cache
+        assert (14,) + near not in tile_service._cache
+
+def test_invalidate_zone_skips_directories_out_of_range(app, cache_dir, monkeypatch):
+    x, y = tile_of(RED[0], RED[1], 10)
+    for column in range(x - 40, x + 40):
+        os.makedirs(cache_dir / '10' / str(column))
+    listed = []
+    real_listdir = os.listdir
+    def listdir(path):
+        listed.append(path)
+        return real_listdir(path)
+    monkeypatch.setattr(os, 'listdir', listdir)
+
+    with app.app_context():
+        tile_service.invalidate_zone(*RED)
+
+    columns = [path for path in listed if os.path.dirname(path) == str(cache_dir / '10')]
+    assert 0 < len(columns) <= 3
+
+def test_other_workers_changes_drop_memory_cached_tiles(app, cache_dir, monkeypatch):
+    monkeypatch.setitem(app.config, 'TILE_CACHE_DIR', None)
+    other = TileService()
+    near = tile_of(RED[0], RED[1], 14)
+    far = (near[0] + 50, near[1])
+    with app.app_context():
+        for x, y in (near, far):
+            other.get_tile(14, x, y)
+
+        pid = os.getpid()
+        with monkeypatch.context() as patch:
+            patch.setattr(os, 'getpid', lambda: pid + 1)
+            zone_changes.publish(regions=[], circles=[list(RED)])
+
+        other.get_tile(14, *far)
+        assert (14,) + near not in other._cache
+        assert (14,) + far in other._cache
@@ -0,0 +1,91 @@
+"""
+Tests of zone deletion and of how zone changes reach other workers.
+
+Another worker is stood in for by a second RegionalZoneIndex; changes it must
+see are published under another process id, as its own are skipped.
+"""
+
+import os
+
+from sqlalchemy import event
+
+from backend.models import db, UserLocation, Zone
+from backend.services.zone_index import RegionalZoneIndex, zone_index
+from backend.services.zone_service import auto_region
+
+def add_zone(app, name, latitude=37.75, longitude=-122.45):
+    with app.app_context():
+        zone = Zone(name=name, type='ORANGE', latitude=latitude, longitude=longitude, radius=0.5,
+                    region=auto_region(latitude, longitude))
+        db.session.add(zone)
+        db.session.commit()
+        zone_index.invalidate(zone.region)
+        return zone.id
+
+def test_delete_zone_keeps_its_location_history(app, client):
+    zone_id = add_zone(app, 'Delete Me')
+    with app.app_context():
+        db.session.add_all([
+            UserLocation(phone_number='+14155550501', latitude=37.75, longitude=-122.45,
+                         in_danger_zone=True, zone_id=zone_id)
+            for _ in range(3)
+        ])
+        db.session.commit()
+
+    response = client.delete(f'/api/zone/{zone_id}')
+
+    assert response.status_code == 200, response.json
+    with app.app_context():
+        assert db.session.get(Zone, zone_id) is None
+        rows = UserLocation.query.filter_by(phone_number='+14155550501').all()
+        assert len(rows) == 3 and all(row.zone_id is None for row in rows)
+        assert zone_index.get(zone_id) is None
+        UserLocation.query.filter_by(phone_number='+14155550501').delete()
+        db.session.commit()
+
+def test_other_workers_see_zone_changes_without_waiting_for_the_ttl(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'ZONE_INDEX_TTL', 3600)
+    zone_id = add_zone(app, 'Seen Elsewhere')
+    other = RegionalZoneIndex()
+    with app.app_context():
+        assert other.get(zone_id).radius == 0.5
+        assert other.zones_at(37.75, -122.45)
+
+    pid = os.getpid()
+    with monkeypatch.context() as patch:
+        patch.setattr(os, 'getpid', lambda: pid + 1)
+        assert client.put(f'/api/zone/{zone_id}', json={'radius': 0.8}).status_code == 200
+    with app.app_context():
+        assert other.get(zone_id).radius == 0.8
+
+    with monkeypatch.context() as patch:
+        patch.setattr(os, 'getpid', lambda: pid + 1)
+        assert client.delete(f'/api/zone/{zone_id}').status_code == 200
+    with app.app_context():
+        assert other.get(zone_id) is None
+        assert all(zone.id != zone_id for zone in other.zones_at(37.75, -122.45))
+        assert other.snapshot()['feed_changes'] == 2
+
+def test_unknown_zone_ids_are_looked_up_once_until_invalidated(app):
+    index = RegionalZoneIndex()
+    zone_id = add_zone(app, 'Looked Up', latitude=37.76, longitude=-122.46)
+    missing_id = zone_id + 1000
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if missing_id in (parameters or ()):
+            statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            for _ in range(3):
+                assert index.get(missing_id) is None
+                assert index.get_live(missing_id) is None
+            assert len(statements) == 1
+
+            index.invalidate()
+            assert index.get(missing_id) is None
+            assert len(statements) == 2
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)